@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import (
     EvidenceCategory, EvidenceSubmission, EvidenceFile,
-    SubmissionComment, ReminderLog
+    SubmissionComment, ReminderLog, UserGoogleDriveToken
 )
 
 
@@ -42,4 +42,14 @@ class ReminderLogAdmin(admin.ModelAdmin):
     search_fields = ['submission__category__name']
 
 
+@admin.register(UserGoogleDriveToken)
+class UserGoogleDriveTokenAdmin(admin.ModelAdmin):
+    list_display = ['user', 'is_organization_default', 'updated_at']
+    list_filter = ['is_organization_default']
+    search_fields = ['user__username', 'user__email']
+    fields = ['user', 'is_organization_default', 'updated_at']
+    readonly_fields = ['user', 'updated_at']
 
+    def has_add_permission(self, request):
+        # Tokens are created by signing in with Google
+        return False
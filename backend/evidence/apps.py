@@ -5,5 +5,6 @@ class EvidenceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'evidence'
 
-
-
+    def ready(self):
+        # Keeps ControlStatus in sync with submission/file writes
+        from evidence import signals  # noqa: F401
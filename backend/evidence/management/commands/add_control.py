@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 from evidence.models import EvidenceCategory, ReviewPeriod, CategoryGroup
+from evidence.services.submission_periods import generate_submission_periods
 
 
 class Command(BaseCommand):
@@ -81,6 +82,7 @@ class Command(BaseCommand):
         )
 
         if created:
+            generate_submission_periods([category])
             self.stdout.write(self.style.SUCCESS(f'[SUCCESS] Successfully created control: {name}'))
             self.stdout.write(f'  - Group: {category_group.label}')
             self.stdout.write(f'  - Duration: {review_period.label if review_period else "(not set)"}')
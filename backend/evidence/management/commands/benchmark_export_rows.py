@@ -0,0 +1,258 @@
+import logging
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from datetime import timedelta
+from django.db.models import Prefetch
+from django.utils import timezone
+from evidence.models import CategoryGroup, EvidenceCategory, EvidenceFile, EvidenceStatus, EvidenceSubmission
+from evidence.services.control_status import refresh_control_status
+from evidence.services.exports import build_export_rows
+
+
+def legacy_build_export_rows(show_hidden=False):
+    """
+    The export_groups row builder before ControlStatus and the single-query rework: every
+    submission and file of every control is prefetched and scanned in Python, with 18 filtered
+    re-queries per group. Kept as it was for comparison.
+    """
+    logger = logging.getLogger(__name__)
+    # Get all categories with their submissions and files
+    base_queryset = EvidenceCategory.objects.select_related(
+        'assignee', 'approver'
+    ).prefetch_related(
+        Prefetch(
+            'submissions',
+            queryset=EvidenceSubmission.objects.prefetch_related(
+                'files', 'files__uploaded_by'
+            ).select_related('submitted_by', 'reviewed_by')
+        )
+    ).all()
+
+    if show_hidden:
+        # When showing hidden, only show inactive categories
+        base_queryset = base_queryset.filter(is_active=False)
+    else:
+        # When showing active, only show active categories
+        base_queryset = base_queryset.filter(is_active=True)
+
+    total_categories_before_filter = base_queryset.count()
+
+    # Prepare export data
+    export_data = []
+    categories_by_group = {}
+    for group_code, group_label in CategoryGroup.choices:
+        if group_code == 'UNCATEGORIZED':
+            continue
+
+        group_categories = base_queryset.filter(category_group=group_code)
+        categories_by_group[group_label] = group_categories.count()
+
+        for category in group_categories:
+            try:
+                # Get all submissions for this category (using prefetched data)
+                submissions = list(category.submissions.all())
+
+                # Get latest submission with files
+                latest_submission = None
+                latest_file = None
+                for sub in submissions:
+                    # Check if submission has files (using prefetched data)
+                    sub_files = list(sub.files.all())
+                    if sub_files:
+                        # Find the latest file in this submission
+                        sub_latest_file = None
+                        for f in sub_files:
+                            if sub_latest_file is None or (f.uploaded_at and sub_latest_file.uploaded_at and f.uploaded_at > sub_latest_file.uploaded_at):
+                                sub_latest_file = f
+
+                        if sub_latest_file:
+                            if latest_submission is None or (sub.submitted_at and latest_submission.submitted_at and sub.submitted_at > latest_submission.submitted_at):
+                                latest_submission = sub
+                                latest_file = sub_latest_file
+
+                # Get file details
+                uploaded_by = None
+                uploaded_date = None
+                approved_by = None
+
+                if latest_file:
+                    uploaded_by = latest_file.uploaded_by.username if latest_file.uploaded_by else 'N/A'
+                    uploaded_date = latest_file.uploaded_at.strftime('%Y-%m-%d %H:%M:%S') if latest_file.uploaded_at else 'N/A'
+
+                if latest_submission and latest_submission.status == 'APPROVED' and latest_submission.reviewed_by:
+                    approved_by = latest_submission.reviewed_by.username
+
+                # Determine evidence status
+                current_submission = None
+                for sub in submissions:
+                    if sub.status in [EvidenceStatus.PENDING, EvidenceStatus.SUBMITTED,
+                                     EvidenceStatus.UNDER_REVIEW, EvidenceStatus.REJECTED]:
+                        if current_submission is None or sub.due_date > current_submission.due_date:
+                            current_submission = sub
+
+                if not current_submission:
+                    evidence_status = 'Missing'
+                elif current_submission.status in [EvidenceStatus.PENDING, EvidenceStatus.REJECTED]:
+                    # Check if files exist using prefetched data
+                    current_files = list(current_submission.files.all())
+                    if not current_files:
+                        evidence_status = 'Missing'
+                    else:
+                        evidence_status = 'Uploaded'
+                else:
+                    # Check if files exist using prefetched data
+                    current_files = list(current_submission.files.all())
+                    if current_files:
+                        evidence_status = 'Uploaded'
+                    else:
+                        evidence_status = 'Missing'
+
+                export_data.append({
+                    'category_group': group_label,
+                    'control': category.name,
+                    'evidence_status': evidence_status,
+                    'last_uploaded_date': uploaded_date or 'N/A',
+                    'uploaded_by': uploaded_by or 'N/A',
+                    'approved_by': approved_by or 'N/A'
+                })
+            except Exception as e:
+                # Log error but continue with other categories
+                logger.error(f"Error processing category {category.id} for export: {e}", exc_info=True)
+                # Still add the category with default values
+                export_data.append({
+                    'category_group': group_label,
+                    'control': category.name,
+                    'evidence_status': 'Error',
+                    'last_uploaded_date': 'N/A',
+                    'uploaded_by': 'N/A',
+                    'approved_by': 'N/A'
+                })
+                continue
+
+    return export_data, categories_by_group, total_categories_before_filter
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare the export row builder with the previous implementation on a generated set of controls (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--controls',
+            type=int,
+            default=5000,
+            help='Number of controls to generate (default: 5000)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Runs per builder; the fastest is reported (default: 3)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.create_fixture(options['controls'])
+                results = [
+                    self.measure('previous', legacy_build_export_rows, options['repeat']),
+                    self.measure('current', build_export_rows, options['repeat']),
+                ]
+                raise Rollback(results)
+        except Rollback as rollback:
+            (old_name, old_rows, old_seconds, old_queries), (new_name, new_rows, new_seconds, new_queries) = rollback.args[0]
+
+        for name, rows, seconds, queries in [(old_name, old_rows, old_seconds, old_queries), (new_name, new_rows, new_seconds, new_queries)]:
+            self.stdout.write(f"{name:>8}: {len(rows)} rows in {seconds * 1000:.1f} ms, {queries} queries")
+        if old_rows != new_rows:
+            self.stdout.write(self.style.ERROR('The builders produced different rows'))
+            return
+        speedup = old_seconds / new_seconds if new_seconds else float('inf')
+        self.stdout.write(self.style.SUCCESS(f'Identical rows; current builder is {speedup:.1f}x faster'))
+
+    def create_fixture(self, count):
+        """
+        `count` controls with three periods each; every period but the pending one has a file.
+        ControlStatus is then built once, as it would be in a running install.
+        """
+        assignee, approver = User.objects.bulk_create([
+            User(username=f'export-benchmark-{role}-{timezone.now():%Y%m%d%H%M%S%f}')
+            for role in ('assignee', 'approver')
+        ])
+        groups = [code for code, _ in CategoryGroup.choices]
+        categories = EvidenceCategory.objects.bulk_create(
+            [
+                EvidenceCategory(
+                    name=f'Benchmark control {index:05d}',
+                    description='Generated by benchmark_export_rows',
+                    evidence_requirements='',
+                    category_group=groups[index % len(groups)],
+                    assignee=assignee,
+                    approver=approver,
+                )
+                for index in range(count)
+            ],
+            batch_size=500,
+        )
+
+        now = timezone.now()
+        today = now.date()
+        statuses = [EvidenceStatus.PENDING, EvidenceStatus.SUBMITTED, EvidenceStatus.APPROVED, EvidenceStatus.REJECTED]
+        submissions = []
+        for index, category in enumerate(categories):
+            # Oldest period first, so later periods get later submission and upload times
+            for period in range(3):
+                due_date = today + timedelta(days=30 * (period - 1))
+                submission_status = statuses[(index + period) % len(statuses)]
+                reviewed = submission_status in [EvidenceStatus.APPROVED, EvidenceStatus.REJECTED]
+                submissions.append(EvidenceSubmission(
+                    category=category,
+                    period_start_date=due_date - timedelta(days=30),
+                    period_end_date=due_date - timedelta(days=1),
+                    due_date=due_date,
+                    status=submission_status,
+                    submitted_by=assignee if submission_status != EvidenceStatus.PENDING else None,
+                    submitted_at=now + timedelta(hours=period) if submission_status != EvidenceStatus.PENDING else None,
+                    reviewed_by=approver if reviewed else None,
+                    reviewed_at=now + timedelta(hours=period) if reviewed else None,
+                ))
+        submissions = EvidenceSubmission.objects.bulk_create(submissions, batch_size=500)
+        files = EvidenceFile.objects.bulk_create(
+            [
+                EvidenceFile(
+                    submission=submission,
+                    filename=f'evidence-{submission.category_id}-{submission.due_date}.pdf',
+                    file_size=1024,
+                    mime_type='application/pdf',
+                    uploaded_by=assignee,
+                    status=submission.status,
+                )
+                for submission in submissions
+                if submission.status != EvidenceStatus.PENDING
+            ],
+            batch_size=500,
+        )
+
+        started = time.perf_counter()
+        refresh_control_status([category.pk for category in categories])
+        self.stdout.write(
+            f'Generated {count} controls, {len(submissions)} submissions and {len(files)} files; '
+            f'ControlStatus built in {(time.perf_counter() - started) * 1000:.1f} ms'
+        )
+
+    def measure(self, name, builder, repeat):
+        best = None
+        for _ in range(max(1, repeat)):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                rows, _, _ = builder()
+                seconds = time.perf_counter() - started
+            if best is None or seconds < best:
+                best = seconds
+        return name, rows, best, len(queries.captured_queries)
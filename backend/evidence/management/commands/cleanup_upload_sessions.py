@@ -0,0 +1,32 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from evidence.models import UploadSession, UploadSessionStatus
+from evidence.services.chunked_uploads import abort_upload
+
+
+class Command(BaseCommand):
+    help = 'Abort chunked uploads that were started but not completed, and delete their stored parts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=24,
+            help='Abort uploads with no activity for this many hours (default: 24)',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        sessions = UploadSession.objects.filter(status=UploadSessionStatus.ACTIVE, updated_at__lt=cutoff)
+
+        aborted = failed = 0
+        for session in sessions.iterator():
+            try:
+                abort_upload(session)
+                aborted += 1
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f"Could not abort upload {session.id} ({session.filename}): {str(e)}"))
+
+        self.stdout.write(self.style.SUCCESS(f'Aborted {aborted} stale upload(s); {failed} failed'))
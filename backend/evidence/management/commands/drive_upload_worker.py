@@ -0,0 +1,84 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from evidence.models import DriveUploadStatus
+from evidence.services.drive_uploads import claim_jobs, requeue_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'Process queued Google Drive uploads (DriveUploadJob) with a thread pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=4,
+            help='Number of uploads running in parallel (default: 4)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5.0,
+            help='Seconds to wait when the queue is empty (default: 5)',
+        )
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=1800,
+            help='Requeue RUNNING jobs started more than this many seconds ago (default: 1800)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the jobs that are due now, then exit (for cron/Task Scheduler)',
+        )
+
+    def handle(self, *args, **options):
+        threads = max(1, options['threads'])
+        once = options['once']
+        succeeded = failed = retrying = 0
+
+        self.stdout.write(f"Drive upload worker started with {threads} thread(s)")
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            try:
+                while True:
+                    requeued = requeue_stale_jobs(options['stale_after'])
+                    if requeued:
+                        self.stdout.write(self.style.WARNING(f"Requeued {requeued} stale job(s)"))
+
+                    job_ids = claim_jobs(threads * 2)
+                    if not job_ids:
+                        if once:
+                            break
+                        close_old_connections()
+                        time.sleep(options['poll_interval'])
+                        continue
+
+                    for job in executor.map(self.process, job_ids):
+                        if job.status == DriveUploadStatus.SUCCEEDED:
+                            succeeded += 1
+                            self.stdout.write(f"Uploaded {job.evidence_file.filename} (job {job.pk})")
+                        elif job.status == DriveUploadStatus.FAILED:
+                            failed += 1
+                            self.stdout.write(self.style.ERROR(
+                                f"Gave up on {job.evidence_file.filename} (job {job.pk}) after {job.attempts} attempt(s): {job.last_error}"
+                            ))
+                        else:
+                            retrying += 1
+                            self.stdout.write(self.style.WARNING(
+                                f"Upload of {job.evidence_file.filename} (job {job.pk}) failed, retrying at {job.next_attempt_at:%H:%M:%S}: {job.last_error}"
+                            ))
+            except KeyboardInterrupt:
+                self.stdout.write('Stopping worker')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Drive upload worker finished: {succeeded} uploaded, {retrying} to retry, {failed} failed'
+        ))
+
+    def process(self, job_id):
+        try:
+            return run_job(job_id)
+        finally:
+            # Each pool thread has its own DB connection; don't leave it open between jobs
+            close_old_connections()
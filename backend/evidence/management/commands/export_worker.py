@@ -0,0 +1,60 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from evidence.models import ExportJobStatus
+from evidence.services.export_jobs import claim_export_jobs, requeue_stale_export_jobs, run_export_job
+
+
+class Command(BaseCommand):
+    help = 'Render queued category groups exports (ExportJob) to storage'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to wait when the queue is empty (default: 2)',
+        )
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=900,
+            help='Requeue RUNNING jobs started more than this many seconds ago (default: 900)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Render the jobs that are queued now, then exit (for cron/Task Scheduler)',
+        )
+
+    def handle(self, *args, **options):
+        once = options['once']
+        succeeded = failed = 0
+
+        self.stdout.write('Export worker started')
+        try:
+            while True:
+                requeued = requeue_stale_export_jobs(options['stale_after'])
+                if requeued:
+                    self.stdout.write(self.style.WARNING(f"Requeued {requeued} stale job(s)"))
+
+                # Rendering is CPU-bound, so one job at a time; run more workers to render in parallel
+                job_ids = claim_export_jobs(1)
+                if not job_ids:
+                    if once:
+                        break
+                    close_old_connections()
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                job = run_export_job(job_ids[0])
+                if job.status == ExportJobStatus.SUCCEEDED:
+                    succeeded += 1
+                    self.stdout.write(f"Rendered {job.filename} with {job.row_count} row(s) (job {job.pk})")
+                else:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(f"Export job {job.pk} failed: {job.last_error}"))
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping worker')
+
+        self.stdout.write(self.style.SUCCESS(f'Export worker finished: {succeeded} rendered, {failed} failed'))
@@ -5,6 +5,7 @@ Single management command that:
 3. Updates users from hardcoded list (same as update_users)
 4. Refreshes/imports controls from all_categories.csv (Control Short, Duration, To Do, Evidence, Assigned to)
 5. Sets default approver (Manoj) for all controls
+6. Generates the first submission period for active controls and rebuilds the denormalized ControlStatus table
 
 Usage:
   python manage.py full_refresh
@@ -24,6 +25,8 @@ from evidence.models import (
     EvidenceFile,
     ReviewPeriod,
 )
+from evidence.services.control_status import refresh_control_status
+from evidence.services.submission_periods import generate_submission_periods
 
 
 # Same user list as update_users
@@ -242,4 +245,11 @@ class Command(BaseCommand):
         elif dry_run:
             self.stdout.write(self.style.WARNING('[DRY RUN] Would set default approver (Manoj) where missing.'))
 
+        # 6. Generate submission periods and rebuild denormalized control status
+        if not dry_run:
+            created = generate_submission_periods()
+            self.stdout.write(self.style.SUCCESS(f'Generated {len(created)} submission period(s).'))
+            written = refresh_control_status()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt control status for {written} control(s).'))
+
         self.stdout.write(self.style.SUCCESS('Full refresh complete.'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from evidence.models import EvidenceFile
+from evidence.services.evidence_storage import hash_evidence_file
+
+
+class Command(BaseCommand):
+    help = 'Record SHA-256 content hashes for evidence files uploaded before hashes were stored'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Files hashed per database update (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        files = EvidenceFile.objects.filter(sha256='').exclude(file='').exclude(file__isnull=True).only('id', 'filename', 'file')
+
+        hashed = failed = 0
+        batch = []
+        for evidence_file in files.iterator(chunk_size=batch_size):
+            try:
+                evidence_file.sha256 = hash_evidence_file(evidence_file)
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f"Could not read {evidence_file.filename} (file {evidence_file.id}): {str(e)}"))
+                continue
+            batch.append(evidence_file)
+            if len(batch) >= batch_size:
+                EvidenceFile.objects.bulk_update(batch, ['sha256'])
+                hashed += len(batch)
+                batch = []
+        EvidenceFile.objects.bulk_update(batch, ['sha256'])
+        hashed += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Hashed {hashed} file(s); {failed} could not be read'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from evidence.models import EvidenceCategory
+from evidence.services.control_status import refresh_control_status
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized ControlStatus table for all (or selected) controls'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--category',
+            type=int,
+            action='append',
+            dest='category_ids',
+            help='Only rebuild these category ids (can be given multiple times)',
+        )
+
+    def handle(self, *args, **options):
+        category_ids = options['category_ids']
+        if category_ids is None:
+            category_ids = EvidenceCategory.objects.values_list('pk', flat=True)
+        
+        written = refresh_control_status(category_ids)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt control status for {written} control(s)'))
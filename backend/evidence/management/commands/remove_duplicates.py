@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from evidence.models import EvidenceCategory
+from evidence.services.control_status import refresh_control_status
 from django.db.models import Count
 
 
@@ -69,6 +70,7 @@ class Command(BaseCommand):
                             submission.category = to_keep
                             submission.save()
                         cat.delete()
+                        refresh_control_status([to_keep.id])
                         deleted_count += 1
                         self.stdout.write(
                             self.style.SUCCESS(f'  Deleted: ID {cat.id} - "{cat.name}" (submissions moved)')
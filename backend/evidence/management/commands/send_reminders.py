@@ -1,91 +1,157 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from django.core.management.base import BaseCommand
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Prefetch
 from django.utils import timezone
 from django.conf import settings
 from datetime import timedelta
-from evidence.models import EvidenceSubmission, EvidenceStatus, ReminderLog, Notification
+from django.contrib.auth.models import User
+from evidence.models import EvidenceSubmission, EvidenceStatus, ReminderLog
+from evidence.services.notifications import (
+    DUE_DATE_NOTIFICATIONS_JOB, claim_daily_run, create_due_date_notifications
+)
 
 
 class Command(BaseCommand):
     help = 'Send reminder emails for evidence submissions'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show which reminders would be sent without sending email or writing logs',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Emails sent per SMTP connection (default: 100)',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Number of SMTP connections sending batches in parallel (default: 1)',
+        )
+
     def handle(self, *args, **options):
         today = timezone.now().date()
-        
-        # 1-day reminders (1 day before due date)
-        self.send_reminders(today + timedelta(days=1), '1_day')
-        
-        # Overdue reminders (1 day after due date)
-        self.send_overdue_reminders(today)
-        
+        dry_run = options['dry_run']
+        started = time.perf_counter()
+
+        # 1-day reminders (1 day before due date) and overdue reminders (1 day after due date)
+        messages = self.build_reminders(today + timedelta(days=1), '1_day', today)
+        messages += self.build_reminders(today - timedelta(days=1), 'overdue', today)
+        built = time.perf_counter()
+
+        if dry_run:
+            for submission, reminder_type, recipient, _ in messages:
+                self.stdout.write(f"[DRY RUN] Would send {reminder_type} reminder for {submission.category.name} to {recipient.email}")
+            self.stdout.write(self.style.WARNING(
+                f'[DRY RUN] {len(messages)} reminder(s) prepared in {built - started:.2f}s; nothing sent'
+            ))
+            return
+
+        sent = self.send_batches(messages, max(1, options['batch_size']), max(1, options['concurrency']))
+        finished = time.perf_counter()
+
         # Due date notifications (in-app notifications for assignees on due date)
         self.send_due_date_notifications(today)
-        
+
+        send_seconds = finished - built
+        rate = len(sent) / send_seconds if send_seconds > 0 else 0
+        self.stdout.write(
+            f'Prepared {len(messages)} reminder(s) in {built - started:.2f}s; '
+            f'sent {len(sent)} and failed {len(messages) - len(sent)} in {send_seconds:.2f}s ({rate:.1f}/s)'
+        )
         self.stdout.write(self.style.SUCCESS('Successfully sent reminders'))
 
-    def send_reminders(self, due_date, reminder_type):
-        submissions = EvidenceSubmission.objects.filter(
-            due_date=due_date,
-            status=EvidenceStatus.PENDING
-        ).select_related('category', 'category__assignee', 'submitted_by')
-        
+    def build_reminders(self, due_date, reminder_type, today):
+        """
+        Return (submission, reminder_type, recipient, EmailMessage) for every PENDING submission
+        due on due_date that hasn't had this reminder yet. Reminder logs and reviewers are
+        loaded in bulk.
+        """
+        submissions = list(
+            EvidenceSubmission.objects.filter(
+                due_date=due_date,
+                status=EvidenceStatus.PENDING
+            ).select_related('category', 'category__assignee', 'submitted_by').prefetch_related(
+                Prefetch('category__assigned_reviewers', queryset=User.objects.order_by('pk'))
+            )
+        )
+
+        # 1-day reminders go out once per day; overdue reminders once per submission
+        logs = ReminderLog.objects.filter(
+            submission__in=submissions,
+            reminder_type=reminder_type
+        )
+        if reminder_type != 'overdue':
+            logs = logs.filter(sent_at__date=today)
+        already_sent = set(logs.values_list('submission_id', flat=True))
+
+        messages = []
         for submission in submissions:
-            # Check if reminder already sent today
-            if ReminderLog.objects.filter(
-                submission=submission,
-                reminder_type=reminder_type,
-                sent_at__date=timezone.now().date()
-            ).exists():
+            if submission.id in already_sent:
                 continue
-            
-            # Get recipient: prioritize assignee, fallback to submitted_by
-            recipient = submission.category.assignee
-            if not recipient:
-                recipient = submission.submitted_by
+
+            # Get recipient: prioritize assignee, fallback to submitted_by, then first assigned reviewer
+            recipient = submission.category.assignee or submission.submitted_by
             if not recipient:
-                # Try to get from category assigned reviewers
                 reviewers = submission.category.assigned_reviewers.all()
-                if reviewers.exists():
-                    recipient = reviewers.first()
+                if reviewers:
+                    recipient = reviewers[0]
                 else:
                     self.stdout.write(self.style.WARNING(f"No assignee or submitted_by for submission {submission.id}"))
                     continue
-            
-            self.send_email(submission, reminder_type, recipient)
-
-    def send_overdue_reminders(self, today):
-        # Only send reminders for submissions that are exactly 1 day overdue
-        # (due_date + 1 day = today)
-        one_day_ago = today - timedelta(days=1)
-        
-        submissions = EvidenceSubmission.objects.filter(
-            due_date=one_day_ago,
-            status=EvidenceStatus.PENDING
-        ).select_related('category', 'category__assignee', 'submitted_by')
-        
-        for submission in submissions:
-            # Check if overdue reminder already sent for this submission
-            if ReminderLog.objects.filter(
-                submission=submission,
-                reminder_type='overdue'
-            ).exists():
+
+            if not recipient.email:
+                self.stdout.write(self.style.WARNING(f"No email address for recipient {recipient.username} (submission {submission.id})"))
                 continue
-            
-            # Get recipient: prioritize assignee, fallback to submitted_by
-            recipient = submission.category.assignee
-            if not recipient:
-                recipient = submission.submitted_by
-            if not recipient:
-                reviewers = submission.category.assigned_reviewers.all()
-                if reviewers.exists():
-                    recipient = reviewers.first()
-                else:
-                    self.stdout.write(self.style.WARNING(f"No assignee or submitted_by for submission {submission.id}"))
-                    continue
-            
-            self.send_email(submission, 'overdue', recipient)
 
-    def send_email(self, submission, reminder_type, recipient):
+            subject, body = self.build_email(submission, reminder_type, recipient)
+            email = EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [recipient.email])
+            messages.append((submission, reminder_type, recipient, email))
+        return messages
+
+    def send_batches(self, messages, batch_size, concurrency):
+        """
+        Send messages over one SMTP connection per batch; returns the entries that were sent.
+        Each batch's ReminderLog rows are written (here, on the main thread) as soon as it finishes,
+        so a run that dies partway doesn't email the same people again next time.
+        """
+        batches = [messages[i:i + batch_size] for i in range(0, len(messages), batch_size)]
+        sent = []
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(self.send_batch, batch) for batch in batches]
+            for future in as_completed(futures):
+                batch_sent = future.result()
+                ReminderLog.objects.bulk_create([
+                    ReminderLog(submission=submission, reminder_type=reminder_type, sent_to=recipient, email_sent=True)
+                    for submission, reminder_type, recipient, _ in batch_sent
+                ])
+                sent.extend(batch_sent)
+        return sent
+
+    def send_batch(self, batch):
+        sent = []
+        try:
+            with get_connection(fail_silently=False) as connection:
+                for entry in batch:
+                    submission, reminder_type, recipient, email = entry
+                    try:
+                        connection.send_messages([email])
+                        sent.append(entry)
+                        self.stdout.write(f"Sent {reminder_type} reminder for {submission.category.name} to {recipient.email}")
+                    except Exception as e:
+                        self.stdout.write(self.style.ERROR(f"Failed to send email: {str(e)}"))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Failed to open email connection: {str(e)}"))
+        return sent
+
+    def build_email(self, submission, reminder_type, recipient):
         if reminder_type == 'overdue':
             subject = f"OVERDUE: Evidence Submission Required - {submission.category.name}"
             message = f"""Hello {recipient.first_name or recipient.username},
@@ -120,64 +186,19 @@ Please submit your evidence as soon as possible.
 Best regards,
 ComplianceGrid System
 """
-        
-        try:
-            if recipient and recipient.email:
-                send_mail(
-                    subject,
-                    message,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [recipient.email],
-                    fail_silently=False,
-                )
-                
-                ReminderLog.objects.create(
-                    submission=submission,
-                    reminder_type=reminder_type,
-                    sent_to=recipient,
-                    email_sent=True
-                )
-                
-                self.stdout.write(f"Sent {reminder_type} reminder for {submission.category.name} to {recipient.email}")
-            else:
-                self.stdout.write(self.style.WARNING(f"No email address for recipient {recipient.username} (submission {submission.id})"))
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f"Failed to send email: {str(e)}"))
-    
-    def send_due_date_notifications(self, today):
-        """Send in-app notifications to assignees on due date"""
-        submissions = EvidenceSubmission.objects.filter(
-            due_date=today,
-            status=EvidenceStatus.PENDING
-        ).select_related('category', 'category__assignee')
-        
-        notifications_created = 0
-        for submission in submissions:
-            category = submission.category
-            # Send notification to assignee if exists
-            if category.assignee:
-                # Check if notification already exists for this submission today
-                existing_notification = Notification.objects.filter(
-                    user=category.assignee,
-                    submission=submission,
-                    notification_type='OVERDUE',
-                    created_at__date=today
-                ).first()
-                
-                if not existing_notification:
-                    # Create notification with link to control-file page
-                    Notification.objects.create(
-                        user=category.assignee,
-                        notification_type='OVERDUE',
-                        title=f'Due Today: {category.name}',
-                        message=f'Evidence submission for "{category.name}" is due today. Please submit your evidence files.',
-                        category=category,
-                        submission=submission,
-                        is_read=False
-                    )
-                    notifications_created += 1
-                    self.stdout.write(f"Created due date notification for {category.name} to {category.assignee.username}")
-        
-        if notifications_created > 0:
-            self.stdout.write(self.style.SUCCESS(f'Created {notifications_created} due date notification(s)'))
+        return subject, message
 
+    def send_due_date_notifications(self, today):
+        """Create in-app notifications for assignees on due date (once per day)"""
+        # Marker and notifications commit together: a failed run leaves no marker and is retried
+        with transaction.atomic():
+            if not claim_daily_run(DUE_DATE_NOTIFICATIONS_JOB, today):
+                self.stdout.write('Due date notifications already created today')
+                return
+            notifications = create_due_date_notifications(today)
+
+        for notification in notifications:
+            self.stdout.write(f"Created due date notification for {notification.category.name} to {notification.user.username}")
+
+        if notifications:
+            self.stdout.write(self.style.SUCCESS(f'Created {len(notifications)} due date notification(s)'))
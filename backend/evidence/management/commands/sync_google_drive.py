@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from evidence.models import UserGoogleDriveToken
+from evidence.services.drive_sync import sync_drive
+
+
+class Command(BaseCommand):
+    help = 'Create missing Google Drive folders and upload approved files that are not on Drive yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=str,
+            help='Username whose stored Google Drive token is used (default: the organization token, else the most recently updated token)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Parallel Drive requests (default: GOOGLE_DRIVE_SYNC_WORKERS)',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=None,
+            help='Maximum Drive requests per second across all workers, 0 = unlimited (default: GOOGLE_DRIVE_SYNC_RATE)',
+        )
+
+    def handle(self, *args, **options):
+        tokens = UserGoogleDriveToken.objects.order_by('-is_organization_default', '-updated_at')
+        if options['user']:
+            tokens = tokens.filter(user__username=options['user'])
+        token = tokens.first()
+        if not token:
+            raise CommandError('No stored Google Drive token found. Authenticate with Google from the Category Groups page first.')
+
+        result = sync_drive(
+            token.access_token,
+            token.refresh_token,
+            workers=options['workers'],
+            rate_per_second=options['rate'],
+            progress=lambda stage, done, total: self.stdout.write(f"{stage}: {done}/{total}"),
+        )
+
+        for error in result['upload_errors']:
+            self.stdout.write(self.style.ERROR(error))
+        timings = result['timings_seconds']
+        self.stdout.write(
+            f"Folders: {result['categories_created']} created, {result['categories_skipped']} already existed ({timings['folders']:.2f}s); "
+            f"files: {result['files_uploaded']} uploaded, {result['files_already_on_drive']} already on Drive, "
+            f"{result['files_failed']} failed ({timings['files']:.2f}s)"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Google Drive sync finished in {timings['total']:.2f}s"))
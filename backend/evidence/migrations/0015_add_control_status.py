@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evidence', '0014_review_period_six_choices_null_other'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ControlStatus',
+            fields=[
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='control_status', serialize=False, to='evidence.evidencecategory')),
+                ('current_status', models.CharField(blank=True, choices=[('PENDING', 'Pending Submission'), ('SUBMITTED', 'Submitted'), ('UNDER_REVIEW', 'Under Review'), ('APPROVED', 'Approved'), ('REJECTED', 'Rejected')], max_length=20)),
+                ('score', models.FloatField(default=0.0, help_text='Compliance score before the overdue reset')),
+                ('open_due_date', models.DateField(blank=True, help_text='Due date of the latest open submission; score resets to 0 once it passes', null=True)),
+                ('oldest_pending_due_date', models.DateField(blank=True, db_index=True, help_text='Control is overdue once this date passes', null=True)),
+                ('evidence_status', models.CharField(blank=True, choices=[('PENDING', 'Pending Submission'), ('SUBMITTED', 'Submitted'), ('UNDER_REVIEW', 'Under Review'), ('APPROVED', 'Approved'), ('REJECTED', 'Rejected')], max_length=20)),
+                ('has_files', models.BooleanField(default=False)),
+                ('last_uploaded_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('approved_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('current_submission', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='evidence.evidencesubmission')),
+                ('last_uploaded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Control Status',
+                'verbose_name_plural': 'Control Statuses',
+            },
+        ),
+    ]
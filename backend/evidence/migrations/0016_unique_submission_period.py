@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:02
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+# Higher rank wins when several submissions share a period; ties keep the oldest row
+STATUS_RANK = {'APPROVED': 5, 'UNDER_REVIEW': 4, 'SUBMITTED': 3, 'REJECTED': 2, 'PENDING': 1}
+
+
+def merge_duplicate_periods(apps, schema_editor):
+    """Merge submissions that share (category, period_start_date) into one before adding the constraint."""
+    EvidenceSubmission = apps.get_model('evidence', 'EvidenceSubmission')
+    duplicates = (
+        EvidenceSubmission.objects.order_by()
+        .values('category_id', 'period_start_date')
+        .annotate(row_count=Count('id'))
+        .filter(row_count__gt=1)
+    )
+    for duplicate in duplicates:
+        submissions = list(EvidenceSubmission.objects.filter(
+            category_id=duplicate['category_id'],
+            period_start_date=duplicate['period_start_date']
+        ).order_by('id'))
+        keep = max(submissions, key=lambda s: (STATUS_RANK.get(s.status, 0), -s.id))
+        extra_ids = [s.id for s in submissions if s.id != keep.id]
+        for related_model in ('EvidenceFile', 'SubmissionComment', 'ReminderLog', 'Notification'):
+            apps.get_model('evidence', related_model).objects.filter(
+                submission_id__in=extra_ids
+            ).update(submission_id=keep.id)
+        EvidenceSubmission.objects.filter(id__in=extra_ids).delete()
+
+
+class Migration(migrations.Migration):
+    # The merge commits on its own before the constraint is added: on PostgreSQL the deletes leave
+    # deferred foreign key checks queued on the submission table, and ALTER TABLE refuses to run
+    # while they are pending ("cannot ALTER TABLE ... because it has pending trigger events")
+    atomic = False
+
+    dependencies = [
+        ('evidence', '0015_add_control_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_periods, migrations.RunPython.noop, atomic=True),
+        migrations.AddConstraint(
+            model_name='evidencesubmission',
+            constraint=models.UniqueConstraint(fields=('category', 'period_start_date'), name='unique_submission_period'),
+        ),
+    ]
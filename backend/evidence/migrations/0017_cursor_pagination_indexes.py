@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evidence', '0016_unique_submission_period'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='evidencefile',
+            index=models.Index(fields=['-uploaded_at', '-id'], name='evidence_ev_uploade_4f56b6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evidencefile',
+            index=models.Index(fields=['uploaded_by', '-uploaded_at', '-id'], name='evidence_ev_uploade_83d211_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evidencesubmission',
+            index=models.Index(fields=['-due_date', '-id'], name='evidence_ev_due_dat_bc7f2a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evidencesubmission',
+            index=models.Index(fields=['category', '-due_date', '-id'], name='evidence_ev_categor_544625_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evidencesubmission',
+            index=models.Index(fields=['status', '-due_date', '-id'], name='evidence_ev_status_a26700_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='evidence_no_user_id_73a2f8_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:08
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_due_date_notifications(apps, schema_editor):
+    """Keep the oldest DUE_SOON/OVERDUE notification per user, submission and type."""
+    Notification = apps.get_model('evidence', 'Notification')
+    duplicates = (
+        Notification.objects.order_by()
+        .filter(notification_type__in=['DUE_SOON', 'OVERDUE'], submission__isnull=False)
+        .values('user_id', 'submission_id', 'notification_type')
+        .annotate(row_count=Count('id'), keep_id=Min('id'))
+        .filter(row_count__gt=1)
+    )
+    for duplicate in duplicates:
+        Notification.objects.filter(
+            user_id=duplicate['user_id'],
+            submission_id=duplicate['submission_id'],
+            notification_type=duplicate['notification_type']
+        ).exclude(id=duplicate['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evidence', '0017_cursor_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledJobRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_name', models.CharField(max_length=100)),
+                ('run_date', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Scheduled Job Run',
+                'verbose_name_plural': 'Scheduled Job Runs',
+            },
+        ),
+        migrations.RunPython(remove_duplicate_due_date_notifications, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('notification_type__in', ['DUE_SOON', 'OVERDUE'])), fields=('user', 'submission', 'notification_type'), name='unique_due_date_notification'),
+        ),
+        migrations.AddConstraint(
+            model_name='scheduledjobrun',
+            constraint=models.UniqueConstraint(fields=('job_name', 'run_date'), name='unique_scheduled_job_run'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evidence', '0019_drive_upload_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usergoogledrivetoken',
+            name='is_organization_default',
+            field=models.BooleanField(default=False, help_text='Used for Drive uploads/sync when none of the users involved has authenticated with Google'),
+        ),
+        migrations.AddConstraint(
+            model_name='usergoogledrivetoken',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_organization_default', True)), fields=('is_organization_default',), name='unique_organization_drive_token'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evidence', '0020_organization_drive_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='googledrivefoldermapping',
+            name='changes_page_token',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.CreateModel(
+            name='DriveFileIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_id', models.CharField(max_length=255, unique=True)),
+                ('name', models.CharField(max_length=500)),
+                ('parent_id', models.CharField(blank=True, max_length=255)),
+                ('mime_type', models.CharField(blank=True, max_length=255)),
+                ('md5_checksum', models.CharField(blank=True, max_length=32)),
+                ('size', models.BigIntegerField(blank=True, null=True)),
+                ('modified_time', models.DateTimeField(blank=True, null=True)),
+                ('web_view_link', models.URLField(blank=True, max_length=1000)),
+                ('indexed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Drive File Index Entry',
+                'verbose_name_plural': 'Drive File Index',
+                'indexes': [models.Index(fields=['parent_id', 'md5_checksum'], name='evidence_dr_parent__a9130b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evidence', '0021_drive_file_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='drivefileindex',
+            name='evidence_dr_parent__a9130b_idx',
+        ),
+        migrations.AddField(
+            model_name='drivefileindex',
+            name='sha256_checksum',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='evidencefile',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='drivefileindex',
+            index=models.Index(fields=['parent_id', 'sha256_checksum'], name='evidence_dr_parent__bbc87f_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evidence', '0022_evidence_file_sha256'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filename', models.CharField(max_length=255)),
+                ('size', models.BigIntegerField(help_text='Total size declared when the upload started')),
+                ('declared_mime_type', models.CharField(blank=True, max_length=100)),
+                ('detected_mime_type', models.CharField(blank=True, max_length=100)),
+                ('notes', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('ACTIVE', 'Active'), ('COMPLETED', 'Completed'), ('ABORTED', 'Aborted')], default='ACTIVE', max_length=20)),
+                ('backend', models.CharField(max_length=20)),
+                ('staging_key', models.CharField(blank=True, max_length=500)),
+                ('backend_upload_id', models.CharField(blank=True, max_length=255)),
+                ('parts', models.JSONField(blank=True, default=list)),
+                ('received_size', models.BigIntegerField(default=0)),
+                ('next_part', models.PositiveIntegerField(default=1)),
+                ('sha256', models.CharField(blank=True, max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('evidence_file', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload_session', to='evidence.evidencefile')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to='evidence.evidencesubmission')),
+            ],
+            options={
+                'verbose_name': 'Upload Session',
+                'verbose_name_plural': 'Upload Sessions',
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='evidence_up_status_d649e0_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,107 @@
+from django.db import migrations
+from django.db.models import Case, Exists, FloatField, OuterRef, Q, Subquery, Value, When
+
+BATCH_SIZE = 500
+
+# Frozen copy of evidence.services.control_status.refresh_control_status (as of this migration),
+# written against the historical models so later schema changes can't break it
+ACTIVE = ['PENDING', 'SUBMITTED', 'UNDER_REVIEW', 'APPROVED']
+OPEN = ['PENDING', 'SUBMITTED', 'UNDER_REVIEW']
+NEEDS_EVIDENCE = ['PENDING', 'SUBMITTED', 'UNDER_REVIEW', 'REJECTED']
+
+CONTROL_STATUS_FIELDS = [
+    'current_submission', 'current_status', 'score', 'open_due_date', 'oldest_pending_due_date',
+    'evidence_status', 'has_files', 'last_uploaded_at', 'last_uploaded_by', 'approved_by', 'updated_at',
+]
+
+
+def annotated_categories(apps, category_ids):
+    EvidenceCategory = apps.get_model('evidence', 'EvidenceCategory')
+    EvidenceSubmission = apps.get_model('evidence', 'EvidenceSubmission')
+    EvidenceFile = apps.get_model('evidence', 'EvidenceFile')
+
+    current = EvidenceSubmission.objects.filter(category=OuterRef('pk'), status__in=ACTIVE).order_by('-due_date', '-pk')
+    open_submission = EvidenceSubmission.objects.filter(category=OuterRef('pk'), status__in=OPEN).order_by('-due_date', '-pk')
+    oldest_pending = EvidenceSubmission.objects.filter(category=OuterRef('pk'), status='PENDING').order_by('due_date')
+    evidence_submission = EvidenceSubmission.objects.filter(
+        category=OuterRef('pk'), status__in=NEEDS_EVIDENCE
+    ).order_by('-due_date', '-pk')
+    latest_file = EvidenceFile.objects.filter(submission__category=OuterRef('pk')).order_by('-uploaded_at', '-pk')
+
+    return (
+        EvidenceCategory.objects.filter(pk__in=category_ids)
+        .annotate(
+            current_submission_id=Subquery(current.values('pk')[:1]),
+            current_submission_status=Subquery(current.values('status')[:1]),
+            open_submission_due_date=Subquery(open_submission.values('due_date')[:1]),
+            oldest_pending_due_date=Subquery(oldest_pending.values('due_date')[:1]),
+            evidence_submission_id=Subquery(evidence_submission.values('pk')[:1]),
+            evidence_submission_status=Subquery(evidence_submission.values('status')[:1]),
+            last_uploaded_at=Subquery(latest_file.values('uploaded_at')[:1]),
+            last_uploaded_by_id=Subquery(latest_file.values('uploaded_by_id')[:1]),
+            latest_file_submission_status=Subquery(latest_file.values('submission__status')[:1]),
+            latest_file_reviewer_id=Subquery(latest_file.values('submission__reviewed_by_id')[:1]),
+        )
+        .annotate(
+            current_submission_has_files=Exists(EvidenceFile.objects.filter(submission_id=OuterRef('current_submission_id'))),
+            evidence_has_files=Exists(EvidenceFile.objects.filter(submission_id=OuterRef('evidence_submission_id'))),
+            approved_by_id=Case(
+                When(latest_file_submission_status='APPROVED', then='latest_file_reviewer_id'),
+                default=None
+            ),
+        )
+        .annotate(
+            score=Case(
+                When(Q(current_submission_status='APPROVED', current_submission_has_files=True), then=Value(100.0)),
+                When(
+                    Q(current_submission_status__in=['SUBMITTED', 'UNDER_REVIEW'], current_submission_has_files=True),
+                    then=Value(50.0)
+                ),
+                default=Value(0.0),
+                output_field=FloatField(),
+            )
+        )
+        .order_by()
+    )
+
+
+def backfill_control_status(apps, schema_editor):
+    """Build ControlStatus for controls that existed before 0015 added the table."""
+    EvidenceCategory = apps.get_model('evidence', 'EvidenceCategory')
+    ControlStatus = apps.get_model('evidence', 'ControlStatus')
+
+    category_ids = list(EvidenceCategory.objects.values_list('pk', flat=True))
+    for start in range(0, len(category_ids), BATCH_SIZE):
+        rows = [
+            ControlStatus(
+                category_id=category.pk,
+                current_submission_id=category.current_submission_id,
+                current_status=category.current_submission_status or '',
+                score=category.score,
+                open_due_date=category.open_submission_due_date,
+                oldest_pending_due_date=category.oldest_pending_due_date,
+                evidence_status=category.evidence_submission_status or '',
+                has_files=category.evidence_has_files,
+                last_uploaded_at=category.last_uploaded_at,
+                last_uploaded_by_id=category.last_uploaded_by_id,
+                approved_by_id=category.approved_by_id,
+            )
+            for category in annotated_categories(apps, category_ids[start:start + BATCH_SIZE])
+        ]
+        ControlStatus.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['category'],
+            update_fields=CONTROL_STATUS_FIELDS,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evidence', '0024_export_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_control_status, migrations.RunPython.noop),
+    ]
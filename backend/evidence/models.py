@@ -1,5 +1,6 @@
 from django.conf import settings
 from django.db import models
+from django.db.models import Case, Exists, FloatField, OuterRef, Q, Subquery, Value, When
 from django.contrib.auth.models import User
 from django.utils import timezone
 from dateutil.relativedelta import relativedelta
@@ -23,6 +24,31 @@ class EvidenceStatus(models.TextChoices):
     REJECTED = 'REJECTED', 'Rejected'
 
 
+class DriveUploadStatus(models.TextChoices):
+    PENDING = 'PENDING', 'Pending'
+    RUNNING = 'RUNNING', 'Running'
+    SUCCEEDED = 'SUCCEEDED', 'Succeeded'
+    FAILED = 'FAILED', 'Failed'
+
+
+class ExportJobStatus(models.TextChoices):
+    PENDING = 'PENDING', 'Pending'
+    RUNNING = 'RUNNING', 'Running'
+    SUCCEEDED = 'SUCCEEDED', 'Succeeded'
+    FAILED = 'FAILED', 'Failed'
+
+
+class ExportFormat(models.TextChoices):
+    EXCEL = 'excel', 'Excel'
+    PDF = 'pdf', 'PDF'
+
+
+class UploadSessionStatus(models.TextChoices):
+    ACTIVE = 'ACTIVE', 'Active'
+    COMPLETED = 'COMPLETED', 'Completed'
+    ABORTED = 'ABORTED', 'Aborted'
+
+
 class CategoryGroup(models.TextChoices):
     # Security (CC6)
     ACCESS_CONTROLS = 'ACCESS_CONTROLS', 'Access Controls'
@@ -49,6 +75,60 @@ class CategoryGroup(models.TextChoices):
     UNCATEGORIZED = 'UNCATEGORIZED', 'Uncategorized'
 
 
+class EvidenceCategoryQuerySet(models.QuerySet):
+    def with_compliance_score(self, reset_overdue=True):
+        """
+        Annotate each category with ``annotated_compliance_score`` in a single query.
+        The current submission is the latest active one by due date: approved with files
+        scores 100, submitted/under review with files scores 50, anything else 0.
+        With reset_overdue, a category whose latest open submission is past due scores 0.
+        """
+        current = EvidenceSubmission.objects.filter(
+            category=OuterRef('pk'),
+            status__in=[EvidenceStatus.PENDING, EvidenceStatus.SUBMITTED,
+                        EvidenceStatus.UNDER_REVIEW, EvidenceStatus.APPROVED]
+        ).order_by('-due_date', '-pk')
+        queryset = self.annotate(
+            current_submission_id=Subquery(current.values('pk')[:1]),
+            current_submission_status=Subquery(current.values('status')[:1]),
+        ).annotate(
+            current_submission_has_files=Exists(
+                EvidenceFile.objects.filter(submission_id=OuterRef('current_submission_id'))
+            )
+        )
+        
+        whens = []
+        if reset_overdue:
+            open_submission = EvidenceSubmission.objects.filter(
+                category=OuterRef('pk'),
+                status__in=[EvidenceStatus.PENDING, EvidenceStatus.SUBMITTED, EvidenceStatus.UNDER_REVIEW]
+            ).order_by('-due_date', '-pk')
+            queryset = queryset.annotate(open_submission_due_date=Subquery(open_submission.values('due_date')[:1]))
+            whens.append(When(open_submission_due_date__lt=timezone.now().date(), then=Value(0.0)))
+        whens += [
+            When(
+                Q(current_submission_status=EvidenceStatus.APPROVED, current_submission_has_files=True),
+                then=Value(100.0)
+            ),
+            When(
+                Q(current_submission_status__in=[EvidenceStatus.SUBMITTED, EvidenceStatus.UNDER_REVIEW],
+                  current_submission_has_files=True),
+                then=Value(50.0)  # Partial credit for submitted evidence
+            ),
+        ]
+        return queryset.annotate(
+            annotated_compliance_score=Case(*whens, default=Value(0.0), output_field=FloatField())
+        )
+    
+    def compliance_scores(self, reset_overdue=True):
+        """Return {category_id: compliance score} for every category in this queryset."""
+        return dict(
+            self.with_compliance_score(reset_overdue=reset_overdue)
+            .order_by()
+            .values_list('pk', 'annotated_compliance_score')
+        )
+
+
 class EvidenceCategory(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField()
@@ -65,6 +145,8 @@ class EvidenceCategory(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
     
+    objects = EvidenceCategoryQuerySet.as_manager()
+    
     def calculate_next_due_date(self, from_date=None):
         if from_date is None:
             base_date = timezone.now()
@@ -101,25 +183,9 @@ class EvidenceCategory(models.Model):
         """
         Calculate compliance score for this category (control).
         Score is 100% if current submission has approved evidence, 0% otherwise.
+        Use EvidenceCategory.objects.compliance_scores() when scoring many categories.
         """
-        # Get current active submission
-        current_submission = self.submissions.filter(
-            status__in=['PENDING', 'SUBMITTED', 'UNDER_REVIEW', 'APPROVED']
-        ).order_by('-due_date').first()
-        
-        if not current_submission:
-            return 0
-        
-        # Check if current submission is approved and has evidence files
-        if current_submission.status == EvidenceStatus.APPROVED and current_submission.files.exists():
-            return 100.0
-        
-        # If submission has files but not yet approved, give partial credit
-        if current_submission.files.exists():
-            if current_submission.status == EvidenceStatus.SUBMITTED or current_submission.status == EvidenceStatus.UNDER_REVIEW:
-                return 50.0  # Partial credit for submitted evidence
-        
-        return 0.0
+        return EvidenceCategory.objects.filter(pk=self.pk).compliance_scores(reset_overdue=False).get(self.pk, 0.0)
     
     def should_reset_compliance_score(self):
         """
@@ -174,6 +240,65 @@ class EvidenceSubmission(models.Model):
     
     class Meta:
         ordering = ['-due_date']
+        indexes = [
+            # Keyset pagination (SubmissionCursorPagination) and its common filters
+            models.Index(fields=['-due_date', '-id']),
+            models.Index(fields=['category', '-due_date', '-id']),
+            models.Index(fields=['status', '-due_date', '-id']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'period_start_date'], name='unique_submission_period'),
+        ]
+
+
+class ControlStatus(models.Model):
+    """
+    Denormalized compliance state for one control, rebuilt by
+    evidence.services.control_status.refresh_control_status(). The
+    post_save/post_delete signals in evidence.signals refresh it whenever a
+    submission or file is saved or deleted (once per transaction, on commit);
+    QuerySet.update() and bulk_create() send no signals, so code using them
+    must call refresh_control_status() itself. Migration 0025 backfills
+    existing controls. Date-dependent flags (overdue, score reset) are stored
+    as due dates and evaluated against today when read.
+    """
+    category = models.OneToOneField(EvidenceCategory, on_delete=models.CASCADE, primary_key=True, related_name='control_status')
+    # Latest active submission (PENDING/SUBMITTED/UNDER_REVIEW/APPROVED by due date) - drives the score
+    current_submission = models.ForeignKey(EvidenceSubmission, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    current_status = models.CharField(max_length=20, choices=EvidenceStatus.choices, blank=True)
+    score = models.FloatField(default=0.0, help_text='Compliance score before the overdue reset')
+    open_due_date = models.DateField(null=True, blank=True, help_text='Due date of the latest open submission; score resets to 0 once it passes')
+    oldest_pending_due_date = models.DateField(null=True, blank=True, db_index=True, help_text='Control is overdue once this date passes')
+    # Latest submission still needing evidence or review (PENDING/SUBMITTED/UNDER_REVIEW/REJECTED by due date)
+    evidence_status = models.CharField(max_length=20, choices=EvidenceStatus.choices, blank=True)
+    has_files = models.BooleanField(default=False)
+    last_uploaded_at = models.DateTimeField(null=True, blank=True)
+    last_uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    approved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    @property
+    def is_overdue(self):
+        return self.oldest_pending_due_date is not None and self.oldest_pending_due_date < timezone.now().date()
+    
+    @property
+    def awaiting_evidence(self):
+        """True when there is no open submission, or it is PENDING/REJECTED without files"""
+        if not self.evidence_status:
+            return True
+        return self.evidence_status in [EvidenceStatus.PENDING, EvidenceStatus.REJECTED] and not self.has_files
+    
+    def compliance_score(self, reset_overdue=True):
+        if reset_overdue and self.open_due_date and self.open_due_date < timezone.now().date():
+            return 0.0
+        return self.score
+    
+    def __str__(self):
+        return f"Status for {self.category.name}"
+    
+    class Meta:
+        verbose_name = "Control Status"
+        verbose_name_plural = "Control Statuses"
 
 
 def evidence_file_upload_path(instance, filename):
@@ -190,6 +315,8 @@ class EvidenceFile(models.Model):
     google_drive_file_url = models.URLField(blank=True, null=True)
     file_size = models.IntegerField()
     mime_type = models.CharField(max_length=100)
+    # SHA-256 of the content; new uploads are stored once per hash (evidence_blobs/...)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
     uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=EvidenceStatus.choices, default=EvidenceStatus.SUBMITTED)
@@ -210,6 +337,11 @@ class EvidenceFile(models.Model):
     
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            # Keyset pagination (EvidenceFileCursorPagination) and its common filters
+            models.Index(fields=['-uploaded_at', '-id']),
+            models.Index(fields=['uploaded_by', '-uploaded_at', '-id']),
+        ]
 
 
 class SubmissionComment(models.Model):
@@ -264,6 +396,17 @@ class Notification(models.Model):
         indexes = [
             models.Index(fields=['user', 'is_read']),
             models.Index(fields=['created_at']),
+            # Keyset pagination (NotificationCursorPagination) of a user's notifications
+            models.Index(fields=['user', '-created_at', '-id']),
+        ]
+        constraints = [
+            # Due-date notifications are created by batch jobs with ignore_conflicts;
+            # at most one of each type per user and submission
+            models.UniqueConstraint(
+                fields=['user', 'submission', 'notification_type'],
+                condition=Q(notification_type__in=['DUE_SOON', 'OVERDUE']),
+                name='unique_due_date_notification'
+            ),
         ]
     
     def __str__(self):
@@ -284,6 +427,9 @@ class GoogleDriveFolderMapping(models.Model):
     # Category group folders - using JSON field to store mapping
     category_group_folder_ids = models.JSONField(default=dict, blank=True)  # {group_code: folder_id}
     
+    # Drive changes.list page token DriveFileIndex was last refreshed from
+    changes_page_token = models.CharField(max_length=255, blank=True, null=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -304,11 +450,167 @@ class UserGoogleDriveToken(models.Model):
     )
     access_token = models.TextField()
     refresh_token = models.TextField(blank=True, null=True)
+    is_organization_default = models.BooleanField(
+        default=False,
+        help_text="Used for Drive uploads/sync when none of the users involved has authenticated with Google"
+    )
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "User Google Drive Token"
         verbose_name_plural = "User Google Drive Tokens"
+        constraints = [
+            # At most one organization token; the partial unique index also serves its lookup
+            models.UniqueConstraint(
+                fields=['is_organization_default'],
+                condition=models.Q(is_organization_default=True),
+                name='unique_organization_drive_token'
+            ),
+        ]
 
     def __str__(self):
         return f"Google Drive token for {self.user.username}"
+
+
+class UploadSession(models.Model):
+    """Chunked, resumable upload of one evidence file; the EvidenceFile is created when it completes"""
+    submission = models.ForeignKey('EvidenceSubmission', on_delete=models.CASCADE, related_name='upload_sessions')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='+')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField(help_text='Total size declared when the upload started')
+    declared_mime_type = models.CharField(max_length=100, blank=True)
+    detected_mime_type = models.CharField(max_length=100, blank=True)
+    notes = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=UploadSessionStatus.choices, default=UploadSessionStatus.ACTIVE)
+    # Where parts are written: 'local' or 's3', the staging path/key and the S3 multipart upload id and parts
+    backend = models.CharField(max_length=20)
+    staging_key = models.CharField(max_length=500, blank=True)
+    backend_upload_id = models.CharField(max_length=255, blank=True)
+    parts = models.JSONField(default=list, blank=True)
+    received_size = models.BigIntegerField(default=0)
+    next_part = models.PositiveIntegerField(default=1)
+    sha256 = models.CharField(max_length=64, blank=True)
+    evidence_file = models.OneToOneField(
+        'EvidenceFile', on_delete=models.SET_NULL, null=True, blank=True, related_name='upload_session'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Upload Session"
+        verbose_name_plural = "Upload Sessions"
+        indexes = [
+            models.Index(fields=['status', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"Upload of {self.filename} ({self.status})"
+
+
+class DriveFileIndex(models.Model):
+    """Local mirror of the app's Google Drive files, kept current through Drive's changes feed"""
+    file_id = models.CharField(max_length=255, unique=True)
+    name = models.CharField(max_length=500)
+    parent_id = models.CharField(max_length=255, blank=True)
+    mime_type = models.CharField(max_length=255, blank=True)
+    md5_checksum = models.CharField(max_length=32, blank=True)
+    sha256_checksum = models.CharField(max_length=64, blank=True)
+    size = models.BigIntegerField(null=True, blank=True)
+    modified_time = models.DateTimeField(null=True, blank=True)
+    web_view_link = models.URLField(max_length=1000, blank=True)
+    indexed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Drive File Index Entry"
+        verbose_name_plural = "Drive File Index"
+        indexes = [
+            models.Index(fields=['parent_id', 'sha256_checksum']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.file_id})"
+
+
+class DriveUploadJob(models.Model):
+    """Queued upload of an approved evidence file to Google Drive, processed by drive_upload_worker"""
+    evidence_file = models.ForeignKey('EvidenceFile', on_delete=models.CASCADE, related_name='drive_upload_jobs')
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    status = models.CharField(max_length=20, choices=DriveUploadStatus.choices, default=DriveUploadStatus.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Drive Upload Job"
+        verbose_name_plural = "Drive Upload Jobs"
+        indexes = [
+            # Worker poll: due PENDING jobs, oldest first
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+        constraints = [
+            # At most one queued/running upload per file
+            models.UniqueConstraint(
+                fields=['evidence_file'],
+                condition=Q(status__in=['PENDING', 'RUNNING']),
+                name='unique_active_drive_upload_job'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Drive upload of {self.evidence_file_id} ({self.status})"
+
+
+class ExportJob(models.Model):
+    """
+    Category groups export rendered in the background by export_worker. Jobs for the same
+    format, filter and data version share one artifact, so repeated exports of unchanged data
+    are served from storage instead of being rendered again.
+    """
+    format = models.CharField(max_length=10, choices=ExportFormat.choices, default=ExportFormat.EXCEL)
+    show_hidden = models.BooleanField(default=False)
+    data_version = models.CharField(max_length=64, help_text='Stamp of the exported data when the job was requested')
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    status = models.CharField(max_length=20, choices=ExportJobStatus.choices, default=ExportJobStatus.PENDING)
+    file = models.FileField(upload_to='exports/', blank=True)
+    filename = models.CharField(max_length=255, blank=True)
+    row_count = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Export Job"
+        verbose_name_plural = "Export Jobs"
+        indexes = [
+            # Artifact cache lookup
+            models.Index(fields=['format', 'show_hidden', 'data_version']),
+            # Worker poll: PENDING jobs, oldest first
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_format_display()} export {self.pk} ({self.status})"
+
+
+class ScheduledJobRun(models.Model):
+    """Marker row recording that a once-per-day batch job has run for a date"""
+    job_name = models.CharField(max_length=100)
+    run_date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Scheduled Job Run"
+        verbose_name_plural = "Scheduled Job Runs"
+        constraints = [
+            models.UniqueConstraint(fields=['job_name', 'run_date'], name='unique_scheduled_job_run'),
+        ]
+
+    def __str__(self):
+        return f"{self.job_name} on {self.run_date}"
@@ -0,0 +1,122 @@
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, _reverse_ordering
+
+
+class EvidenceCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the whole ordering: the cursor holds every ordering value of the
+    row at the page boundary (e.g. due_date and id), and the next page seeks past it with
+    Q(due_date__lt=d) | Q(due_date=d, id__lt=i), which the matching (…, -id) indexes serve
+    directly. (DRF's CursorPagination seeks on the first field only and pages through ties
+    with OFFSET.) Orderings must end with a unique field ('-id').
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor.reverse)
+        position = self.cursor.position if self.cursor else None
+
+        # Previous-page cursors read backwards from the first row of the current page
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        try:
+            if position is not None:
+                queryset = queryset.filter(self.seek_filter(ordering, position))
+
+            # One extra row tells whether there is a page after this one
+            results = list(queryset[:self.page_size + 1])
+        except (ValidationError, TypeError, ValueError):
+            # Cursor values that don't fit the ordering fields (e.g. a due_date that isn't a date)
+            raise NotFound(self.invalid_cursor_message)
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def seek_filter(self, ordering, position):
+        """Rows strictly after `position` in `ordering`, compared field by field"""
+        condition = Q()
+        ties = {}
+        for order, value in zip(ordering, position):
+            field = order.lstrip('-')
+            lookup = 'lt' if order.startswith('-') else 'gt'
+            condition |= Q(**ties, **{f'{field}__{lookup}': value})
+            ties[field] = value
+        return condition
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = self._get_position_from_instance(self.page[-1], self.ordering) if self.page else self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering) if self.page else self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        try:
+            position = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(offset=0, reverse=cursor.reverse, position=position)
+
+    def encode_cursor(self, cursor):
+        return super().encode_cursor(cursor._replace(position=json.dumps(cursor.position)))
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            field = order.lstrip('-')
+            value = instance[field] if isinstance(instance, dict) else getattr(instance, field)
+            values.append(str(value))
+        return values
+
+
+class SubmissionCursorPagination(EvidenceCursorPagination):
+    ordering = ('-due_date', '-id')
+
+
+class EvidenceFileCursorPagination(EvidenceCursorPagination):
+    ordering = ('-uploaded_at', '-id')
+
+
+class NotificationCursorPagination(EvidenceCursorPagination):
+    ordering = ('-created_at', '-id')
+
+
+class DriveUploadJobCursorPagination(EvidenceCursorPagination):
+    ordering = ('-created_at', '-id')
+
+
+class ExportJobCursorPagination(EvidenceCursorPagination):
+    ordering = ('-created_at', '-id')
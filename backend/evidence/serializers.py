@@ -1,11 +1,24 @@
 from rest_framework import serializers
+from django.urls import reverse
 from django.contrib.auth.models import User
 from .models import (
     EvidenceCategory, EvidenceSubmission, EvidenceFile,
-    SubmissionComment, ReminderLog, Notification
+    SubmissionComment, ReminderLog, Notification, DriveUploadJob, UploadSession, ExportJob,
+    ExportJobStatus
 )
 
 
+def api_url(path, request=None):
+    """Absolute URL for an API path under the prefix the request came in on (the API is mounted at /api/ and at /)"""
+    if path.startswith('/api/'):
+        path = path[len('/api'):]
+    if request is None:
+        return path
+    if request.path.startswith('/api/'):
+        path = '/api' + path
+    return request.build_absolute_uri(path)
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -27,12 +40,9 @@ class EvidenceFileSerializer(serializers.ModelSerializer):
                   'status', 'reviewed_by', 'reviewed_at', 'review_notes', 'submission_notes']
     
     def get_file_url(self, obj):
-        """Return the file URL (local file if available, otherwise Google Drive URL)"""
+        """Return the file URL (authenticated download endpoint if stored locally, otherwise Google Drive URL)"""
         if obj.file:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.file.url)
-            return obj.file.url
+            return api_url(reverse('file-download', args=[obj.pk]), self.context.get('request'))
         return obj.google_drive_file_url or ''
     
     def get_submission_notes(self, obj):
@@ -69,7 +79,19 @@ class EvidenceSubmissionSerializer(serializers.ModelSerializer):
                   'is_overdue', 'days_until_due', 'created_at', 'updated_at']
 
 
-class EvidenceCategorySerializer(serializers.ModelSerializer):
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """ModelSerializer that takes an optional `fields` argument limiting which fields are rendered"""
+    
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+
+class EvidenceCategorySerializer(DynamicFieldsModelSerializer):
     assigned_reviewers = UserSerializer(many=True, read_only=True)
     primary_assignee = UserSerializer(read_only=True)
     assignee = UserSerializer(read_only=True)
@@ -101,29 +123,28 @@ class EvidenceCategorySerializer(serializers.ModelSerializer):
                   'current_submission', 'past_submissions', 'compliance_score']
     
     def get_current_submission(self, obj):
-        """Get the current/active submission. Use most recent activity (reviewed_at/submitted_at) so approved submission shows correctly."""
+        """Get the current/active submission. Use most recent activity (reviewed_at/submitted_at) so approved submission shows correctly.
+        Read-only: periods are created by generate_submission_periods, never during serialization.
+        Picks from obj.submissions.all() so a prefetched queryset costs no extra queries."""
         try:
-            from .models import EvidenceStatus, EvidenceSubmission
-            from django.utils import timezone
-            from django.db.models import F
-            from django.db.models.functions import Coalesce
-            from datetime import timedelta
+            from .models import EvidenceStatus
             
-            # Prefer the submission with the most recent activity (reviewed_at, then submitted_at, then due_date)
+            # Prefer the submission with the most recent activity (reviewed_at, then submitted_at, then created_at)
             # so that after approval we show the approved one, not a different PENDING with a later due_date
-            submission = (
-                obj.submissions
-                .annotate(
-                    last_activity=Coalesce(F('reviewed_at'), F('submitted_at'), F('created_at'))
-                )
-                .order_by('-last_activity', '-due_date')
-                .first()
+            submissions = list(obj.submissions.all())
+            if not submissions:
+                return None
+            submission = max(
+                submissions,
+                key=lambda s: (s.reviewed_at or s.submitted_at or s.created_at, s.due_date)
             )
             
+            submission_data = EvidenceSubmissionSerializer(submission, context=self.context).data
+            # Ensure files is always a list (never None or missing)
+            files = submission_data.get('files') or []
+            
             # If we have an APPROVED/REJECTED submission, return it so UI shows correct status
-            if submission and submission.status in [EvidenceStatus.APPROVED, EvidenceStatus.REJECTED]:
-                submission_data = EvidenceSubmissionSerializer(submission, context=self.context).data
-                files = submission_data.get('files') or []
+            if submission.status in [EvidenceStatus.APPROVED, EvidenceStatus.REJECTED]:
                 submission_data['files'] = [
                     f for f in files
                     if f.get('status') in [EvidenceStatus.APPROVED, EvidenceStatus.REJECTED, EvidenceStatus.PENDING,
@@ -131,71 +152,7 @@ class EvidenceCategorySerializer(serializers.ModelSerializer):
                 ]
                 return submission_data
             
-            # If we have PENDING/SUBMITTED/UNDER_REVIEW, use it (and filter files below)
-            if submission:
-                pass  # fall through to serialize below
-            
-            # If still no submission, create one
-            if not submission:
-                today = timezone.now().date()
-                
-                # Check if there's a latest submission to determine the next period
-                latest = obj.submissions.order_by('-period_end_date').first()
-                
-                if not latest or latest.period_end_date < today:
-                    # No submissions exist, or latest period has ended - create new submission
-                    if not latest:
-                        # First submission for this category
-                        start_date = today
-                    else:
-                        # Latest period ended, start new period
-                        start_date = latest.period_end_date + timedelta(days=1)
-                    
-                    due_date_obj = obj.calculate_next_due_date(start_date)
-                    due_date = due_date_obj.date() if hasattr(due_date_obj, 'date') else due_date_obj
-                    
-                    submission = EvidenceSubmission.objects.create(
-                        category=obj,
-                        period_start_date=start_date,
-                        period_end_date=due_date - timedelta(days=1),
-                        due_date=due_date,
-                        status=EvidenceStatus.PENDING
-                    )
-                else:
-                    # Latest submission period hasn't ended, but it's APPROVED/REJECTED
-                    # Create a new PENDING submission for the current period starting today
-                    start_date = today
-                    # Use the latest submission's due_date if it's in the future, otherwise calculate new one
-                    if latest.due_date > today:
-                        due_date = latest.due_date
-                        period_end_date = latest.period_end_date
-                    else:
-                        due_date_obj = obj.calculate_next_due_date(start_date)
-                        due_date = due_date_obj.date() if hasattr(due_date_obj, 'date') else due_date_obj
-                        period_end_date = due_date - timedelta(days=1)
-                    
-                    submission = EvidenceSubmission.objects.create(
-                        category=obj,
-                        period_start_date=start_date,
-                        period_end_date=period_end_date,
-                        due_date=due_date,
-                        status=EvidenceStatus.PENDING
-                    )
-       
-            if not submission:
-                return None
-            
-            # Serialize the submission
-            submission_data = EvidenceSubmissionSerializer(submission, context=self.context).data
-            
             # Filter files to include those with status PENDING, SUBMITTED, or UNDER_REVIEW
-            # Ensure files is always a list (never None or missing)
-            files = submission_data.get('files')
-            if files is None:
-                files = []
-            elif not isinstance(files, list):
-                files = []
-            
             submission_data['files'] = [
                 file for file in files
                 if file.get('status') in [EvidenceStatus.PENDING, EvidenceStatus.SUBMITTED, EvidenceStatus.UNDER_REVIEW]
@@ -210,47 +167,29 @@ class EvidenceCategorySerializer(serializers.ModelSerializer):
         return None
     
     def get_compliance_score(self, obj):
-        """Calculate and return compliance score for this category"""
-        # Check if score should be reset
-        if obj.should_reset_compliance_score():
-            return 0
+        """Return compliance score for this category, using bulk scores from context when available"""
+        compliance_scores = self.context.get('compliance_scores')
+        if compliance_scores is not None and obj.pk in compliance_scores:
+            return compliance_scores[obj.pk]
         
-        return obj.calculate_compliance_score()
+        return EvidenceCategory.objects.filter(pk=obj.pk).compliance_scores().get(obj.pk, 0)
     
     def get_past_submissions(self, obj):
         """Get submissions with files filtered to only include status 'APPROVED' or 'REJECTED'"""
         try:
-            from django.db.models import Q
-            from .models import EvidenceStatus
+            from django.db.models import prefetch_related_objects
             
-            # Get submissions that have files with status APPROVED or REJECTED
-            submissions = obj.submissions.filter(
-                Q(status__in=[EvidenceStatus.APPROVED, EvidenceStatus.REJECTED]) |
-                Q(files__status__in=[EvidenceStatus.APPROVED, EvidenceStatus.REJECTED])
-            ).distinct().order_by('-due_date')[:10]
+            # Loaded for the whole page by past_submissions_prefetch(); fetch on demand otherwise
+            if not hasattr(obj, 'past_submission_list'):
+                prefetch_related_objects([obj], past_submissions_prefetch())
             
-            # Serialize each submission and filter files
-            result = []
-            for submission in submissions:
-                submission_data = EvidenceSubmissionSerializer(submission, context=self.context).data
-                
-                # Filter files to only include those with status APPROVED or REJECTED
-                # Ensure files is always a list (never None or missing)
-                files = submission_data.get('files')
-                if files is None:
-                    files = []
-                elif not isinstance(files, list):
-                    files = []
-                
-                submission_data['files'] = [
-                    file for file in files
-                    if file.get('status') in [EvidenceStatus.APPROVED, EvidenceStatus.REJECTED]
-                ]
-                # Only include submissions that have at least one approved/rejected file
-                if submission_data['files']:
-                    result.append(submission_data)
-            
-            return result
+            # Files are already limited to APPROVED/REJECTED by the prefetch.
+            # Only include submissions that have at least one approved/rejected file
+            return [
+                EvidenceSubmissionSerializer(submission, context=self.context).data
+                for submission in obj.past_submission_list
+                if submission.files.all()
+            ]
         except Exception as e:
             # Log error but don't break the request
             import logging
@@ -259,6 +198,34 @@ class EvidenceCategorySerializer(serializers.ModelSerializer):
         return []
 
 
+def past_submissions_prefetch():
+    """
+    Prefetch the last 10 submissions per category that are APPROVED/REJECTED or have an
+    APPROVED/REJECTED file, stored on category.past_submission_list, with only their
+    APPROVED/REJECTED files. The slice is applied per category (ROW_NUMBER() partitioned
+    by category), so a whole page of categories is loaded in one query per level.
+    """
+    from django.db.models import Exists, OuterRef, Prefetch, Q
+    from .models import EvidenceStatus
+    
+    reviewed_statuses = [EvidenceStatus.APPROVED, EvidenceStatus.REJECTED]
+    reviewed_files = EvidenceFile.objects.filter(status__in=reviewed_statuses)
+    submissions = (
+        EvidenceSubmission.objects
+        .filter(
+            Q(status__in=reviewed_statuses) |
+            Exists(reviewed_files.filter(submission=OuterRef('pk')))
+        )
+        .select_related('submitted_by', 'reviewed_by')
+        .prefetch_related(
+            Prefetch('files', queryset=reviewed_files.select_related('uploaded_by', 'reviewed_by')),
+            Prefetch('comments', queryset=SubmissionComment.objects.select_related('user'))
+        )
+        .order_by('-due_date')
+    )
+    return Prefetch('submissions', queryset=submissions[:10], to_attr='past_submission_list')
+
+
 # Alias for backward compatibility - both serializers now have the same functionality
 EvidenceCategoryDetailSerializer = EvidenceCategorySerializer
 
@@ -289,6 +256,43 @@ class NotificationSerializer(serializers.ModelSerializer):
                   'category_id', 'submission', 'submission_id', 'is_read', 'created_at']
 
 
+class DriveUploadJobSerializer(serializers.ModelSerializer):
+    filename = serializers.CharField(source='evidence_file.filename', read_only=True)
+    google_drive_file_url = serializers.URLField(source='evidence_file.google_drive_file_url', read_only=True)
+    
+    class Meta:
+        model = DriveUploadJob
+        fields = ['id', 'evidence_file', 'filename', 'status', 'attempts', 'max_attempts', 'next_attempt_at',
+                  'last_error', 'google_drive_file_url', 'created_at', 'started_at', 'finished_at']
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    part_size = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'submission', 'filename', 'size', 'status', 'part_size', 'next_part', 'received_size',
+                  'detected_mime_type', 'evidence_file', 'created_at', 'updated_at']
+    
+    def get_part_size(self, obj):
+        from .services.chunked_uploads import part_size
+        return part_size()
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ExportJob
+        fields = ['id', 'format', 'show_hidden', 'status', 'row_count', 'filename', 'download_url', 'last_error',
+                  'created_at', 'started_at', 'finished_at']
+    
+    def get_download_url(self, obj):
+        if obj.status != ExportJobStatus.SUCCEEDED or not obj.file:
+            return None
+        return api_url(reverse('export-job-download', args=[obj.pk]), self.context.get('request'))
+
+
 class CategoryGroupAnalyticsSerializer(serializers.Serializer):
     group_code = serializers.CharField()
     group_label = serializers.CharField()
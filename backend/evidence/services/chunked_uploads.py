@@ -0,0 +1,393 @@
+import hashlib
+import io
+import mimetypes
+import os
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.utils import timezone
+from evidence.models import EvidenceFile, UploadSession, UploadSessionStatus
+from evidence.services.evidence_storage import content_address, evidence_storage
+
+READ_CHUNK_SIZE = 64 * 1024
+
+# Leading bytes of common evidence formats; anything else falls back to the file extension
+MIME_SIGNATURES = [
+    (b'%PDF-', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'\x1f\x8b', 'application/gzip'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/x-ole-storage'),
+]
+
+# Running SHA-256 per session in this process: {session id: (bytes hashed, hasher, last used)}, least
+# recently used first. hashlib state can't be saved to the database, so a session whose parts land on
+# different processes is hashed from storage when it completes instead. The same happens to sessions
+# evicted here: at most HASHER_CACHE_SIZE are kept, and none idle for longer than HASHER_IDLE_SECONDS,
+# so abandoned uploads don't pile up.
+HASHER_CACHE_SIZE = 256
+HASHER_IDLE_SECONDS = 3600
+_hashers = OrderedDict()
+_hashers_lock = threading.Lock()
+
+
+class ChunkedUploadError(Exception):
+    """A client error in an upload session (wrong part, size mismatch, ...); status_code is the HTTP status to return"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ImproperlyConfiguredUpload(ChunkedUploadError):
+    """The configured upload backend can't be used"""
+
+    def __init__(self, message):
+        super().__init__(message, status_code=500)
+
+
+def _take_hasher(session_id):
+    """Remove and return (bytes hashed, hasher) kept for a session, or (0, None)"""
+    with _hashers_lock:
+        hashed_size, hasher, _ = _hashers.pop(session_id, (0, None, None))
+    return hashed_size, hasher
+
+
+def _keep_hasher(session_id, hashed_size, hasher):
+    """Keep a session's running hash for its next part, evicting old and idle entries"""
+    now = time.monotonic()
+    with _hashers_lock:
+        _hashers[session_id] = (hashed_size, hasher, now)
+        while len(_hashers) > HASHER_CACHE_SIZE:
+            _hashers.popitem(last=False)
+        while _hashers:
+            oldest_id, (_, _, last_used) = next(iter(_hashers.items()))
+            if now - last_used <= HASHER_IDLE_SECONDS:
+                break
+            del _hashers[oldest_id]
+
+
+def detect_mime_type(head, filename, declared_mime_type=''):
+    """MIME type from the file's first bytes, falling back to its extension, then to what the client declared"""
+    guessed, _ = mimetypes.guess_type(filename)
+    for signature, mime_type in MIME_SIGNATURES:
+        if head.startswith(signature):
+            # OLE containers (legacy Office files) are told apart by extension
+            if mime_type == 'application/x-ole-storage':
+                return guessed or declared_mime_type or 'application/octet-stream'
+            return mime_type
+    if head.startswith(b'PK\x03\x04'):
+        # ZIP container: docx/xlsx/pptx are identified by extension
+        return guessed or 'application/zip'
+    return guessed or declared_mime_type or 'application/octet-stream'
+
+
+class LocalDiskUploadBackend:
+    """Parts are written in place into one staging file under MEDIA_ROOT, which is moved to its final path on completion"""
+    name = 'local'
+
+    def start(self, session):
+        session.staging_key = f'upload_sessions/{session.pk}.part'
+        path = self._path(session.staging_key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, 'wb').close()
+
+    def write_part(self, session, part_number, offset, chunks):
+        written = 0
+        with open(self._path(session.staging_key), 'r+b') as staging_file:
+            staging_file.seek(offset)
+            for chunk in chunks:
+                staging_file.write(chunk)
+                written += len(chunk)
+            # Drop anything left over from an earlier, interrupted attempt at this part
+            staging_file.truncate(offset + written)
+        return written
+
+    def assemble(self, session):
+        pass
+
+    def read(self, session):
+        with open(self._path(session.staging_key), 'rb') as staging_file:
+            while True:
+                chunk = staging_file.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    def store(self, session, final_name):
+        staging_path = self._path(session.staging_key)
+        if evidence_storage().exists(final_name):
+            os.remove(staging_path)
+        else:
+            final_path = self._path(final_name)
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(staging_path, final_path)
+        return final_name
+
+    def abort(self, session):
+        if session.staging_key:
+            try:
+                os.remove(self._path(session.staging_key))
+            except FileNotFoundError:
+                pass
+
+    def _path(self, name):
+        return evidence_storage().path(name)
+
+
+class S3UploadBackend:
+    """
+    Parts go straight to an S3 multipart upload (any S3-compatible endpoint, e.g. MinIO for local
+    testing). Evidence storage must be the same bucket (django-storages) for file URLs to resolve.
+    """
+    name = 's3'
+
+    def __init__(self):
+        try:
+            import boto3
+        except ImportError:
+            raise ImproperlyConfiguredUpload("CHUNKED_UPLOAD_BACKEND is 's3' but boto3 is not installed (pip install boto3).")
+        self.bucket = settings.CHUNKED_UPLOAD_S3_BUCKET
+        self.client = boto3.client(
+            's3',
+            endpoint_url=settings.CHUNKED_UPLOAD_S3_ENDPOINT_URL or None,
+            region_name=settings.CHUNKED_UPLOAD_S3_REGION or None,
+        )
+
+    def start(self, session):
+        session.staging_key = f'upload_sessions/{session.pk}'
+        response = self.client.create_multipart_upload(Bucket=self.bucket, Key=session.staging_key)
+        session.backend_upload_id = response['UploadId']
+
+    def write_part(self, session, part_number, offset, chunks):
+        # S3 needs each part's length up front; a part is at most CHUNKED_UPLOAD_PART_SIZE
+        body = io.BytesIO()
+        for chunk in chunks:
+            body.write(chunk)
+        written = body.tell()
+        body.seek(0)
+        response = self.client.upload_part(
+            Bucket=self.bucket,
+            Key=session.staging_key,
+            UploadId=session.backend_upload_id,
+            PartNumber=part_number,
+            Body=body,
+        )
+        parts = [part for part in session.parts if part['PartNumber'] != part_number]
+        parts.append({'PartNumber': part_number, 'ETag': response['ETag']})
+        session.parts = sorted(parts, key=lambda part: part['PartNumber'])
+        return written
+
+    def assemble(self, session):
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=session.staging_key,
+            UploadId=session.backend_upload_id,
+            MultipartUpload={'Parts': session.parts},
+        )
+
+    def read(self, session):
+        body = self.client.get_object(Bucket=self.bucket, Key=session.staging_key)['Body']
+        yield from body.iter_chunks(READ_CHUNK_SIZE)
+
+    def store(self, session, final_name):
+        if not evidence_storage().exists(final_name):
+            self.client.copy_object(
+                Bucket=self.bucket,
+                Key=final_name,
+                CopySource={'Bucket': self.bucket, 'Key': session.staging_key},
+            )
+        self.client.delete_object(Bucket=self.bucket, Key=session.staging_key)
+        return final_name
+
+    def abort(self, session):
+        if session.backend_upload_id:
+            try:
+                self.client.abort_multipart_upload(
+                    Bucket=self.bucket, Key=session.staging_key, UploadId=session.backend_upload_id
+                )
+            except self.client.exceptions.NoSuchUpload:
+                pass
+        self.client.delete_object(Bucket=self.bucket, Key=session.staging_key)
+
+
+UPLOAD_BACKENDS = {
+    LocalDiskUploadBackend.name: LocalDiskUploadBackend,
+    S3UploadBackend.name: S3UploadBackend,
+}
+
+
+def get_upload_backend(name=None):
+    name = name or getattr(settings, 'CHUNKED_UPLOAD_BACKEND', 'local')
+    if name not in UPLOAD_BACKENDS:
+        raise ImproperlyConfiguredUpload(f"Unknown CHUNKED_UPLOAD_BACKEND '{name}'")
+    return UPLOAD_BACKENDS[name]()
+
+
+def part_size():
+    return getattr(settings, 'CHUNKED_UPLOAD_PART_SIZE', 8 * 1024 * 1024)
+
+
+def start_upload(submission, user, filename, size, mime_type='', notes=''):
+    """Open an upload session for one file of `size` bytes, to be sent in parts of part_size() bytes"""
+    max_size = getattr(settings, 'CHUNKED_UPLOAD_MAX_SIZE', 5 * 1024 ** 3)
+    if size <= 0:
+        raise ChunkedUploadError('size must be greater than 0.')
+    if size > max_size:
+        raise ChunkedUploadError(f'File is too large (maximum {max_size} bytes).', status_code=413)
+
+    backend = get_upload_backend()
+    session = UploadSession.objects.create(
+        submission=submission,
+        created_by=user,
+        filename=os.path.basename(filename)[:255],
+        size=size,
+        declared_mime_type=(mime_type or '')[:100],
+        notes=notes or '',
+        backend=backend.name,
+    )
+    backend.start(session)
+    session.save(update_fields=['staging_key', 'backend_upload_id'])
+    return session
+
+
+def upload_part(session, part_number, stream):
+    """
+    Write part `part_number` (1-based) from a readable stream straight to the session's backend.
+    Parts are sent in order; every part but the last is exactly part_size() bytes. Re-sending
+    the last accepted part is allowed (e.g. after a lost response). Returns the updated session.
+    """
+    if session.status != UploadSessionStatus.ACTIVE:
+        raise ChunkedUploadError(f'Upload is {session.status.lower()}.', status_code=409)
+    if session.sha256:
+        raise ChunkedUploadError('Upload has already been stored; complete it.', status_code=409)
+    expected_size = part_size()
+    if part_number == session.next_part - 1 and part_number >= 1:
+        # Retry of the previous part: rewind to where it started
+        offset = (part_number - 1) * expected_size
+    elif part_number == session.next_part:
+        offset = session.received_size
+    else:
+        raise ChunkedUploadError(
+            f'Expected part {session.next_part}, got part {part_number}.', status_code=409
+        )
+    remaining = session.size - offset
+    if remaining <= 0:
+        raise ChunkedUploadError('All parts have already been received.', status_code=409)
+    part_limit = min(expected_size, remaining)
+
+    hashed_size, hasher = _take_hasher(session.pk)
+    if offset == 0:
+        hasher = hashlib.sha256()
+    elif hasher is None or hashed_size != offset:
+        # Earlier parts went to another process (or this is a retry): hash from storage on completion
+        hasher = None
+
+    head = bytearray()
+    received = 0
+
+    def read_chunks():
+        nonlocal received
+        while True:
+            chunk = stream.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            received += len(chunk)
+            if received > part_limit:
+                raise ChunkedUploadError(f'Part {part_number} is larger than {part_limit} bytes.', status_code=413)
+            if offset == 0 and len(head) < 512:
+                head.extend(chunk[:512 - len(head)])
+            if hasher is not None:
+                hasher.update(chunk)
+            yield chunk
+
+    backend = get_upload_backend(session.backend)
+    written = backend.write_part(session, part_number, offset, read_chunks())
+    if written != part_limit:
+        raise ChunkedUploadError(
+            f'Part {part_number} must be {part_limit} bytes, received {written}.'
+        )
+
+    update = {
+        'received_size': offset + written,
+        'next_part': part_number + 1,
+        'parts': session.parts,
+    }
+    if offset == 0:
+        update['detected_mime_type'] = detect_mime_type(bytes(head), session.filename, session.declared_mime_type)
+    # Only advance if no other request moved the session on meanwhile
+    updated = UploadSession.objects.filter(
+        pk=session.pk, status=UploadSessionStatus.ACTIVE, next_part=session.next_part
+    ).update(updated_at=timezone.now(), **update)
+    if not updated:
+        raise ChunkedUploadError('Upload was changed by another request; fetch its status and resume.', status_code=409)
+    for field, value in update.items():
+        setattr(session, field, value)
+
+    if hasher is not None:
+        _keep_hasher(session.pk, offset + written, hasher)
+    return session
+
+
+def complete_upload(session):
+    """
+    Store an upload whose parts have all been received at its content-addressed location
+    (identical content is stored once) and return the file details for the new EvidenceFile:
+    {'filename', 'stored_name', 'sha256', 'size', 'mime_type', 'notes'}. The session stays
+    ACTIVE until mark_upload_completed() links it to that EvidenceFile, so if creating the
+    file fails the client can call this again (the stored blob is reused).
+    """
+    if session.status != UploadSessionStatus.ACTIVE:
+        raise ChunkedUploadError(f'Upload is {session.status.lower()}.', status_code=409)
+    if session.received_size != session.size:
+        raise ChunkedUploadError(
+            f'Upload is incomplete: received {session.received_size} of {session.size} bytes.'
+        )
+
+    if session.sha256:
+        # Stored by an earlier attempt whose EvidenceFile wasn't created
+        stored_name = content_address(session.sha256, session.filename)
+    else:
+        backend = get_upload_backend(session.backend)
+        backend.assemble(session)
+
+        hashed_size, hasher = _take_hasher(session.pk)
+        if hasher is None or hashed_size != session.size:
+            hasher = hashlib.sha256()
+            for chunk in backend.read(session):
+                hasher.update(chunk)
+        session.sha256 = hasher.hexdigest()
+
+        stored_name = backend.store(session, content_address(session.sha256, session.filename))
+        session.save(update_fields=['sha256', 'updated_at'])
+    return {
+        'filename': session.filename,
+        'stored_name': stored_name,
+        'sha256': session.sha256,
+        'size': session.size,
+        'mime_type': session.detected_mime_type or session.declared_mime_type or 'application/octet-stream',
+        'notes': session.notes,
+    }
+
+
+def mark_upload_completed(session, evidence_file):
+    """Close the session once its EvidenceFile exists; call in the transaction that created the file"""
+    session.evidence_file = evidence_file
+    session.status = UploadSessionStatus.COMPLETED
+    session.save(update_fields=['evidence_file', 'status', 'updated_at'])
+
+
+def abort_upload(session):
+    """Discard an unfinished upload and its stored parts (and its stored blob, if no file uses it)"""
+    _take_hasher(session.pk)
+    if session.status == UploadSessionStatus.ACTIVE:
+        get_upload_backend(session.backend).abort(session)
+        if session.sha256:
+            stored_name = content_address(session.sha256, session.filename)
+            if not EvidenceFile.objects.filter(file=stored_name).exists():
+                evidence_storage().delete(stored_name)
+        session.status = UploadSessionStatus.ABORTED
+        session.save(update_fields=['status', 'updated_at'])
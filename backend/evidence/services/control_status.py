@@ -0,0 +1,129 @@
+import threading
+from django.db import connection, transaction
+from django.db.models import Case, Exists, OuterRef, Subquery, When
+from evidence.models import ControlStatus, EvidenceCategory, EvidenceFile, EvidenceStatus, EvidenceSubmission
+
+REFRESH_BATCH_SIZE = 500
+
+# Category ids waiting for the current transaction to commit (connections are per thread)
+_pending_refresh = threading.local()
+
+CONTROL_STATUS_FIELDS = [
+    'current_submission', 'current_status', 'score', 'open_due_date', 'oldest_pending_due_date',
+    'evidence_status', 'has_files', 'last_uploaded_at', 'last_uploaded_by', 'approved_by', 'updated_at',
+]
+
+
+def _annotated_categories(category_ids):
+    """Compute every ControlStatus field for the given categories in a single query."""
+    open_submission = EvidenceSubmission.objects.filter(
+        category=OuterRef('pk'),
+        status__in=[EvidenceStatus.PENDING, EvidenceStatus.SUBMITTED, EvidenceStatus.UNDER_REVIEW]
+    ).order_by('-due_date', '-pk')
+    oldest_pending = EvidenceSubmission.objects.filter(
+        category=OuterRef('pk'),
+        status=EvidenceStatus.PENDING
+    ).order_by('due_date')
+    evidence_submission = EvidenceSubmission.objects.filter(
+        category=OuterRef('pk'),
+        status__in=[EvidenceStatus.PENDING, EvidenceStatus.SUBMITTED,
+                    EvidenceStatus.UNDER_REVIEW, EvidenceStatus.REJECTED]
+    ).order_by('-due_date', '-pk')
+    latest_file = EvidenceFile.objects.filter(
+        submission__category=OuterRef('pk')
+    ).order_by('-uploaded_at', '-pk')
+
+    return (
+        EvidenceCategory.objects.filter(pk__in=category_ids)
+        .with_compliance_score(reset_overdue=False)
+        .annotate(
+            open_submission_due_date=Subquery(open_submission.values('due_date')[:1]),
+            oldest_pending_due_date=Subquery(oldest_pending.values('due_date')[:1]),
+            evidence_submission_id=Subquery(evidence_submission.values('pk')[:1]),
+            evidence_submission_status=Subquery(evidence_submission.values('status')[:1]),
+            last_uploaded_at=Subquery(latest_file.values('uploaded_at')[:1]),
+            last_uploaded_by_id=Subquery(latest_file.values('uploaded_by_id')[:1]),
+            latest_file_submission_status=Subquery(latest_file.values('submission__status')[:1]),
+            latest_file_reviewer_id=Subquery(latest_file.values('submission__reviewed_by_id')[:1]),
+        )
+        .annotate(
+            evidence_has_files=Exists(EvidenceFile.objects.filter(submission_id=OuterRef('evidence_submission_id'))),
+            approved_by_id=Case(
+                When(latest_file_submission_status=EvidenceStatus.APPROVED, then='latest_file_reviewer_id'),
+                default=None
+            ),
+        )
+        .order_by()
+    )
+
+
+def refresh_control_status(category_ids=None):
+    """
+    Recompute and upsert ControlStatus rows for the given category ids (all categories when None).
+    Model saves/deletes are covered by evidence.signals; call this after QuerySet.update() or
+    bulk_create() on a control's submissions or files.
+    Returns the number of rows written.
+    """
+    if category_ids is None:
+        category_ids = EvidenceCategory.objects.values_list('pk', flat=True)
+    category_ids = list(category_ids)
+
+    written = 0
+    for start in range(0, len(category_ids), REFRESH_BATCH_SIZE):
+        batch = category_ids[start:start + REFRESH_BATCH_SIZE]
+        rows = [
+            ControlStatus(
+                category_id=category.pk,
+                current_submission_id=category.current_submission_id,
+                current_status=category.current_submission_status or '',
+                score=category.annotated_compliance_score,
+                open_due_date=category.open_submission_due_date,
+                oldest_pending_due_date=category.oldest_pending_due_date,
+                evidence_status=category.evidence_submission_status or '',
+                has_files=category.evidence_has_files,
+                last_uploaded_at=category.last_uploaded_at,
+                last_uploaded_by_id=category.last_uploaded_by_id,
+                approved_by_id=category.approved_by_id,
+            )
+            for category in _annotated_categories(batch)
+        ]
+        ControlStatus.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['category'],
+            update_fields=CONTROL_STATUS_FIELDS,
+        )
+        written += len(rows)
+    return written
+
+
+def get_control_status(category):
+    """Return the category's ControlStatus, or None if it has not been built yet."""
+    try:
+        return category.control_status
+    except ControlStatus.DoesNotExist:
+        return None
+
+
+def _refresh_pending():
+    category_ids = getattr(_pending_refresh, 'category_ids', None)
+    _pending_refresh.category_ids = set()
+    if category_ids:
+        refresh_control_status(category_ids)
+
+
+def schedule_control_status_refresh(category_ids):
+    """
+    Refresh these controls' ControlStatus once the current transaction commits, batched with
+    every other control changed in it; outside a transaction, refresh right away.
+    Used by the EvidenceSubmission/EvidenceFile save and delete signals.
+    """
+    if not connection.in_atomic_block:
+        refresh_control_status(category_ids)
+        return
+    if getattr(_pending_refresh, 'category_ids', None) is None:
+        _pending_refresh.category_ids = set()
+    _pending_refresh.category_ids.update(category_ids)
+    # Registered per change: after a rollback the ids stay pending and go with the next commit.
+    # Callbacks after the first find nothing pending.
+    transaction.on_commit(_refresh_pending)
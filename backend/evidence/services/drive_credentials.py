@@ -0,0 +1,38 @@
+from django.db.models import Q
+from evidence.models import UserGoogleDriveToken
+
+
+def resolve_drive_credentials(category=None, submission=None, request=None, requested_by=None):
+    """
+    Google Drive tokens for an upload or sync, in order of preference: the request's session,
+    then the stored token of the user acting (request user / requested_by), the control's
+    assignee, the submitter, and finally the organization token. All stored tokens are
+    fetched in one query. Returns (access_token, refresh_token) or (None, None).
+    """
+    if request is not None:
+        access_token = request.session.get('google_access_token')
+        if access_token:
+            return access_token, request.session.get('google_refresh_token')
+        if request.user.is_authenticated:
+            requested_by = request.user
+
+    user_ids_to_try = [
+        requested_by.pk if requested_by else None,
+        category.assignee_id if category else None,
+        submission.submitted_by_id if submission else None,
+    ]
+    user_ids_to_try = [user_id for user_id in user_ids_to_try if user_id]
+
+    tokens = list(UserGoogleDriveToken.objects.filter(
+        Q(user_id__in=user_ids_to_try) | Q(is_organization_default=True)
+    ))
+    tokens_by_user = {token.user_id: token for token in tokens}
+    for user_id in user_ids_to_try:
+        if user_id in tokens_by_user:
+            token = tokens_by_user[user_id]
+            return token.access_token, token.refresh_token
+
+    for token in tokens:
+        if token.is_organization_default:
+            return token.access_token, token.refresh_token
+    return None, None
@@ -0,0 +1,118 @@
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from evidence.models import DriveFileIndex, EvidenceFile, GoogleDriveFolderMapping
+
+UPSERT_BATCH_SIZE = 500
+
+
+def _index_entry(drive_file):
+    size = drive_file.get('size')
+    modified_time = drive_file.get('modifiedTime')
+    return DriveFileIndex(
+        file_id=drive_file['id'],
+        name=drive_file.get('name', '')[:500],
+        parent_id=(drive_file.get('parents') or [''])[0],
+        mime_type=drive_file.get('mimeType', ''),
+        md5_checksum=drive_file.get('md5Checksum', ''),
+        sha256_checksum=drive_file.get('sha256Checksum', ''),
+        size=int(size) if size else None,
+        modified_time=parse_datetime(modified_time) if modified_time else None,
+        web_view_link=drive_file.get('webViewLink', ''),
+    )
+
+
+def _upsert(entries):
+    DriveFileIndex.objects.bulk_create(
+        entries,
+        batch_size=UPSERT_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['file_id'],
+        update_fields=['name', 'parent_id', 'mime_type', 'md5_checksum', 'sha256_checksum', 'size', 'modified_time', 'web_view_link', 'indexed_at'],
+    )
+
+
+def refresh_drive_index(drive_service, full=False):
+    """
+    Bring DriveFileIndex up to date. The first run (or full=True) lists every file the app can
+    see; later runs only apply what Drive's changes feed reports since the saved page token.
+    Returns stats: {'mode', 'indexed', 'removed'}.
+    """
+    folder_mapping, _ = GoogleDriveFolderMapping.objects.get_or_create(id=1)
+
+    if full or not folder_mapping.changes_page_token:
+        # Take the token before listing so changes made while listing are picked up next time
+        page_token = drive_service.get_start_page_token()
+        started = timezone.now()
+        indexed = 0
+        entries = []
+        for drive_file in drive_service.iter_files(query='trashed = false'):
+            entries.append(_index_entry(drive_file))
+            if len(entries) >= UPSERT_BATCH_SIZE:
+                _upsert(entries)
+                indexed += len(entries)
+                entries = []
+        _upsert(entries)
+        indexed += len(entries)
+        # Rows not touched by this listing are gone from Drive
+        removed, _ = DriveFileIndex.objects.filter(indexed_at__lt=started).delete()
+        stats = {'mode': 'full', 'indexed': indexed, 'removed': removed}
+    else:
+        changes, page_token = drive_service.list_changes(folder_mapping.changes_page_token)
+        upserts = {}
+        removed_ids = set()
+        for change in changes:
+            drive_file = change.get('file')
+            if change.get('removed') or not drive_file or drive_file.get('trashed'):
+                removed_ids.add(change['fileId'])
+                upserts.pop(change['fileId'], None)
+            else:
+                upserts[drive_file['id']] = _index_entry(drive_file)
+                removed_ids.discard(drive_file['id'])
+        _upsert(list(upserts.values()))
+        removed_ids = list(removed_ids)
+        removed = 0
+        for start in range(0, len(removed_ids), UPSERT_BATCH_SIZE):
+            removed += DriveFileIndex.objects.filter(file_id__in=removed_ids[start:start + UPSERT_BATCH_SIZE]).delete()[0]
+        stats = {'mode': 'changes', 'indexed': len(upserts), 'removed': removed}
+
+    folder_mapping.changes_page_token = page_token
+    folder_mapping.save(update_fields=['changes_page_token', 'updated_at'])
+    return stats
+
+
+def drive_copies_by_folder(folder_ids):
+    """
+    Content already on Drive in these folders: {(folder_id, sha256): (file_id, web_url)}, from the
+    Drive index and from evidence files that were uploaded before (two queries).
+    """
+    copies = {}
+    entries = DriveFileIndex.objects.filter(parent_id__in=folder_ids).exclude(sha256_checksum='').values_list(
+        'parent_id', 'sha256_checksum', 'file_id', 'web_view_link'
+    )
+    for parent_id, sha256, file_id, web_view_link in entries:
+        copies[(parent_id, sha256)] = (file_id, web_view_link)
+    uploaded = EvidenceFile.objects.filter(
+        submission__category__google_drive_folder_id__in=folder_ids,
+        google_drive_file_id__isnull=False
+    ).exclude(sha256='').values_list(
+        'submission__category__google_drive_folder_id', 'sha256', 'google_drive_file_id', 'google_drive_file_url'
+    )
+    for folder_id, sha256, file_id, web_url in uploaded:
+        copies.setdefault((folder_id, sha256), (file_id, web_url))
+    return copies
+
+
+def find_drive_copy(sha256, folder_id):
+    """(file_id, web_url) of a Drive file with this content in the folder, or None"""
+    if not sha256:
+        return None
+    copy = DriveFileIndex.objects.filter(parent_id=folder_id, sha256_checksum=sha256).values_list(
+        'file_id', 'web_view_link'
+    ).first()
+    if copy:
+        return copy
+    return EvidenceFile.objects.filter(
+        submission__category__google_drive_folder_id=folder_id,
+        sha256=sha256,
+        google_drive_file_id__isnull=False
+    ).values_list('google_drive_file_id', 'google_drive_file_url').first()
@@ -0,0 +1,352 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+from evidence.models import (
+    CategoryGroup, DriveUploadJob, DriveUploadStatus, EvidenceCategory, EvidenceFile,
+    EvidenceStatus, GoogleDriveFolderMapping
+)
+from evidence.services.drive_index import drive_copies_by_folder, refresh_drive_index
+from evidence.services.drive_uploads import enqueue_drive_uploads, upload_evidence_file
+from evidence.services.evidence_storage import hash_evidence_file
+from evidence.services.google_drive import BATCH_LIMIT, GoogleDriveService
+
+logger = logging.getLogger(__name__)
+
+# Parent categories and their subcategories (category groups)
+FOLDER_STRUCTURE = {
+    'Security (CC6)': [
+        'ACCESS_CONTROLS',
+        'NETWORK_SECURITY',
+        'PHYSICAL_SECURITY',
+        'DATA_PROTECTION',
+        'ENDPOINT_SECURITY',
+        'MONITORING_INCIDENT'
+    ],
+    'Availability (CC7)': [
+        'INFRASTRUCTURE_CAPACITY',
+        'BACKUP_RECOVERY',
+        'BUSINESS_CONTINUITY'
+    ],
+    'Confidentiality (CC8)': [
+        'CONFIDENTIALITY'
+    ],
+    'Common Criteria (CC1-CC5)': [
+        'CONTROL_ENVIRONMENT',
+        'COMMUNICATION_INFO',
+        'RISK_ASSESSMENT',
+        'MONITORING',
+        'HR_TRAINING',
+        'CHANGE_MANAGEMENT',
+        'VENDOR_MANAGEMENT'
+    ]
+}
+
+PARENT_FOLDER_FIELDS = {
+    'Security (CC6)': 'security_folder_id',
+    'Availability (CC7)': 'availability_folder_id',
+    'Confidentiality (CC8)': 'confidentiality_folder_id',
+    'Common Criteria (CC1-CC5)': 'common_criteria_folder_id'
+}
+
+PROGRESS_EVERY = 50
+
+
+class RateLimiter:
+    """Spaces Drive API calls at least 1/rate seconds apart across all worker threads."""
+
+    def __init__(self, rate_per_second):
+        self.interval = 1.0 / rate_per_second if rate_per_second else 0
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            start_at = max(now, self.next_time)
+            self.next_time = start_at + self.interval
+        if start_at > now:
+            time.sleep(start_at - now)
+
+
+def _raise_first_error(errors):
+    if errors:
+        key, error = next(iter(errors.items()))
+        raise RuntimeError(f"Failed to create Google Drive folder for {key}: {error}")
+
+
+def ensure_group_folders(drive_service):
+    """
+    Create the root, parent and category group folders that don't exist yet (one batch request
+    per level of the tree); returns the mapping. Folders created before a failure are kept.
+    """
+    # Get or create folder mapping record
+    folder_mapping, _ = GoogleDriveFolderMapping.objects.get_or_create(
+        id=1  # Single global mapping
+    )
+
+    # Create root folder
+    if not folder_mapping.root_folder_id:
+        folder_mapping.root_folder_id = drive_service.create_folder('complianceGrid')
+        folder_mapping.save()
+    root_folder_id = folder_mapping.root_folder_id
+
+    category_group_folder_ids = folder_mapping.category_group_folder_ids or {}
+    group_labels = dict(CategoryGroup.choices)
+
+    # Parent category folders, plus the Uncategorized folder (for categories with no/uncategorized group), under root
+    folders = [
+        (parent_field, parent_name, root_folder_id)
+        for parent_name, parent_field in PARENT_FOLDER_FIELDS.items()
+        if not getattr(folder_mapping, parent_field)
+    ]
+    if 'UNCATEGORIZED' not in category_group_folder_ids:
+        folders.append(('UNCATEGORIZED', group_labels.get('UNCATEGORIZED', 'Uncategorized'), root_folder_id))
+    created, errors = drive_service.create_folders(folders) if folders else ({}, {})
+    for key, folder_id in created.items():
+        if key == 'UNCATEGORIZED':
+            category_group_folder_ids[key] = folder_id
+        else:
+            setattr(folder_mapping, key, folder_id)
+    folder_mapping.category_group_folder_ids = category_group_folder_ids
+    folder_mapping.save()
+    _raise_first_error(errors)
+
+    # Subcategory folders (category groups) inside their parent folders
+    folders = [
+        (group_code, group_labels.get(group_code, group_code), getattr(folder_mapping, PARENT_FOLDER_FIELDS[parent_name]))
+        for parent_name, group_codes in FOLDER_STRUCTURE.items()
+        for group_code in group_codes
+        if group_code not in category_group_folder_ids
+    ]
+    created, errors = drive_service.create_folders(folders) if folders else ({}, {})
+    category_group_folder_ids.update(created)
+    folder_mapping.category_group_folder_ids = category_group_folder_ids
+    folder_mapping.save()
+    _raise_first_error(errors)
+    return folder_mapping
+
+
+def plan_sync(category_group_folder_ids):
+    """
+    Work still to do, in two queries: active controls without a Drive folder (with the group
+    folder they belong in) and approved files not yet on Drive. Files with a queued upload job
+    are left to drive_upload_worker. Anything finished by an earlier, interrupted run is
+    already saved and drops out of the plan, which is what makes the sync resumable.
+    """
+    no_folder = Q(google_drive_folder_id__isnull=True) | Q(google_drive_folder_id='')
+    folders_to_create = []
+    for category in EvidenceCategory.objects.filter(no_folder, is_active=True).order_by('id'):
+        group_folder_id = category_group_folder_ids.get(category.category_group or 'UNCATEGORIZED')
+        if group_folder_id:
+            folders_to_create.append((category, group_folder_id))
+
+    files_to_upload = list(
+        EvidenceFile.objects.filter(
+            submission__status=EvidenceStatus.APPROVED,
+            google_drive_file_id__isnull=True
+        ).exclude(
+            Exists(DriveUploadJob.objects.filter(
+                evidence_file=OuterRef('pk'),
+                status__in=[DriveUploadStatus.PENDING, DriveUploadStatus.RUNNING]
+            ))
+        ).select_related('submission__category').order_by('id')
+    )
+    return folders_to_create, files_to_upload
+
+
+def sync_drive(access_token, refresh_token, workers=None, rate_per_second=None, progress=None, upload_files=True):
+    """
+    Create missing control folders and upload approved files that aren't on Google Drive yet
+    (folders only with upload_files=False). Work is planned up front, then run through a bounded
+    thread pool (folders in batch requests, uploads one per task); each thread has its own Drive
+    client and all threads share one rate limit. Results are saved as each batch/upload finishes.
+    progress(stage, done, total) is called periodically (logs by default).
+    Returns a summary dict.
+    """
+    workers = workers or getattr(settings, 'GOOGLE_DRIVE_SYNC_WORKERS', 4)
+    rate_per_second = rate_per_second if rate_per_second is not None else getattr(settings, 'GOOGLE_DRIVE_SYNC_RATE', 8)
+    if progress is None:
+        def progress(stage, done, total):
+            logger.info(f"Drive sync {stage}: {done}/{total}")
+
+    started = time.perf_counter()
+    drive_service = GoogleDriveService(access_token=access_token, refresh_token=refresh_token)
+    folder_mapping = ensure_group_folders(drive_service)
+    category_group_folder_ids = folder_mapping.category_group_folder_ids
+    folders_to_create, files_to_upload = plan_sync(category_group_folder_ids)
+    if not upload_files:
+        files_to_upload = []
+    categories_skipped = EvidenceCategory.objects.filter(is_active=True).exclude(
+        Q(google_drive_folder_id__isnull=True) | Q(google_drive_folder_id='')
+    ).count()
+
+    local = threading.local()
+    limiter = RateLimiter(rate_per_second)
+
+    def drive_client():
+        # Drive clients (httplib2) aren't thread-safe: one per worker thread
+        if not hasattr(local, 'drive_service'):
+            local.drive_service = GoogleDriveService(access_token=access_token, refresh_token=refresh_token)
+        return local.drive_service
+
+    def create_folders(batch):
+        limiter.wait()
+        return drive_client().create_folders([
+            (category.pk, category.name, parent_folder_id) for category, parent_folder_id in batch
+        ])
+
+    def hash_or_blank(evidence_file):
+        try:
+            return hash_evidence_file(evidence_file)
+        except Exception as e:
+            logger.error(f"Failed to hash {evidence_file.filename}: {str(e)}", exc_info=True)
+            return ''
+
+    def upload(evidence_file, folder_id):
+        limiter.wait()
+        return upload_evidence_file(drive_client(), evidence_file, folder_id)
+
+    categories_created = 0
+    files_uploaded = 0
+    files_already_on_drive = 0
+    files_failed = 0
+    upload_errors = []
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        # Step 1: Create folders for each control inside their category group folders, one batch
+        # request per BATCH_LIMIT controls; ids are saved with one bulk_update per batch
+        batches = [
+            folders_to_create[start:start + BATCH_LIMIT]
+            for start in range(0, len(folders_to_create), BATCH_LIMIT)
+        ]
+        futures = {executor.submit(create_folders, batch): batch for batch in batches}
+        done = 0
+        for future in as_completed(futures):
+            batch = futures[future]
+            try:
+                created, errors = future.result()
+            except Exception as e:
+                created, errors = {}, {category.pk: e for category, _ in batch}
+            updated = []
+            for category, _ in batch:
+                if category.pk in created:
+                    category.google_drive_folder_id = created[category.pk]
+                    updated.append(category)
+                else:
+                    # Log error but continue with other categories
+                    logger.error(f"Error creating folder for category {category.name}: {str(errors.get(category.pk))}")
+            EvidenceCategory.objects.bulk_update(updated, ['google_drive_folder_id'])
+            categories_created += len(updated)
+            done += len(batch)
+            progress('folders', done, len(folders_to_create))
+        folders_done = time.perf_counter()
+
+        # Step 2: Upload approved files that haven't been uploaded to Google Drive yet, checking the
+        # local index of Drive contents (refreshed from the changes feed) instead of listing folders
+        folder_ids = {category.pk: category.google_drive_folder_id for category, _ in folders_to_create}
+        uploads = []
+        for evidence_file in files_to_upload:
+            category = evidence_file.submission.category
+            folder_id = folder_ids.get(category.pk) or category.google_drive_folder_id
+            # Skip if category doesn't have a Google Drive folder ID
+            if not folder_id:
+                continue
+            if not evidence_file.file:
+                upload_errors.append(f"Local file not found for {evidence_file.filename}")
+                files_failed += 1
+                continue
+            uploads.append((evidence_file, folder_id))
+
+        # Files stored before content hashes were recorded are hashed on the pool
+        unhashed = [evidence_file for evidence_file, _ in uploads if not evidence_file.sha256]
+        for evidence_file, sha256 in zip(unhashed, executor.map(hash_or_blank, unhashed)):
+            evidence_file.sha256 = sha256
+        EvidenceFile.objects.bulk_update(unhashed, ['sha256'], batch_size=500)
+
+        drive_copies = {}
+        if uploads:
+            try:
+                refresh_drive_index(drive_service)
+            except Exception as e:
+                logger.error(f"Failed to refresh Google Drive file index: {str(e)}", exc_info=True)
+            drive_copies = drive_copies_by_folder({folder_id for _, folder_id in uploads})
+
+        # Content already in the target folder is linked instead of uploaded; identical files
+        # headed for the same folder are uploaded once
+        linked = []
+        files_by_content = {}
+        for evidence_file, folder_id in uploads:
+            copy = drive_copies.get((folder_id, evidence_file.sha256))
+            if copy:
+                evidence_file.google_drive_file_id, evidence_file.google_drive_file_url = copy
+                linked.append(evidence_file)
+            else:
+                # A file that couldn't be hashed is uploaded on its own
+                content_key = evidence_file.sha256 or f'file-{evidence_file.pk}'
+                files_by_content.setdefault((folder_id, content_key), []).append(evidence_file)
+        EvidenceFile.objects.bulk_update(linked, ['google_drive_file_id', 'google_drive_file_url'], batch_size=500)
+        files_already_on_drive += len(linked)
+
+        futures = {
+            executor.submit(upload, same_content[0], folder_id): same_content
+            for (folder_id, _), same_content in files_by_content.items()
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            same_content = futures[future]
+            try:
+                drive_result = future.result()
+                for evidence_file in same_content:
+                    evidence_file.google_drive_file_id = drive_result['file_id']
+                    evidence_file.google_drive_file_url = drive_result['web_url']
+                EvidenceFile.objects.bulk_update(same_content, ['google_drive_file_id', 'google_drive_file_url'])
+                files_uploaded += 1
+                files_already_on_drive += len(same_content) - 1
+            except Exception as e:
+                # Log error but continue with other files
+                for evidence_file in same_content:
+                    error_msg = f"Failed to upload {evidence_file.filename} to Google Drive: {str(e)}"
+                    logger.error(error_msg, exc_info=True)
+                    upload_errors.append(error_msg)
+                files_failed += len(same_content)
+            if done % PROGRESS_EVERY == 0 or done == len(futures):
+                progress('files', done, len(futures))
+
+    finished = time.perf_counter()
+    return {
+        'folder_mapping': folder_mapping,
+        'categories_created': categories_created,
+        'categories_skipped': categories_skipped,
+        'files_uploaded': files_uploaded,
+        'files_already_on_drive': files_already_on_drive,
+        'files_failed': files_failed,
+        'upload_errors': upload_errors,
+        'timings_seconds': {
+            'folders': round(folders_done - started, 2),
+            'files': round(finished - folders_done, 2),
+            'total': round(finished - started, 2),
+        },
+    }
+
+
+def queue_drive_sync(access_token, refresh_token, requested_by=None):
+    """
+    Sync for a web request: create missing folders (a few batch requests), then queue the approved
+    files not on Drive yet as DriveUploadJob rows for drive_upload_worker instead of uploading them
+    here. Returns the sync_drive summary plus files_queued and upload_job_ids.
+    """
+    result = sync_drive(access_token, refresh_token, upload_files=False)
+    _, files_to_upload = plan_sync(result['folder_mapping'].category_group_folder_ids)
+    # Files of controls without a folder (e.g. inactive ones) would only fail in the worker
+    files_to_upload = [f for f in files_to_upload if f.submission.category.google_drive_folder_id]
+    for evidence_file in files_to_upload:
+        if not evidence_file.file:
+            result['upload_errors'].append(f"Local file not found for {evidence_file.filename}")
+            result['files_failed'] += 1
+    result['upload_job_ids'] = enqueue_drive_uploads(files_to_upload, requested_by=requested_by)
+    result['files_queued'] = len(result['upload_job_ids'])
+    return result
@@ -0,0 +1,149 @@
+import logging
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from evidence.models import DriveUploadJob, DriveUploadStatus
+from evidence.services.drive_credentials import resolve_drive_credentials
+from evidence.services.drive_index import find_drive_copy
+from evidence.services.google_drive import GoogleDriveService
+
+logger = logging.getLogger(__name__)
+
+# Exponential backoff between attempts: 30s, 60s, 120s, ... capped at one hour
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 3600
+
+
+def enqueue_drive_uploads(evidence_files, requested_by=None):
+    """
+    Queue a Google Drive upload for each file that has a local copy and isn't on Drive yet.
+    Files that already have a queued/running job keep it. Returns the ids of the active jobs
+    for the given files, for the client to poll.
+    """
+    files = [f for f in evidence_files if f.file and not f.google_drive_file_id]
+    if not files:
+        return []
+    DriveUploadJob.objects.bulk_create(
+        [DriveUploadJob(evidence_file=f, requested_by=requested_by) for f in files],
+        ignore_conflicts=True
+    )
+    return list(
+        DriveUploadJob.objects.filter(
+            evidence_file__in=files,
+            status__in=[DriveUploadStatus.PENDING, DriveUploadStatus.RUNNING]
+        ).order_by('id').values_list('id', flat=True)
+    )
+
+
+def upload_evidence_file(drive_service, evidence_file, folder_id, progress_callback=None):
+    """
+    Stream an evidence file's local copy into a Drive folder in resumable chunks (the file is
+    never read into memory whole); returns {'file_id', 'web_url'}.
+    """
+    evidence_file.file.open('rb')
+    try:
+        return drive_service.upload_file(
+            file_content=evidence_file.file,
+            filename=evidence_file.filename,
+            folder_id=folder_id,
+            mime_type=evidence_file.mime_type,
+            progress_callback=progress_callback
+        )
+    finally:
+        evidence_file.file.close()
+
+
+def requeue_stale_jobs(stale_after_seconds):
+    """Put RUNNING jobs whose worker died (started too long ago) back in the queue."""
+    cutoff = timezone.now() - timedelta(seconds=stale_after_seconds)
+    return DriveUploadJob.objects.filter(
+        status=DriveUploadStatus.RUNNING,
+        started_at__lt=cutoff
+    ).update(status=DriveUploadStatus.PENDING, next_attempt_at=timezone.now())
+
+
+def claim_jobs(limit):
+    """
+    Claim up to `limit` due PENDING jobs for this worker and mark them RUNNING.
+    select_for_update(skip_locked=True) lets several workers poll without blocking
+    each other or picking the same job.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            DriveUploadJob.objects.select_for_update(skip_locked=True)
+            .filter(status=DriveUploadStatus.PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:limit]
+        )
+        for job in jobs:
+            job.status = DriveUploadStatus.RUNNING
+            job.attempts += 1
+            job.started_at = now
+        DriveUploadJob.objects.bulk_update(jobs, ['status', 'attempts', 'started_at'])
+    return [job.pk for job in jobs]
+
+
+def _is_token_error(error):
+    return 'unauthorized_client' in str(error).lower() or 'refresherror' in type(error).__name__.lower()
+
+
+def run_job(job_id):
+    """Upload one claimed job's file to Drive and record the outcome; failures are retried with backoff."""
+    job = DriveUploadJob.objects.select_related(
+        'evidence_file__submission__category', 'requested_by'
+    ).get(pk=job_id)
+    evidence_file = job.evidence_file
+    category = evidence_file.submission.category
+
+    try:
+        if not evidence_file.google_drive_file_id:
+            if not evidence_file.file:
+                raise ValueError(f"Local file not found for {evidence_file.filename}")
+            if not category.google_drive_folder_id:
+                raise ValueError(
+                    "Google Drive folder not configured for this category. Please run 'Sync Google Drive folders' "
+                    "or 'Create Google Drive folders' from the Category Groups page first."
+                )
+
+            # The same content already in the control's folder (e.g. last period's file) is linked, not uploaded again
+            drive_copy = find_drive_copy(evidence_file.sha256, category.google_drive_folder_id)
+            if drive_copy:
+                evidence_file.google_drive_file_id, evidence_file.google_drive_file_url = drive_copy
+            else:
+                # The approver's token, then the assignee's, the submitter's, then the organization token
+                access_token, refresh_token = resolve_drive_credentials(
+                    category, evidence_file.submission, requested_by=job.requested_by
+                )
+                if not access_token:
+                    raise ValueError(
+                        "Google Drive not authenticated. Please click 'Authenticate' (green tick) on the Category Groups page "
+                        "and sign in with Google."
+                    )
+
+                drive_service = GoogleDriveService(access_token=access_token, refresh_token=refresh_token)
+                drive_result = upload_evidence_file(drive_service, evidence_file, category.google_drive_folder_id)
+                evidence_file.google_drive_file_id = drive_result['file_id']
+                evidence_file.google_drive_file_url = drive_result['web_url']
+            evidence_file.save(update_fields=['google_drive_file_id', 'google_drive_file_url'])
+
+        job.status = DriveUploadStatus.SUCCEEDED
+        job.last_error = ''
+        job.finished_at = timezone.now()
+    except Exception as e:
+        logger.error(f"Failed to upload {evidence_file.filename} to Google Drive (job {job.pk}): {e}", exc_info=True)
+        if _is_token_error(e):
+            job.last_error = (
+                "Google Drive token is invalid or was issued by a different app. "
+                "Please click 'Authenticate' on the Category Groups page and sign in with Google again."
+            )
+        else:
+            job.last_error = str(e)
+        if job.attempts >= job.max_attempts:
+            job.status = DriveUploadStatus.FAILED
+            job.finished_at = timezone.now()
+        else:
+            delay = min(RETRY_BASE_SECONDS * 2 ** (job.attempts - 1), RETRY_MAX_SECONDS)
+            job.status = DriveUploadStatus.PENDING
+            job.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+    job.save(update_fields=['status', 'last_error', 'finished_at', 'next_attempt_at'])
+    return job
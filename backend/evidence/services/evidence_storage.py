@@ -0,0 +1,47 @@
+import hashlib
+import os
+from evidence.models import EvidenceFile
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def evidence_storage():
+    return EvidenceFile._meta.get_field('file').storage
+
+
+def content_address(sha256, filename):
+    """Storage name for a blob with this content: evidence_blobs/ab/cd/<sha256><ext>"""
+    ext = os.path.splitext(filename)[1].lower()
+    return f'evidence_blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}'
+
+
+def hash_file(file):
+    """SHA-256 of a Django File (uploaded file, FieldFile, ...), read in chunks"""
+    digest = hashlib.sha256()
+    for chunk in file.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_evidence_file(evidence_file):
+    """SHA-256 of an EvidenceFile's stored copy (for files uploaded before hashes were recorded)"""
+    evidence_file.file.open('rb')
+    try:
+        return hash_file(evidence_file.file)
+    finally:
+        evidence_file.file.close()
+
+
+def store_evidence_blob(uploaded_file):
+    """
+    Store an uploaded file once per content: identical uploads (the same screenshot every period)
+    share one blob. Uses the SHA-256 computed while the upload was received when available.
+    Returns (sha256, storage name) for EvidenceFile.sha256 / EvidenceFile.file.
+    """
+    sha256 = getattr(uploaded_file, 'sha256', None) or hash_file(uploaded_file)
+    name = content_address(sha256, uploaded_file.name)
+    storage = evidence_storage()
+    if not storage.exists(name):
+        uploaded_file.seek(0)
+        name = storage.save(name, uploaded_file)
+    return sha256, name
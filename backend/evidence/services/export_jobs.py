@@ -0,0 +1,132 @@
+import hashlib
+import logging
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from evidence.models import EvidenceCategory, ExportJob, ExportJobStatus
+from evidence.services.exports import build_export_rows, export_file
+
+logger = logging.getLogger(__name__)
+
+# Bump when the export layout changes so cached artifacts aren't reused
+EXPORT_LAYOUT_VERSION = 1
+
+
+def export_data_version(show_hidden=False):
+    """
+    Stamp of the data behind an export (two queries): changes when a control in the export is
+    added, removed or edited, its evidence status is rebuilt, or a user shown in it (uploaded
+    by / approved by) is renamed. User rows carry no modification time, so the usernames of
+    the referenced users are part of the stamp.
+    """
+    categories = EvidenceCategory.objects.filter(is_active=not show_hidden)
+    stats = categories.aggregate(
+        categories=Count('id'),
+        categories_updated_at=Max('updated_at'),
+        statuses=Count('control_status'),
+        statuses_updated_at=Max('control_status__updated_at'),
+    )
+    usernames = list(
+        User.objects.filter(
+            Q(id__in=categories.values('control_status__last_uploaded_by'))
+            | Q(id__in=categories.values('control_status__approved_by'))
+        ).order_by('id').values_list('id', 'username')
+    )
+    stamp = f"{EXPORT_LAYOUT_VERSION}:{sorted(stats.items())}:{usernames}"
+    return hashlib.sha256(stamp.encode()).hexdigest()
+
+
+def request_export(format_type, show_hidden=False, requested_by=None):
+    """
+    Job for this export: an existing queued/running job or finished artifact for the same format,
+    filter and data version is reused, otherwise a new job is queued for export_worker.
+    Returns (job, created).
+    """
+    data_version = export_data_version(show_hidden)
+    job = ExportJob.objects.filter(
+        format=format_type,
+        show_hidden=show_hidden,
+        data_version=data_version,
+        status__in=[ExportJobStatus.PENDING, ExportJobStatus.RUNNING, ExportJobStatus.SUCCEEDED]
+    ).order_by('-created_at').first()
+    if job and (job.status != ExportJobStatus.SUCCEEDED or job.file):
+        return job, False
+    job = ExportJob.objects.create(
+        format=format_type,
+        show_hidden=show_hidden,
+        data_version=data_version,
+        requested_by=requested_by,
+    )
+    return job, True
+
+
+def requeue_stale_export_jobs(stale_after_seconds):
+    """Put RUNNING jobs whose worker died (started too long ago) back in the queue."""
+    cutoff = timezone.now() - timedelta(seconds=stale_after_seconds)
+    return ExportJob.objects.filter(
+        status=ExportJobStatus.RUNNING,
+        started_at__lt=cutoff
+    ).update(status=ExportJobStatus.PENDING)
+
+
+def claim_export_jobs(limit):
+    """Claim up to `limit` PENDING jobs for this worker and mark them RUNNING (see drive_uploads.claim_jobs)."""
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            ExportJob.objects.select_for_update(skip_locked=True)
+            .filter(status=ExportJobStatus.PENDING)
+            .order_by('created_at', 'id')[:limit]
+        )
+        for job in jobs:
+            job.status = ExportJobStatus.RUNNING
+            job.started_at = now
+        ExportJob.objects.bulk_update(jobs, ['status', 'started_at'])
+    return [job.pk for job in jobs]
+
+
+def delete_superseded_exports(job):
+    """Remove the stored artifacts of older data versions of the same export"""
+    superseded = list(
+        ExportJob.objects.filter(format=job.format, show_hidden=job.show_hidden, status=ExportJobStatus.SUCCEEDED)
+        .exclude(data_version=job.data_version)
+        .exclude(file='')
+    )
+    for old_job in superseded:
+        old_job.file.delete(save=False)
+    ExportJob.objects.bulk_update(superseded, ['file'])
+    return len(superseded)
+
+
+def run_export_job(job_id):
+    """Render one claimed export job to storage and record the outcome"""
+    job = ExportJob.objects.get(pk=job_id)
+    try:
+        # Stamp the data actually rendered (it may have changed since the job was queued)
+        job.data_version = export_data_version(job.show_hidden)
+        rows, _, _ = build_export_rows(job.show_hidden)
+        if not rows:
+            raise ValueError('No data available to export: no categories found.')
+
+        output, filename, _ = export_file(job.format, rows)
+        try:
+            job.file.save(f'{job.pk}_{filename}', File(output), save=False)
+        finally:
+            output.close()
+        job.filename = filename
+        job.row_count = len(rows)
+        job.status = ExportJobStatus.SUCCEEDED
+        job.last_error = ''
+    except Exception as e:
+        logger.error(f"Failed to render export job {job.pk}: {e}", exc_info=True)
+        job.status = ExportJobStatus.FAILED
+        job.last_error = str(e)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['data_version', 'file', 'filename', 'row_count', 'status', 'last_error', 'finished_at'])
+
+    if job.status == ExportJobStatus.SUCCEEDED:
+        delete_superseded_exports(job)
+    return job
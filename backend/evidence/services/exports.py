@@ -0,0 +1,294 @@
+import csv
+import json
+import tempfile
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.utils import get_column_letter
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter, landscape
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Case, IntegerField, Value, When
+from evidence.models import CategoryGroup, EvidenceCategory, EvidenceFile
+
+# Exports are built in memory up to this size, then spill to a temporary file
+EXPORT_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+EXPORT_COLUMNS = [
+    ('category_group', 'Category Group'),
+    ('control', 'Control'),
+    ('evidence_status', 'Evidence Status'),
+    ('last_uploaded_date', 'Last Uploaded Date'),
+    ('uploaded_by', 'Uploaded By'),
+    ('approved_by', 'Approved By'),
+]
+
+EXCEL_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def build_export_rows(show_hidden=False):
+    """
+    Export rows for the category groups export: active controls (inactive with show_hidden),
+    grouped by category group. One query ordered by group then name, read in a single pass
+    from the denormalized ControlStatus. Returns (rows, categories_by_group, total_categories).
+    """
+    group_order = Case(
+        *[When(category_group=code, then=Value(index)) for index, (code, _) in enumerate(CategoryGroup.choices)],
+        default=Value(len(CategoryGroup.choices)),
+        output_field=IntegerField(),
+    )
+    categories = EvidenceCategory.objects.filter(is_active=not show_hidden).order_by(group_order, 'name', 'id').values_list(
+        'name',
+        'category_group',
+        'control_status__category_id',
+        'control_status__last_uploaded_at',
+        'control_status__last_uploaded_by__username',
+        'control_status__approved_by__username',
+        'control_status__evidence_status',
+        'control_status__has_files',
+    )
+
+    group_labels = {code: label for code, label in CategoryGroup.choices if code != CategoryGroup.UNCATEGORIZED}
+    export_data = []
+    categories_by_group = {label: 0 for label in group_labels.values()}
+    total_categories = 0
+    for (name, group_code, status_id, last_uploaded_at, last_uploaded_by,
+         approved_by, evidence_status, has_files) in categories:
+        total_categories += 1
+        group_label = group_labels.get(group_code)
+        if group_label is None:
+            # Uncategorized controls are not exported
+            continue
+        categories_by_group[group_label] += 1
+
+        uploaded_by = None
+        uploaded_date = None
+        status_label = 'Missing'
+        if status_id is not None:
+            if last_uploaded_at:
+                uploaded_by = last_uploaded_by or 'N/A'
+                uploaded_date = last_uploaded_at.strftime('%Y-%m-%d %H:%M:%S')
+            if evidence_status and has_files:
+                status_label = 'Uploaded'
+
+        export_data.append({
+            'category_group': group_label,
+            'control': name,
+            'evidence_status': status_label,
+            'last_uploaded_date': uploaded_date or 'N/A',
+            'uploaded_by': uploaded_by or 'N/A',
+            'approved_by': approved_by or 'N/A'
+        })
+
+    return export_data, categories_by_group, total_categories
+
+
+def column_widths(rows, columns=EXPORT_COLUMNS, max_width=50):
+    """Column widths (longest value + 2, capped) from the export row dicts and headers"""
+    widths = [len(label) for _, label in columns]
+    for row in rows:
+        for index, (key, _) in enumerate(columns):
+            length = len(str(row[key]))
+            if length > widths[index]:
+                widths[index] = length
+    return [min(width + 2, max_width) for width in widths]
+
+
+def write_excel(rows, output, title='Category Groups Export', columns=EXPORT_COLUMNS):
+    """
+    Write export rows to `output` (path or binary file object) as an .xlsx workbook. Uses
+    openpyxl's write-only mode, so rows are serialized as they are appended instead of being
+    kept as cell objects.
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+
+    # Column widths must be set before the first row is written
+    for index, width in enumerate(column_widths(rows, columns), start=1):
+        ws.column_dimensions[get_column_letter(index)].width = width
+
+    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    header_font = Font(bold=True, color="FFFFFF")
+    header_alignment = Alignment(horizontal="center", vertical="center")
+    header = []
+    for _, label in columns:
+        cell = WriteOnlyCell(ws, value=label)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = header_alignment
+        header.append(cell)
+    ws.append(header)
+
+    for row in rows:
+        ws.append([row[key] for key, _ in columns])
+
+    wb.save(output)
+
+
+def excel_export_file(rows, title='Category Groups Export'):
+    """The workbook for these rows in a spooled temporary file, rewound and ready to stream"""
+    output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE)
+    write_excel(rows, output, title=title)
+    output.seek(0)
+    return output
+
+
+def write_pdf(rows, output):
+    """Write export rows to `output` (path or binary file object) as a PDF table"""
+    doc = SimpleDocTemplate(output, pagesize=landscape(letter), topMargin=0.5*inch)
+    elements = []
+
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=16,
+        textColor=colors.HexColor('#366092'),
+        spaceAfter=30,
+        alignment=1  # Center alignment
+    )
+
+    # Title
+    title = Paragraph("Category Groups Export Report", title_style)
+    elements.append(title)
+    elements.append(Spacer(1, 0.2*inch))
+
+    # Prepare table data
+    table_data = [['Category Group', 'Control', 'Evidence Status', 'Last Uploaded Date', 'Uploaded By', 'Approved By']]
+
+    for row in rows:
+        table_data.append([
+            row['category_group'],
+            row['control'],
+            row['evidence_status'],
+            row['last_uploaded_date'],
+            row['uploaded_by'],
+            row['approved_by']
+        ])
+
+    # Create table
+    table = Table(table_data, repeatRows=1)
+    table.setStyle(TableStyle([
+        # Header row
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#366092')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('TOPPADDING', (0, 0), (-1, 0), 12),
+
+        # Data rows
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+        ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 9),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+
+        # Alternating row colors
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+    ]))
+
+    elements.append(table)
+
+    doc.build(elements)
+
+
+def pdf_export_file(rows):
+    """The PDF for these rows in a spooled temporary file, rewound and ready to stream"""
+    output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE)
+    write_pdf(rows, output)
+    output.seek(0)
+    return output
+
+
+# format query value: (file extension, content type, renderer returning a rewound file)
+EXPORT_FORMATS = {
+    'excel': ('xlsx', EXCEL_CONTENT_TYPE, excel_export_file),
+    'pdf': ('pdf', 'application/pdf', pdf_export_file),
+}
+
+
+def export_file(format_type, rows):
+    """Render rows in the given format ('excel' or 'pdf'); returns (file, filename, content type)"""
+    extension, content_type, render = EXPORT_FORMATS[format_type]
+    return render(rows), f'category_groups_export.{extension}', content_type
+
+
+# Per-file evidence ledger (format=csv / format=ndjson): (column, EvidenceFile lookup)
+EVIDENCE_LEDGER_COLUMNS = [
+    ('file_id', 'id'),
+    ('control_id', 'submission__category_id'),
+    ('control', 'submission__category__name'),
+    ('category_group', 'submission__category__category_group'),
+    ('submission_id', 'submission_id'),
+    ('period_start_date', 'submission__period_start_date'),
+    ('period_end_date', 'submission__period_end_date'),
+    ('submission_status', 'submission__status'),
+    ('filename', 'filename'),
+    ('sha256', 'sha256'),
+    ('file_size', 'file_size'),
+    ('mime_type', 'mime_type'),
+    ('file_status', 'status'),
+    ('uploaded_at', 'uploaded_at'),
+    ('uploaded_by', 'uploaded_by__username'),
+    ('reviewed_by', 'reviewed_by__username'),
+    ('reviewed_at', 'reviewed_at'),
+    ('google_drive_file_id', 'google_drive_file_id'),
+    ('google_drive_file_url', 'google_drive_file_url'),
+]
+
+LEDGER_CHUNK_SIZE = 2000
+
+
+def evidence_ledger_rows(show_hidden=False, chunk_size=LEDGER_CHUNK_SIZE):
+    """
+    One tuple per evidence file (columns as EVIDENCE_LEDGER_COLUMNS) for active controls (inactive
+    with show_hidden), read with a server-side cursor in chunks so memory stays flat.
+    """
+    group_labels = dict(CategoryGroup.choices)
+    group_index = [column for column, _ in EVIDENCE_LEDGER_COLUMNS].index('category_group')
+    files = EvidenceFile.objects.filter(submission__category__is_active=not show_hidden).order_by(
+        'submission__category__name', 'submission__period_start_date', 'uploaded_at', 'id'
+    ).values_list(*[lookup for _, lookup in EVIDENCE_LEDGER_COLUMNS])
+    for row in files.iterator(chunk_size=chunk_size):
+        row = list(row)
+        row[group_index] = group_labels.get(row[group_index], row[group_index])
+        yield row
+
+
+class _Echo:
+    """File-like object whose write() returns the line, so csv.writer can feed a generator"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows, columns=EVIDENCE_LEDGER_COLUMNS):
+    """CSV lines (header first) for rows; None becomes an empty field, dates are ISO 8601"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow([column for column, _ in columns])
+    for row in rows:
+        yield writer.writerow([
+            '' if value is None else value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in row
+        ])
+
+
+def iter_ndjson(rows, columns=EVIDENCE_LEDGER_COLUMNS):
+    """One JSON object per line for rows"""
+    keys = [column for column, _ in columns]
+    for row in rows:
+        yield json.dumps(dict(zip(keys, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+# format query value: (file extension, content type, line generator)
+STREAMING_EXPORT_FORMATS = {
+    'csv': ('csv', 'text/csv; charset=utf-8', iter_csv),
+    'ndjson': ('ndjson', 'application/x-ndjson', iter_ndjson),
+}
@@ -0,0 +1,138 @@
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+from evidence.services.evidence_storage import evidence_storage
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def file_etag(evidence_file):
+    """Strong ETag from the content hash; files without one get a weak ETag from id and size"""
+    if evidence_file.sha256:
+        return f'"{evidence_file.sha256}"'
+    return f'W/"{evidence_file.pk}-{evidence_file.file_size}"'
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single-range Range header, None to send the whole file
+    (no header, multiple ranges, or a syntax the spec says to ignore), or False if unsatisfiable.
+    """
+    match = RANGE_RE.match((header or '').replace(' ', ''))
+    if not match:
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    elif last:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        start, end = max(size - length, 0), size - 1
+    else:
+        return None
+    if start >= size:
+        return False
+    return start, end
+
+
+def _if_range_matches(request, etag, last_modified):
+    """Whether a Range request should be honoured under its If-Range condition (if any)"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        # Only strong ETags may be used with If-Range
+        return not etag.startswith('W/') and if_range == etag
+    if_range_date = parse_http_date_safe(if_range)
+    return if_range_date is not None and if_range_date >= last_modified
+
+
+def _iter_range(file, start, length):
+    try:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(STREAM_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def _sendfile_response(evidence_file, name):
+    """Let the web server send the file (X-Accel-Redirect for nginx, X-Sendfile for Apache/lighttpd)"""
+    response = HttpResponse(content_type=evidence_file.mime_type or 'application/octet-stream')
+    if settings.EVIDENCE_DOWNLOAD_SENDFILE == 'x-accel-redirect':
+        prefix = settings.EVIDENCE_DOWNLOAD_ACCEL_PREFIX.rstrip('/')
+        response['X-Accel-Redirect'] = f'{prefix}/{quote(name)}'
+    else:
+        response['X-Sendfile'] = evidence_storage().path(name)
+    return response
+
+
+def evidence_file_response(request, evidence_file):
+    """
+    Download response for an evidence file's stored copy: handed to the web server when
+    EVIDENCE_DOWNLOAD_SENDFILE is set, otherwise streamed with Range (206/416) support.
+    Conditional requests (If-None-Match / If-Modified-Since) get 304. Returns None if the
+    file has no stored copy.
+    """
+    if not evidence_file.file:
+        return None
+    name = evidence_file.file.name
+    storage = evidence_storage()
+    if not storage.exists(name):
+        return None
+
+    etag = file_etag(evidence_file)
+    # HTTP dates have whole-second precision
+    last_modified = int(evidence_file.uploaded_at.timestamp())
+    conditional_response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional_response is not None:
+        return conditional_response
+
+    if settings.EVIDENCE_DOWNLOAD_SENDFILE:
+        response = _sendfile_response(evidence_file, name)
+    else:
+        size = storage.size(name)
+        byte_range = None
+        if request.method == 'GET' and _if_range_matches(request, etag, last_modified):
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        file = storage.open(name, 'rb')
+        if byte_range is None:
+            response = FileResponse(file, content_type=evidence_file.mime_type or 'application/octet-stream')
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _iter_range(file, start, end - start + 1),
+                status=206,
+                content_type=evidence_file.mime_type or 'application/octet-stream',
+            )
+            response['Content-Length'] = str(end - start + 1)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Accept-Ranges'] = 'bytes'
+
+    response['Content-Disposition'] = content_disposition_header(True, os.path.basename(evidence_file.filename))
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # Evidence is access-controlled: browsers may keep it, shared caches may not
+    response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+    return response
@@ -1,10 +1,76 @@
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseUpload
+from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload
 from django.conf import settings
 import io
 import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Resumable upload chunks must be a multiple of 256 KiB
+CHUNK_SIZE_MULTIPLE = 256 * 1024
+
+# Drive accepts at most 100 calls in one batch HTTP request
+BATCH_LIMIT = 100
+
+# File fields mirrored into DriveFileIndex
+INDEX_FILE_FIELDS = 'id, name, parents, mimeType, md5Checksum, sha256Checksum, size, modifiedTime, webViewLink'
+
+# Process-level cache of Drive clients. Credentials are shared per token, so a token is refreshed
+# once per process instead of once per request; built clients are kept per thread because the
+# underlying httplib2 connection isn't thread-safe.
+_credentials_cache = {}  # token key -> (credentials, created_at)
+_client_cache = {}  # (token key, thread id) -> (service, created_at)
+_cache_lock = threading.Lock()
+
+
+def _build_drive(credentials):
+    # static_discovery uses the discovery document shipped with the client library (no HTTP fetch)
+    return build('drive', 'v3', credentials=credentials, static_discovery=True, cache_discovery=False)
+
+
+def get_drive_client(access_token, refresh_token=None):
+    """
+    Return a cached (service, credentials) pair for these tokens, building it on first use.
+    Entries expire after GOOGLE_DRIVE_CLIENT_CACHE_TTL seconds.
+    """
+    # The refresh token stays the same across refreshes; the access token doesn't
+    token_key = refresh_token or access_token
+    client_key = (token_key, threading.get_ident())
+    ttl = getattr(settings, 'GOOGLE_DRIVE_CLIENT_CACHE_TTL', 3000)
+    now = time.monotonic()
+
+    with _cache_lock:
+        for key, (_, created_at) in list(_credentials_cache.items()):
+            if now - created_at > ttl:
+                del _credentials_cache[key]
+        for key, (_, created_at) in list(_client_cache.items()):
+            if now - created_at > ttl or key[0] not in _credentials_cache:
+                del _client_cache[key]
+
+        if token_key not in _credentials_cache:
+            _credentials_cache[token_key] = (Credentials(
+                token=access_token,
+                refresh_token=refresh_token,
+                client_id=settings.GOOGLE_DRIVE_CLIENT_ID,
+                client_secret=settings.GOOGLE_DRIVE_CLIENT_SECRET,
+                token_uri='https://oauth2.googleapis.com/token'
+            ), now)
+        credentials = _credentials_cache[token_key][0]
+        cached_client = _client_cache.get(client_key)
+        if cached_client:
+            return cached_client[0], credentials
+
+    # Build outside the lock so threads starting up don't wait on each other
+    service = _build_drive(credentials)
+    with _cache_lock:
+        _client_cache[client_key] = (service, now)
+    return service, credentials
 
 
 class GoogleDriveService:
@@ -15,18 +81,17 @@ class GoogleDriveService:
         access_token: String access token (alternative to credentials_dict)
         refresh_token: String refresh token (optional, for token refresh)
         """
+        self.credentials = None
+        self.refresh_token = None
+        self.persisted_token = None
         if credentials_dict:
             # If it's just a token, create credentials from it
             if 'token' in credentials_dict and len(credentials_dict) == 1:
-                from google.oauth2.credentials import Credentials
                 credentials = Credentials(token=credentials_dict['token'])
             else:
                 credentials = Credentials.from_authorized_user_info(credentials_dict)
-            self.service = build('drive', 'v3', credentials=credentials)
+            self.service = _build_drive(credentials)
         elif access_token:
-            # Create credentials from access token string
-            from google.oauth2.credentials import Credentials
-            from django.conf import settings
             # If refresh_token is provided as parameter, use it
             # Otherwise check if access_token is a dict
             if isinstance(access_token, dict):
@@ -37,17 +102,28 @@ class GoogleDriveService:
                 actual_access_token = access_token
                 actual_refresh_token = refresh_token
             
-            credentials = Credentials(
-                token=actual_access_token,
-                refresh_token=actual_refresh_token,
-                client_id=settings.GOOGLE_DRIVE_CLIENT_ID,
-                client_secret=settings.GOOGLE_DRIVE_CLIENT_SECRET,
-                token_uri='https://oauth2.googleapis.com/token'
-            )
-            self.service = build('drive', 'v3', credentials=credentials)
+            # Reuse this process's client and credentials for the same token
+            self.service, self.credentials = get_drive_client(actual_access_token, actual_refresh_token)
+            self.refresh_token = actual_refresh_token
+            self.persisted_token = actual_access_token
         else:
             self.service = None
     
+    def persist_refreshed_token(self):
+        """Save an access token refreshed by google-auth to UserGoogleDriveToken, so other workers reuse it."""
+        if not self.credentials or not self.refresh_token or not self.credentials.token:
+            return
+        if self.credentials.token == self.persisted_token:
+            return
+        from evidence.models import UserGoogleDriveToken
+        try:
+            UserGoogleDriveToken.objects.filter(refresh_token=self.refresh_token).update(
+                access_token=self.credentials.token
+            )
+            self.persisted_token = self.credentials.token
+        except Exception as e:
+            logger.error(f"Failed to save refreshed Google Drive token: {str(e)}", exc_info=True)
+    
     @staticmethod
     def get_oauth_flow():
         """Get OAuth2 flow for authentication"""
@@ -66,15 +142,19 @@ class GoogleDriveService:
         flow.redirect_uri = settings.GOOGLE_DRIVE_REDIRECT_URI
         return flow
     
-    def upload_file(self, file_content, filename, folder_id, mime_type='application/octet-stream'):
+    def upload_file(self, file_content, filename, folder_id, mime_type='application/octet-stream',
+                    chunk_size=None, progress_callback=None):
         """
-        Upload file to specific Google Drive folder
+        Upload file to specific Google Drive folder using a resumable session, one chunk at a time,
+        so memory use is bounded by the chunk size rather than the file size.
         
         Args:
-            file_content: Bytes content of the file
+            file_content: A readable, seekable file-like object, a filesystem path, or bytes
             filename: Name of the file
             folder_id: Google Drive folder ID
             mime_type: MIME type of the file
+            chunk_size: Bytes sent per request (default GOOGLE_DRIVE_UPLOAD_CHUNK_SIZE, rounded to 256 KiB)
+            progress_callback: Optional callable(bytes_uploaded, total_bytes), called after each chunk
         
         Returns:
             Dictionary with file_id and web_url
@@ -87,17 +167,30 @@ class GoogleDriveService:
             'parents': [folder_id] if folder_id else []
         }
         
-        media = MediaIoBaseUpload(
-            io.BytesIO(file_content),
-            mimetype=mime_type,
-            resumable=True
-        )
+        chunk_size = chunk_size or getattr(settings, 'GOOGLE_DRIVE_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024)
+        chunk_size = max(CHUNK_SIZE_MULTIPLE, chunk_size // CHUNK_SIZE_MULTIPLE * CHUNK_SIZE_MULTIPLE)
+        mime_type = mime_type or 'application/octet-stream'
+        if isinstance(file_content, (str, os.PathLike)):
+            media = MediaFileUpload(str(file_content), mimetype=mime_type, chunksize=chunk_size, resumable=True)
+        else:
+            if isinstance(file_content, (bytes, bytearray)):
+                file_content = io.BytesIO(file_content)
+            media = MediaIoBaseUpload(file_content, mimetype=mime_type, chunksize=chunk_size, resumable=True)
         
-        file = self.service.files().create(
+        request = self.service.files().create(
             body=file_metadata,
             media_body=media,
             fields='id, webViewLink'
-        ).execute()
+        )
+        file = None
+        while file is None:
+            # Transient errors are retried per chunk and the session resumes where it stopped
+            upload_status, file = request.next_chunk(num_retries=3)
+            if upload_status and progress_callback:
+                progress_callback(upload_status.resumable_progress, upload_status.total_size)
+        self.persist_refreshed_token()
+        if progress_callback:
+            progress_callback(media.size(), media.size())
         
         return {
             'file_id': file.get('id'),
@@ -129,11 +222,81 @@ class GoogleDriveService:
             body=file_metadata,
             fields='id'
         ).execute()
+        self.persist_refreshed_token()
         return folder.get('id')
     
+    def create_folders(self, folders):
+        """
+        Create many folders using Drive batch HTTP requests (up to 100 folders per round trip)
+        
+        Args:
+            folders: List of (key, folder_name, parent_folder_id) tuples; keys must be unique
+        
+        Returns:
+            Tuple (created, errors): {key: folder_id} and {key: exception} for folders that failed
+        """
+        if not self.service:
+            raise ValueError("Google Drive service not initialized. Please authenticate first.")
+        
+        created = {}
+        errors = {}
+        for start in range(0, len(folders), BATCH_LIMIT):
+            keys_by_request_id = {}
+            
+            def on_response(request_id, response, exception):
+                key = keys_by_request_id[request_id]
+                if exception is not None:
+                    errors[key] = exception
+                else:
+                    created[key] = response.get('id')
+            
+            batch = self.service.new_batch_http_request(callback=on_response)
+            for index, (key, folder_name, parent_folder_id) in enumerate(folders[start:start + BATCH_LIMIT]):
+                file_metadata = {
+                    'name': folder_name,
+                    'mimeType': 'application/vnd.google-apps.folder'
+                }
+                if parent_folder_id:
+                    file_metadata['parents'] = [parent_folder_id]
+                request_id = str(index)
+                keys_by_request_id[request_id] = key
+                batch.add(self.service.files().create(body=file_metadata, fields='id'), request_id=request_id)
+            batch.execute()
+        self.persist_refreshed_token()
+        return created, errors
+    
+    def iter_files(self, query=None, fields=INDEX_FILE_FIELDS, page_size=1000):
+        """
+        Yield every file matching a Drive query, following nextPageToken across pages
+        
+        Args:
+            query: Drive search query (e.g. "'<folder_id>' in parents"); None lists every file the app can see
+            fields: File fields to request; keep minimal, every field adds to each page's payload
+            page_size: Files per page (Drive allows up to 1000)
+        """
+        if not self.service:
+            raise ValueError("Google Drive service not initialized. Please authenticate first.")
+        
+        page_token = None
+        while True:
+            params = {
+                'pageSize': page_size,
+                'fields': f"nextPageToken, files({fields})",
+            }
+            if query:
+                params['q'] = query
+            if page_token:
+                params['pageToken'] = page_token
+            results = self.service.files().list(**params).execute()
+            yield from results.get('files', [])
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+        self.persist_refreshed_token()
+    
     def list_files(self, folder_id):
         """
-        List files in a folder
+        List files in a folder (all pages)
         
         Args:
             folder_id: Google Drive folder ID
@@ -141,12 +304,38 @@ class GoogleDriveService:
         Returns:
             List of file dictionaries
         """
+        return list(self.iter_files(query=f"'{folder_id}' in parents", fields='id, name, webViewLink'))
+    
+    def get_start_page_token(self):
+        """Current position in the Drive changes feed; changes after this point are returned by list_changes"""
         if not self.service:
             raise ValueError("Google Drive service not initialized. Please authenticate first.")
         
-        results = self.service.files().list(
-            q=f"'{folder_id}' in parents",
-            fields="files(id, name, webViewLink)"
-        ).execute()
-        return results.get('files', [])
-
+        result = self.service.changes().getStartPageToken().execute()
+        self.persist_refreshed_token()
+        return result.get('startPageToken')
+    
+    def list_changes(self, page_token, page_size=1000):
+        """
+        Changes since page_token, following all pages
+        
+        Returns:
+            Tuple (changes, new_start_page_token); each change has fileId, removed and file
+        """
+        if not self.service:
+            raise ValueError("Google Drive service not initialized. Please authenticate first.")
+        
+        changes = []
+        while page_token:
+            results = self.service.changes().list(
+                pageToken=page_token,
+                pageSize=page_size,
+                fields=f"nextPageToken, newStartPageToken, changes(fileId, removed, file(trashed, {INDEX_FILE_FIELDS}))"
+            ).execute()
+            changes.extend(results.get('changes', []))
+            if 'newStartPageToken' in results:
+                self.persist_refreshed_token()
+                return changes, results['newStartPageToken']
+            page_token = results.get('nextPageToken')
+        self.persist_refreshed_token()
+        return changes, page_token
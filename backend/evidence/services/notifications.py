@@ -0,0 +1,146 @@
+import time
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from evidence.models import EvidenceStatus, EvidenceSubmission, Notification, ScheduledJobRun
+
+DUE_DATE_NOTIFICATIONS_JOB = 'due_date_notifications'
+
+
+def claim_daily_run(job_name, run_date=None):
+    """
+    Record that job_name is running for run_date (today when None).
+    Returns False if it already ran that day, so concurrent or repeated
+    schedulers only do the work once. Call it in the same transaction.atomic()
+    block as the work, so a run that fails rolls the marker back too.
+    """
+    run_date = run_date or timezone.now().date()
+    _, created = ScheduledJobRun.objects.get_or_create(job_name=job_name, run_date=run_date)
+    return created
+
+
+def create_due_date_notifications(today=None):
+    """
+    Create a "Due Today" notification for the assignee of every PENDING submission due today
+    that doesn't have one yet. Uses one anti-join query and one bulk insert; the
+    unique_due_date_notification constraint makes concurrent runs safe.
+    Returns the list of notifications inserted.
+    """
+    today = today or timezone.now().date()
+    submissions = (
+        EvidenceSubmission.objects
+        .filter(due_date=today, status=EvidenceStatus.PENDING, category__assignee__isnull=False)
+        .annotate(already_notified=Exists(Notification.objects.filter(
+            user=OuterRef('category__assignee'),
+            submission=OuterRef('pk'),
+            notification_type='OVERDUE'
+        )))
+        .filter(already_notified=False)
+        .select_related('category', 'category__assignee')
+    )
+
+    notifications = [
+        Notification(
+            user=submission.category.assignee,
+            notification_type='OVERDUE',
+            title=f'Due Today: {submission.category.name}',
+            message=f'Evidence submission for "{submission.category.name}" is due today. Please submit your evidence files.',
+            category=submission.category,
+            submission=submission,
+            is_read=False
+        )
+        for submission in submissions
+    ]
+    Notification.objects.bulk_create(notifications, ignore_conflicts=True)
+    return notifications
+
+
+def _desired_notifications(submission, today):
+    """Yield the (user_id, notification_type, title, message) a current submission calls for."""
+    category = submission.category
+    
+    # Notifications for assignees - due dates
+    if category.assignee_id:
+        days_until_due = (submission.due_date - today).days
+        if days_until_due < 0:
+            yield (category.assignee_id, 'OVERDUE', f'Overdue: {category.name}',
+                   f'The submission for {category.name} is overdue by {abs(days_until_due)} day(s).')
+        elif days_until_due <= 3:
+            yield (category.assignee_id, 'DUE_SOON', f'Due Soon: {category.name}',
+                   f'The submission for {category.name} is due in {days_until_due} day(s).')
+    
+    # Notifications for approvers - pending approvals
+    if category.approver_id and submission.status in [EvidenceStatus.SUBMITTED, EvidenceStatus.UNDER_REVIEW]:
+        yield (category.approver_id, 'PENDING_APPROVAL', f'Pending Approval: {category.name}',
+               f'Submission for {category.name} is waiting for your approval.')
+
+
+def generate_notifications(today=None):
+    """
+    Create the due soon / overdue / pending approval notifications implied by every active
+    control's current (latest open) submission and not yet present.
+    Runs as a fixed pipeline: one query for current submissions, one for existing
+    notifications, one bulk insert.
+    Returns counts and timings for reporting.
+    """
+    started = time.perf_counter()
+    today = today or timezone.now().date()
+    
+    # 1. Current submission per active control (latest due date among open submissions)
+    open_submissions = (
+        EvidenceSubmission.objects
+        .filter(
+            category__is_active=True,
+            status__in=[EvidenceStatus.PENDING, EvidenceStatus.SUBMITTED, EvidenceStatus.UNDER_REVIEW]
+        )
+        .select_related('category')
+        .only('id', 'status', 'due_date', 'category__id', 'category__name',
+              'category__assignee_id', 'category__approver_id')
+        .order_by('category_id', '-due_date', '-pk')
+    )
+    current_submissions = {}
+    for submission in open_submissions:
+        current_submissions.setdefault(submission.category_id, submission)
+    loaded = time.perf_counter()
+    
+    # 2. Desired notifications, keyed like the old get_or_create lookups
+    desired = {}
+    for submission in current_submissions.values():
+        for user_id, notification_type, title, message in _desired_notifications(submission, today):
+            key = (user_id, notification_type, submission.category_id, submission.id)
+            desired[key] = Notification(
+                user_id=user_id,
+                notification_type=notification_type,
+                title=title,
+                message=message,
+                category_id=submission.category_id,
+                submission_id=submission.id,
+            )
+    
+    # 3. Diff against existing rows in one query
+    existing = set(
+        Notification.objects
+        .filter(
+            submission_id__in={key[3] for key in desired},
+            notification_type__in={key[1] for key in desired},
+        )
+        .values_list('user_id', 'notification_type', 'category_id', 'submission_id')
+    ) if desired else set()
+    missing = [notification for key, notification in desired.items() if key not in existing]
+    diffed = time.perf_counter()
+    
+    # 4. Insert what is missing
+    Notification.objects.bulk_create(missing, ignore_conflicts=True)
+    finished = time.perf_counter()
+    
+    return {
+        'controls_checked': len(current_submissions),
+        'notifications_desired': len(desired),
+        'notifications_existing': len(desired) - len(missing),
+        'notifications_created': len(missing),
+        'timings_ms': {
+            'load': round((loaded - started) * 1000, 1),
+            'diff': round((diffed - loaded) * 1000, 1),
+            'insert': round((finished - diffed) * 1000, 1),
+            'total': round((finished - started) * 1000, 1),
+        },
+    }
@@ -0,0 +1,73 @@
+from datetime import timedelta
+from django.db.models import Max
+from django.utils import timezone
+from evidence.models import EvidenceCategory, EvidenceStatus, EvidenceSubmission
+from evidence.services.control_status import refresh_control_status
+
+
+def _next_period(category, start_date):
+    """Build (unsaved) the PENDING submission for the period starting on start_date."""
+    due_date_obj = category.calculate_next_due_date(start_date)
+    due_date = due_date_obj.date() if hasattr(due_date_obj, 'date') else due_date_obj
+    return EvidenceSubmission(
+        category=category,
+        period_start_date=start_date,
+        period_end_date=due_date - timedelta(days=1),
+        due_date=due_date,
+        status=EvidenceStatus.PENDING
+    )
+
+
+def generate_submission_periods(categories=None):
+    """
+    Create the next submission period for every category that has no submission yet
+    or whose latest period has ended (active categories when None).
+    Safe to run repeatedly or concurrently: rows are bulk inserted and the
+    (category, period_start_date) unique constraint drops duplicates.
+    Returns the submissions this call inserted (with category loaded); periods that another
+    run created first are dropped by the constraint and not returned.
+    """
+    if categories is None:
+        categories = EvidenceCategory.objects.filter(is_active=True)
+    categories = list(categories)
+    if not categories:
+        return []
+
+    today = timezone.now().date()
+    latest_end_dates = dict(
+        EvidenceSubmission.objects
+        .filter(category__in=categories)
+        .order_by()
+        .values('category_id')
+        .annotate(latest_end=Max('period_end_date'))
+        .values_list('category_id', 'latest_end')
+    )
+
+    new_submissions = []
+    for category in categories:
+        latest_end = latest_end_dates.get(category.pk)
+        if latest_end is None:
+            # First submission for this category
+            new_submissions.append(_next_period(category, today))
+        elif latest_end <= today:
+            new_submissions.append(_next_period(category, latest_end + timedelta(days=1)))
+
+    if not new_submissions:
+        return []
+
+    # ignore_conflicts leaves pks unset and gives no way to tell which rows were skipped, so
+    # re-read the planned periods and keep the ones created since the insert started
+    inserted_after = timezone.now()
+    EvidenceSubmission.objects.bulk_create(new_submissions, ignore_conflicts=True)
+    planned = {(submission.category_id, submission.period_start_date) for submission in new_submissions}
+    inserted = [
+        submission for submission in EvidenceSubmission.objects.filter(
+            category_id__in={category_id for category_id, _ in planned},
+            period_start_date__in={start_date for _, start_date in planned},
+            created_at__gte=inserted_after,
+        ).select_related('category').order_by('category__name', 'id')
+        if (submission.category_id, submission.period_start_date) in planned
+    ]
+    if inserted:
+        refresh_control_status([submission.category_id for submission in inserted])
+    return inserted
@@ -0,0 +1,32 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from evidence.models import EvidenceFile, EvidenceSubmission
+from evidence.services.control_status import schedule_control_status_refresh
+
+
+@receiver(post_save, sender=EvidenceSubmission)
+@receiver(post_delete, sender=EvidenceSubmission)
+def refresh_status_for_submission(sender, instance, raw=False, **kwargs):
+    """Keep ControlStatus in sync with submission changes made anywhere (views, admin, shell, commands)"""
+    if raw:
+        return
+    schedule_control_status_refresh([instance.category_id])
+
+
+# The EvidenceFile fields ControlStatus reads (besides the file existing at all)
+CONTROL_STATUS_FILE_FIELDS = {'submission', 'uploaded_at', 'uploaded_by'}
+
+
+@receiver(post_save, sender=EvidenceFile)
+@receiver(post_delete, sender=EvidenceFile)
+def refresh_status_for_file(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Keep ControlStatus in sync with file changes made anywhere (views, admin, shell, commands)"""
+    if raw:
+        return
+    # e.g. the Drive upload worker saving only the Drive file id/url
+    if update_fields and not CONTROL_STATUS_FILE_FIELDS.intersection(update_fields):
+        return
+    # The submission may already be gone when files are deleted with it; its own signal covers that
+    category_id = EvidenceSubmission.objects.filter(pk=instance.submission_id).values_list('category_id', flat=True).first()
+    if category_id is not None:
+        schedule_control_status_refresh([category_id])
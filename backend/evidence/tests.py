@@ -0,0 +1,841 @@
+import base64
+import csv
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from urllib.parse import urlencode
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.test import APIClient
+from .management.commands.send_reminders import Command as SendRemindersCommand
+from .models import (
+    CategoryGroup, DriveFileIndex, DriveUploadJob, DriveUploadStatus, EvidenceCategory, EvidenceFile, EvidenceStatus,
+    EvidenceSubmission, Notification, ReminderLog, ScheduledJobRun, UploadSession, UploadSessionStatus
+)
+from .services import chunked_uploads
+from .services.export_jobs import export_data_version
+from .services.exports import EVIDENCE_LEDGER_COLUMNS
+from .services.control_status import refresh_control_status
+from .services.drive_index import find_drive_copy
+from .services.drive_sync import sync_drive
+from .services.drive_uploads import claim_jobs, enqueue_drive_uploads, run_job
+from .services.submission_periods import generate_submission_periods
+
+
+def create_controls(count, assignee=None, approver=None, start=0):
+    """Controls spread over the category groups, each with a few submissions (with files) in different statuses"""
+    groups = [code for code, _ in CategoryGroup.choices]
+    statuses = [EvidenceStatus.PENDING, EvidenceStatus.SUBMITTED, EvidenceStatus.APPROVED, EvidenceStatus.REJECTED]
+    today = timezone.now().date()
+    categories = []
+    for index in range(start, start + count):
+        category = EvidenceCategory.objects.create(
+            name=f'Control {index:04d}',
+            description='',
+            evidence_requirements='',
+            review_period='MONTHLY',
+            category_group=groups[index % len(groups)],
+            assignee=assignee,
+            approver=approver,
+        )
+        for period in range(3):
+            due_date = today + timedelta(days=20 - 30 * period)
+            submission_status = statuses[(index + period) % len(statuses)]
+            submission = EvidenceSubmission.objects.create(
+                category=category,
+                period_start_date=due_date - timedelta(days=30),
+                period_end_date=due_date - timedelta(days=1),
+                due_date=due_date,
+                status=submission_status,
+                submitted_by=assignee,
+                submitted_at=timezone.now() if submission_status != EvidenceStatus.PENDING else None,
+                reviewed_by=approver if submission_status in [EvidenceStatus.APPROVED, EvidenceStatus.REJECTED] else None,
+                reviewed_at=timezone.now() if submission_status in [EvidenceStatus.APPROVED, EvidenceStatus.REJECTED] else None,
+            )
+            if submission_status != EvidenceStatus.PENDING:
+                EvidenceFile.objects.create(
+                    submission=submission,
+                    filename=f'evidence-{index}-{period}.pdf',
+                    file_size=10,
+                    mime_type='application/pdf',
+                    uploaded_by=assignee,
+                    status=submission_status,
+                )
+        categories.append(category)
+    refresh_control_status([category.pk for category in categories])
+    return categories
+
+
+def use_temporary_media_root(testcase):
+    """Point MEDIA_ROOT (evidence storage) at a directory removed when the test ends; returns its path"""
+    media_root = tempfile.mkdtemp()
+    testcase.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+    settings_override = override_settings(MEDIA_ROOT=media_root)
+    settings_override.enable()
+    testcase.addCleanup(settings_override.disable)
+    return media_root
+
+
+class QueryCountTestCase(TestCase):
+    def setUp(self):
+        self.assignee = User.objects.create_user('assignee', 'assignee@example.com', 'password')
+        self.approver = User.objects.create_user('approver', 'approver@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.assignee)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries.captured_queries)
+
+
+class AnalyticsQueryCountTests(QueryCountTestCase):
+    def test_query_count_does_not_grow_with_controls(self):
+        create_controls(5, self.assignee, self.approver)
+        small = self.count_queries('/api/submissions/analytics/')
+
+        create_controls(40, self.assignee, self.approver, start=5)
+        with self.assertNumQueries(small):
+            response = self.client.get('/api/submissions/analytics/')
+        self.assertEqual(response.status_code, 200)
+
+
+class CategoryGroupsQueryCountTests(QueryCountTestCase):
+    def test_groups_are_built_from_one_query(self):
+        create_controls(3 * len(CategoryGroup.choices), self.assignee, self.approver)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/categories/groups/?show_all=true')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), len(CategoryGroup.choices))
+        self.assertTrue(all(group['count'] == 3 for group in response.data))
+
+
+class ControlStatusSignalTests(TestCase):
+    def setUp(self):
+        self.assignee = User.objects.create_user('assignee', 'assignee@example.com', 'password')
+        self.category = create_controls(1, self.assignee)[0]
+
+    def test_saving_a_submission_refreshes_control_status(self):
+        submission = self.category.submissions.order_by('-due_date').first()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            submission.status = EvidenceStatus.UNDER_REVIEW
+            submission.save()
+            submission.save()
+        self.assertEqual(len(callbacks), 2)
+        self.category.control_status.refresh_from_db()
+        self.assertEqual(self.category.control_status.current_status, EvidenceStatus.UNDER_REVIEW)
+
+    def test_file_changes_refresh_control_status(self):
+        submission = self.category.submissions.order_by('-due_date').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            evidence_file = EvidenceFile.objects.create(
+                submission=submission,
+                filename='new.pdf',
+                file_size=10,
+                mime_type='application/pdf',
+                uploaded_by=self.assignee,
+            )
+        self.category.control_status.refresh_from_db()
+        self.assertEqual(self.category.control_status.last_uploaded_at, evidence_file.uploaded_at)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            evidence_file.google_drive_file_id = 'drive-id'
+            evidence_file.save(update_fields=['google_drive_file_id'])
+        self.assertEqual(callbacks, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            EvidenceFile.objects.filter(submission__category=self.category).delete()
+        self.category.control_status.refresh_from_db()
+        self.assertIsNone(self.category.control_status.last_uploaded_at)
+
+
+class GenerateSubmissionPeriodsTests(TestCase):
+    def test_returns_only_inserted_periods(self):
+        categories = [
+            EvidenceCategory.objects.create(
+                name=f'Control {index}', description='', evidence_requirements='', review_period='MONTHLY'
+            )
+            for index in range(3)
+        ]
+        # Another run already created the first control's period
+        existing = generate_submission_periods(categories[:1])
+        self.assertEqual(len(existing), 1)
+
+        created = generate_submission_periods(categories)
+        self.assertEqual(sorted(submission.category_id for submission in created), [c.pk for c in categories[1:]])
+        self.assertTrue(all(submission.pk for submission in created))
+        self.assertEqual(generate_submission_periods(categories), [])
+        self.assertEqual(EvidenceSubmission.objects.count(), 3)
+
+
+class CursorPaginationTests(QueryCountTestCase):
+    def test_pages_through_tied_due_dates_without_offset(self):
+        create_controls(8, self.assignee, self.approver)
+        expected = list(EvidenceSubmission.objects.order_by('-due_date', '-id').values_list('id', flat=True))
+        self.assertGreater(len(expected), len(set(EvidenceSubmission.objects.values_list('due_date', flat=True))))
+
+        pages = []
+        url = '/api/submissions/?page_size=5'
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(any('OFFSET' in query['sql'] for query in queries.captured_queries))
+            pages.append([submission['id'] for submission in response.data['results']])
+            url = response.data['next']
+        self.assertEqual([pk for page in pages for pk in page], expected)
+
+        previous_pages = []
+        url = response.data['previous']
+        while url:
+            response = self.client.get(url)
+            previous_pages.insert(0, [submission['id'] for submission in response.data['results']])
+            url = response.data['previous']
+        self.assertEqual(previous_pages, pages[:-1])
+
+    def test_pages_through_files_by_upload_time(self):
+        create_controls(8, self.assignee, self.approver)
+        expected = list(EvidenceFile.objects.order_by('-uploaded_at', '-id').values_list('id', flat=True))
+        seen = []
+        url = '/api/files/?page_size=4'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(evidence_file['id'] for evidence_file in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, expected)
+
+    def test_rejects_malformed_cursor(self):
+        response = self.client.get('/api/submissions/?cursor=cD0lNUIxJTVE')
+        self.assertEqual(response.status_code, 404)
+        # Well-formed cursor whose values don't fit the ordering fields
+        cursor = base64.b64encode(urlencode({'p': json.dumps(['not-a-date', 'x'])}).encode()).decode()
+        response = self.client.get('/api/submissions/', {'cursor': cursor})
+        self.assertEqual(response.status_code, 404)
+
+
+class ReminderLogTests(TestCase):
+    def test_logs_are_written_as_each_batch_is_sent(self):
+        tomorrow = timezone.now().date() + timedelta(days=1)
+        for index in range(3):
+            assignee = User.objects.create_user(f'assignee{index}', f'assignee{index}@example.com', 'password')
+            category = EvidenceCategory.objects.create(
+                name=f'Control {index}', description='', evidence_requirements='', review_period='MONTHLY',
+                assignee=assignee,
+            )
+            EvidenceSubmission.objects.create(
+                category=category,
+                period_start_date=tomorrow - timedelta(days=30),
+                period_end_date=tomorrow - timedelta(days=1),
+                due_date=tomorrow,
+            )
+
+        send_batch = SendRemindersCommand.send_batch
+        calls = []
+
+        def send_then_crash(command, batch):
+            calls.append(batch)
+            if len(calls) > 1:
+                raise RuntimeError('worker killed')
+            return send_batch(command, batch)
+
+        with mock.patch.object(SendRemindersCommand, 'send_batch', autospec=True, side_effect=send_then_crash):
+            with self.assertRaises(RuntimeError):
+                call_command('send_reminders', batch_size=1, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(ReminderLog.objects.count(), 1)
+
+        # The next run only emails the people who didn't get a reminder
+        call_command('send_reminders', batch_size=1, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(ReminderLog.objects.count(), 3)
+
+
+class DueDateNotificationRunTests(TestCase):
+    def test_failed_run_does_not_keep_the_daily_marker(self):
+        assignee = User.objects.create_user('assignee', 'assignee@example.com', 'password')
+        category = EvidenceCategory.objects.create(
+            name='Control', description='', evidence_requirements='', review_period='MONTHLY', assignee=assignee
+        )
+        today = timezone.now().date()
+        EvidenceSubmission.objects.create(
+            category=category,
+            period_start_date=today - timedelta(days=30),
+            period_end_date=today - timedelta(days=1),
+            due_date=today,
+        )
+        command = SendRemindersCommand(stdout=StringIO())
+
+        target = 'evidence.management.commands.send_reminders.create_due_date_notifications'
+        with mock.patch(target, side_effect=RuntimeError('insert failed')):
+            with self.assertRaises(RuntimeError):
+                command.send_due_date_notifications(today)
+        self.assertFalse(ScheduledJobRun.objects.exists())
+
+        command.send_due_date_notifications(today)
+        command.send_due_date_notifications(today)
+        self.assertEqual(ScheduledJobRun.objects.count(), 1)
+        self.assertEqual(Notification.objects.filter(user=assignee).count(), 1)
+
+
+class FakeDriveService:
+    """Stands in for GoogleDriveService: hands out folder ids and records uploads"""
+    uploads = []
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def create_folder(self, folder_name, parent_folder_id=None):
+        return f'folder-{folder_name}'
+
+    def create_folders(self, folders):
+        return {key: f'folder-{key}' for key, _, _ in folders}, {}
+
+    def upload_file(self, **kwargs):
+        self.uploads.append(kwargs['filename'])
+        return {'file_id': 'file', 'web_url': 'url'}
+
+
+class GoogleDriveFolderSyncTests(QueryCountTestCase):
+    @mock.patch('evidence.services.drive_sync.GoogleDriveService', FakeDriveService)
+    @mock.patch('evidence.views.resolve_drive_credentials', return_value=('access', 'refresh'))
+    def test_creates_folders_and_queues_uploads(self, _):
+        create_controls(4, self.assignee, self.approver)
+        EvidenceFile.objects.update(file='evidence/stored.pdf')
+        approved = EvidenceFile.objects.filter(submission__status=EvidenceStatus.APPROVED)
+
+        response = self.client.post('/api/categories/create-google-drive-folders/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['categories_created'], 4)
+        self.assertEqual(response.data['files_queued'], approved.count())
+        self.assertEqual(
+            set(DriveUploadJob.objects.values_list('evidence_file_id', flat=True)),
+            set(approved.values_list('id', flat=True)),
+        )
+        self.assertEqual(FakeDriveService.uploads, [])
+
+
+class FailingDriveService(FakeDriveService):
+    def upload_file(self, **kwargs):
+        raise ConnectionError('Drive is unavailable')
+
+
+@mock.patch('evidence.services.drive_uploads.resolve_drive_credentials', return_value=('access', 'refresh'))
+class DriveUploadQueueTests(QueryCountTestCase):
+    def setUp(self):
+        super().setUp()
+        use_temporary_media_root(self)
+        self.addCleanup(setattr, FakeDriveService, 'uploads', [])
+        FakeDriveService.uploads = []
+        category = create_controls(1, self.assignee, self.approver)[0]
+        EvidenceCategory.objects.filter(pk=category.pk).update(google_drive_folder_id='control-folder')
+        self.evidence_file = EvidenceFile.objects.filter(submission__category=category).first()
+        self.evidence_file.file.save('evidence/queued.pdf', ContentFile(b'%PDF-1.7 queued'))
+
+    def run_next_job(self):
+        job_ids = claim_jobs(1)
+        self.assertEqual(len(job_ids), 1)
+        with self.assertLogs('evidence.services.drive_uploads', 'ERROR'):
+            return run_job(job_ids[0])
+
+    def make_due(self, job):
+        DriveUploadJob.objects.filter(pk=job.pk).update(next_attempt_at=timezone.now())
+
+    @mock.patch('evidence.services.drive_uploads.GoogleDriveService', FailingDriveService)
+    def test_failed_upload_is_retried_with_backoff(self, _):
+        enqueue_drive_uploads([self.evidence_file])
+
+        before = timezone.now()
+        job = self.run_next_job()
+        self.assertEqual(job.status, DriveUploadStatus.PENDING)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.last_error, 'Drive is unavailable')
+        self.assertGreaterEqual(job.next_attempt_at, before + timedelta(seconds=30))
+        # Not due yet
+        self.assertEqual(claim_jobs(1), [])
+
+        self.make_due(job)
+        before = timezone.now()
+        job = self.run_next_job()
+        self.assertEqual(job.status, DriveUploadStatus.PENDING)
+        self.assertGreaterEqual(job.next_attempt_at, before + timedelta(seconds=60))
+
+    @mock.patch('evidence.services.drive_uploads.GoogleDriveService', FailingDriveService)
+    def test_job_fails_after_max_attempts(self, _):
+        enqueue_drive_uploads([self.evidence_file])
+        job = DriveUploadJob.objects.get()
+        DriveUploadJob.objects.filter(pk=job.pk).update(max_attempts=2)
+
+        self.assertEqual(self.run_next_job().status, DriveUploadStatus.PENDING)
+        self.make_due(job)
+        job = self.run_next_job()
+        self.assertEqual(job.status, DriveUploadStatus.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(claim_jobs(1), [])
+
+    @mock.patch('evidence.services.drive_uploads.GoogleDriveService', FakeDriveService)
+    def test_enqueueing_twice_keeps_one_active_job(self, _):
+        first = enqueue_drive_uploads([self.evidence_file])
+        second = enqueue_drive_uploads([self.evidence_file])
+        self.assertEqual(len(first), 1)
+        self.assertEqual(second, first)
+        self.assertEqual(DriveUploadJob.objects.count(), 1)
+
+        job = run_job(claim_jobs(1)[0])
+        self.assertEqual(job.status, DriveUploadStatus.SUCCEEDED)
+        self.assertEqual(FakeDriveService.uploads, [self.evidence_file.filename])
+        # Once the file is on Drive there is nothing left to queue
+        self.evidence_file.refresh_from_db()
+        self.assertEqual(enqueue_drive_uploads([self.evidence_file]), [])
+
+
+class ChunkedUploadTestCase(TestCase):
+    content = b'%PDF-1.7 ' + bytes(range(256)) * 3 + b'%%EOF'
+
+    def setUp(self):
+        self.media_root = use_temporary_media_root(self)
+        settings_override = override_settings(CHUNKED_UPLOAD_PART_SIZE=300)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(chunked_uploads._hashers.clear)
+
+        self.assignee = User.objects.create_user('assignee', 'assignee@example.com', 'password')
+        self.approver = User.objects.create_user('approver', 'approver@example.com', 'password')
+        category = EvidenceCategory.objects.create(
+            name='Control', description='', evidence_requirements='', review_period='MONTHLY',
+            assignee=self.assignee, approver=self.approver,
+        )
+        today = timezone.now().date()
+        self.submission = EvidenceSubmission.objects.create(
+            category=category,
+            period_start_date=today,
+            period_end_date=today + timedelta(days=29),
+            due_date=today + timedelta(days=30),
+        )
+
+    def parts(self):
+        size = chunked_uploads.part_size()
+        return [self.content[start:start + size] for start in range(0, len(self.content), size)]
+
+
+class LocalChunkedUploadTests(ChunkedUploadTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.assignee)
+        self.uploads_url = f'/api/submissions/{self.submission.pk}/uploads/'
+
+    def start(self):
+        response = self.client.post(
+            self.uploads_url, {'filename': 'report.pdf', 'size': len(self.content)}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        return f"{self.uploads_url}{response.data['id']}/"
+
+    def put_part(self, upload_url, part_number, data):
+        return self.client.put(f'{upload_url}parts/{part_number}/', data, content_type='application/octet-stream')
+
+    def test_upload_retry_resume_and_complete(self):
+        upload_url = self.start()
+        first, second, third = self.parts()
+
+        self.assertEqual(self.put_part(upload_url, 1, first).status_code, 200)
+        # A lost response: the same part is sent again
+        self.assertEqual(self.put_part(upload_url, 1, first).status_code, 200)
+        self.assertEqual(self.put_part(upload_url, 3, third).status_code, 409)
+
+        # Resume from the status the server reports, after the running hash was lost (another process)
+        chunked_uploads._hashers.clear()
+        status_response = self.client.get(upload_url)
+        self.assertEqual(status_response.data['next_part'], 2)
+        self.assertEqual(status_response.data['received_size'], len(first))
+        self.assertEqual(self.put_part(upload_url, 2, second).status_code, 200)
+        self.assertEqual(self.put_part(upload_url, 3, third[:-1]).status_code, 400)
+        self.assertEqual(self.put_part(upload_url, 3, third).status_code, 200)
+
+        response = self.client.post(f'{upload_url}complete/', {}, format='json')
+        self.assertEqual(response.status_code, 200)
+        session = UploadSession.objects.get()
+        self.assertEqual(session.status, UploadSessionStatus.COMPLETED)
+        self.assertEqual(session.detected_mime_type, 'application/pdf')
+        evidence_file = session.evidence_file
+        self.assertEqual(evidence_file.sha256, hashlib.sha256(self.content).hexdigest())
+        with evidence_file.file.open('rb') as stored:
+            self.assertEqual(stored.read(), self.content)
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, session.staging_key)))
+        self.assertEqual(self.client.post(f'{upload_url}complete/', {}, format='json').status_code, 409)
+
+    def test_failed_completion_can_be_retried(self):
+        upload_url = self.start()
+        for part_number, part in enumerate(self.parts(), start=1):
+            self.put_part(upload_url, part_number, part)
+
+        target = 'evidence.views.EvidenceSubmissionViewSet.record_submitted_files'
+        with mock.patch(target, side_effect=RuntimeError('database unavailable')), self.assertLogs('evidence.views', 'ERROR'):
+            response = self.client.post(f'{upload_url}complete/', {}, format='json')
+        self.assertEqual(response.status_code, 500)
+        session = UploadSession.objects.get()
+        self.assertEqual(session.status, UploadSessionStatus.ACTIVE)
+        self.assertFalse(EvidenceFile.objects.exists())
+
+        response = self.client.post(f'{upload_url}complete/', {}, format='json')
+        self.assertEqual(response.status_code, 200)
+        session.refresh_from_db()
+        self.assertEqual(session.status, UploadSessionStatus.COMPLETED)
+        with session.evidence_file.file.open('rb') as stored:
+            self.assertEqual(stored.read(), self.content)
+
+    def test_abort_after_failed_completion_removes_the_blob(self):
+        upload_url = self.start()
+        for part_number, part in enumerate(self.parts(), start=1):
+            self.put_part(upload_url, part_number, part)
+        target = 'evidence.views.EvidenceSubmissionViewSet.record_submitted_files'
+        with mock.patch(target, side_effect=RuntimeError('database unavailable')), self.assertLogs('evidence.views', 'ERROR'):
+            self.client.post(f'{upload_url}complete/', {}, format='json')
+        stored_name = chunked_uploads.content_address(hashlib.sha256(self.content).hexdigest(), 'report.pdf')
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, stored_name)))
+
+        self.client.delete(upload_url)
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, stored_name)))
+
+    def test_incomplete_upload_cannot_complete(self):
+        upload_url = self.start()
+        self.put_part(upload_url, 1, self.parts()[0])
+        self.assertEqual(self.client.post(f'{upload_url}complete/', {}, format='json').status_code, 400)
+
+    def test_abort_discards_parts(self):
+        upload_url = self.start()
+        self.put_part(upload_url, 1, self.parts()[0])
+        session = UploadSession.objects.get()
+        self.assertIn(session.pk, chunked_uploads._hashers)
+
+        response = self.client.delete(upload_url)
+        self.assertEqual(response.data['status'], UploadSessionStatus.ABORTED)
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, session.staging_key)))
+        self.assertNotIn(session.pk, chunked_uploads._hashers)
+        self.assertEqual(self.put_part(upload_url, 2, self.parts()[1]).status_code, 409)
+
+    @mock.patch.object(chunked_uploads, 'HASHER_CACHE_SIZE', 2)
+    def test_running_hashes_are_bounded(self):
+        upload_urls = [self.start() for _ in range(3)]
+        for upload_url in upload_urls:
+            self.put_part(upload_url, 1, self.parts()[0])
+        self.assertEqual(len(chunked_uploads._hashers), 2)
+
+        # Two hours later the untouched session is dropped as idle
+        later = chunked_uploads.time.monotonic() + 2 * chunked_uploads.HASHER_IDLE_SECONDS
+        with mock.patch.object(chunked_uploads.time, 'monotonic', return_value=later):
+            self.put_part(upload_urls[1], 2, self.parts()[1])
+        self.assertEqual(list(chunked_uploads._hashers), [UploadSession.objects.order_by('id')[1].pk])
+
+
+class FakeS3Client:
+    """The S3 multipart calls S3UploadBackend makes, kept in memory"""
+
+    class exceptions:
+        class NoSuchUpload(Exception):
+            pass
+
+    def __init__(self):
+        self.objects = {}
+        self.multipart_uploads = {}
+
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = f'upload-{len(self.multipart_uploads) + 1}'
+        self.multipart_uploads[upload_id] = {}
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        data = Body.read()
+        self.multipart_uploads[UploadId][PartNumber] = data
+        return {'ETag': hashlib.md5(data).hexdigest()}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.multipart_uploads.pop(UploadId)
+        assert [part['PartNumber'] for part in MultipartUpload['Parts']] == sorted(parts)
+        self.objects[Key] = b''.join(parts[number] for number in sorted(parts))
+
+    def get_object(self, Bucket, Key):
+        body = io.BytesIO(self.objects[Key])
+        body.iter_chunks = lambda size: iter(lambda: body.read(size), b'')
+        return {'Body': body}
+
+    def copy_object(self, Bucket, Key, CopySource):
+        self.objects[Key] = self.objects[CopySource['Key']]
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        if self.multipart_uploads.pop(UploadId, None) is None:
+            raise self.exceptions.NoSuchUpload()
+
+
+@override_settings(CHUNKED_UPLOAD_BACKEND='s3', CHUNKED_UPLOAD_S3_BUCKET='evidence')
+class S3ChunkedUploadTests(ChunkedUploadTestCase):
+    def setUp(self):
+        super().setUp()
+        self.s3 = FakeS3Client()
+        backend = chunked_uploads.S3UploadBackend.__new__(chunked_uploads.S3UploadBackend)
+        backend.bucket, backend.client = 'evidence', self.s3
+        backends = mock.patch.dict(chunked_uploads.UPLOAD_BACKENDS, {'s3': lambda: backend})
+        backends.start()
+        self.addCleanup(backends.stop)
+
+    def test_multipart_upload_retry_resume_and_complete(self):
+        session = chunked_uploads.start_upload(self.submission, self.assignee, 'report.pdf', len(self.content))
+        self.assertEqual(session.backend, 's3')
+        first, second, third = self.parts()
+
+        chunked_uploads.upload_part(session, 1, io.BytesIO(first))
+        chunked_uploads.upload_part(session, 1, io.BytesIO(first))
+        with self.assertRaises(chunked_uploads.ChunkedUploadError):
+            chunked_uploads.upload_part(session, 3, io.BytesIO(third))
+
+        # Resume with the session as stored, in a process that never saw the first part
+        chunked_uploads._hashers.clear()
+        session = UploadSession.objects.get(pk=session.pk)
+        self.assertEqual(session.next_part, 2)
+        chunked_uploads.upload_part(session, 2, io.BytesIO(second))
+        chunked_uploads.upload_part(session, 3, io.BytesIO(third))
+        self.assertEqual([part['PartNumber'] for part in session.parts], [1, 2, 3])
+
+        stored_file = chunked_uploads.complete_upload(session)
+        self.assertEqual(stored_file['sha256'], hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(stored_file['mime_type'], 'application/pdf')
+        self.assertEqual(self.s3.objects, {stored_file['stored_name']: self.content})
+
+    def test_abort_removes_the_multipart_upload(self):
+        session = chunked_uploads.start_upload(self.submission, self.assignee, 'report.pdf', len(self.content))
+        chunked_uploads.upload_part(session, 1, io.BytesIO(self.parts()[0]))
+
+        chunked_uploads.abort_upload(session)
+        self.assertEqual(session.status, UploadSessionStatus.ABORTED)
+        self.assertEqual(self.s3.multipart_uploads, {})
+        self.assertEqual(self.s3.objects, {})
+
+
+class ContentAddressedStorageTests(ChunkedUploadTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.assignee)
+        self.addCleanup(setattr, FakeDriveService, 'uploads', [])
+        FakeDriveService.uploads = []
+
+    def submit(self, filename):
+        return self.client.post(
+            f'/api/submissions/{self.submission.pk}/submit/',
+            {'files': [SimpleUploadedFile(filename, self.content, content_type='application/pdf')]},
+            format='multipart',
+        )
+
+    def drive_file(self, submission_status, folder_id='control-folder'):
+        """A stored, hashed file of self.content on a control whose Drive folder is folder_id"""
+        EvidenceCategory.objects.filter(pk=self.submission.category_id).update(google_drive_folder_id=folder_id)
+        EvidenceSubmission.objects.filter(pk=self.submission.pk).update(status=submission_status)
+        return EvidenceFile.objects.create(
+            submission=self.submission,
+            filename='report.pdf',
+            file='evidence_blobs/stored.pdf',
+            file_size=len(self.content),
+            mime_type='application/pdf',
+            uploaded_by=self.assignee,
+            sha256=hashlib.sha256(self.content).hexdigest(),
+        )
+
+    def test_identical_uploads_share_one_blob(self):
+        self.assertEqual(self.submit('policy.pdf').status_code, 200)
+        self.assertEqual(self.submit('policy-copy.pdf').status_code, 200)
+
+        first, second = EvidenceFile.objects.order_by('id')
+        self.assertEqual(first.sha256, hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(second.sha256, first.sha256)
+        self.assertEqual(second.file.name, first.file.name)
+        blobs = [
+            os.path.join(directory, name)
+            for directory, _, names in os.walk(os.path.join(self.media_root, 'evidence_blobs'))
+            for name in names
+        ]
+        self.assertEqual(len(blobs), 1)
+        with open(blobs[0], 'rb') as stored:
+            self.assertEqual(stored.read(), self.content)
+
+    @mock.patch('evidence.services.drive_uploads.GoogleDriveService', FakeDriveService)
+    @mock.patch('evidence.services.drive_uploads.resolve_drive_credentials', return_value=('access', 'refresh'))
+    def test_upload_job_links_content_already_in_the_folder(self, _):
+        earlier = self.drive_file(EvidenceStatus.APPROVED)
+        EvidenceFile.objects.filter(pk=earlier.pk).update(google_drive_file_id='drive-1', google_drive_file_url='https://drive/1')
+        evidence_file = self.drive_file(EvidenceStatus.APPROVED)
+        self.assertEqual(find_drive_copy(evidence_file.sha256, 'control-folder'), ('drive-1', 'https://drive/1'))
+        self.assertIsNone(find_drive_copy(evidence_file.sha256, 'other-folder'))
+
+        enqueue_drive_uploads([evidence_file])
+        job = run_job(claim_jobs(1)[0])
+        self.assertEqual(job.status, DriveUploadStatus.SUCCEEDED)
+        evidence_file.refresh_from_db()
+        self.assertEqual(evidence_file.google_drive_file_id, 'drive-1')
+        self.assertEqual(FakeDriveService.uploads, [])
+
+    @mock.patch('evidence.services.drive_sync.refresh_drive_index')
+    @mock.patch('evidence.services.drive_sync.GoogleDriveService', FakeDriveService)
+    def test_sync_links_content_found_in_the_drive_index(self, _):
+        evidence_file = self.drive_file(EvidenceStatus.APPROVED)
+        DriveFileIndex.objects.create(
+            file_id='drive-2', name='report.pdf', parent_id='control-folder',
+            sha256_checksum=evidence_file.sha256, web_view_link='https://drive/2',
+        )
+
+        result = sync_drive('access', 'refresh', workers=1, rate_per_second=0)
+        self.assertEqual(result['files_uploaded'], 0)
+        self.assertEqual(result['files_already_on_drive'], 1)
+        evidence_file.refresh_from_db()
+        self.assertEqual(evidence_file.google_drive_file_id, 'drive-2')
+        self.assertEqual(FakeDriveService.uploads, [])
+
+
+class ExportDataVersionTests(TestCase):
+    def test_changes_when_a_referenced_user_is_renamed(self):
+        assignee = User.objects.create_user('assignee', 'assignee@example.com', 'password')
+        approver = User.objects.create_user('approver', 'approver@example.com', 'password')
+        create_controls(4, assignee, approver)
+        version = export_data_version()
+        self.assertEqual(export_data_version(), version)
+
+        User.objects.filter(pk=approver.pk).update(username='approver-renamed')
+        self.assertNotEqual(export_data_version(), version)
+
+
+class EvidenceLedgerExportTests(QueryCountTestCase):
+    def setUp(self):
+        super().setUp()
+        self.categories = create_controls(3, self.assignee, self.approver)
+        EvidenceCategory.objects.filter(pk=self.categories[2].pk).update(is_active=False)
+        self.files = EvidenceFile.objects.filter(
+            submission__category__in=self.categories[:2]
+        ).select_related('submission__category', 'submission__reviewed_by').order_by(
+            'submission__category__name', 'submission__period_start_date', 'uploaded_at', 'id'
+        )
+
+    def export(self, format_type):
+        response = self.client.get(f'/api/categories/export/?format={format_type}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            response['Content-Disposition'], f'attachment; filename="evidence_ledger.{format_type}"'
+        )
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_ledger(self):
+        response, body = self.export('csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        header, *rows = list(csv.reader(StringIO(body)))
+        self.assertEqual(header, [column for column, _ in EVIDENCE_LEDGER_COLUMNS])
+        self.assertEqual(len(rows), len(self.files))
+
+        group_labels = dict(CategoryGroup.choices)
+        for row, evidence_file in zip(rows, self.files):
+            row = dict(zip(header, row))
+            submission = evidence_file.submission
+            self.assertEqual(row['file_id'], str(evidence_file.pk))
+            self.assertEqual(row['control'], submission.category.name)
+            self.assertEqual(row['category_group'], group_labels[submission.category.category_group])
+            self.assertEqual(row['period_start_date'], submission.period_start_date.isoformat())
+            self.assertEqual(row['uploaded_at'], evidence_file.uploaded_at.isoformat())
+            # No file in the fixture has a reviewer, a review time or a Drive copy
+            self.assertEqual(row['reviewed_by'], '')
+            self.assertEqual(row['reviewed_at'], '')
+            self.assertEqual(row['google_drive_file_id'], '')
+
+    def test_ndjson_ledger(self):
+        response, body = self.export('ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = body.splitlines()
+        self.assertEqual(len(lines), len(self.files))
+
+        group_labels = dict(CategoryGroup.choices)
+        for line, evidence_file in zip(lines, self.files):
+            row = json.loads(line)
+            submission = evidence_file.submission
+            self.assertEqual(list(row), [column for column, _ in EVIDENCE_LEDGER_COLUMNS])
+            self.assertEqual(row['file_id'], evidence_file.pk)
+            self.assertEqual(row['category_group'], group_labels[submission.category.category_group])
+            self.assertEqual(row['period_end_date'], submission.period_end_date.isoformat())
+            # DjangoJSONEncoder writes ISO 8601 datetimes to the millisecond
+            self.assertLess(abs(parse_datetime(row['uploaded_at']) - evidence_file.uploaded_at), timedelta(milliseconds=1))
+            self.assertIsNone(row['reviewed_by'])
+
+
+class FileDownloadTests(QueryCountTestCase):
+    content = bytes(range(256)) * 4
+
+    def setUp(self):
+        super().setUp()
+        use_temporary_media_root(self)
+        category = create_controls(1, self.assignee, self.approver)[0]
+        self.evidence_file = EvidenceFile.objects.filter(submission__category=category).first()
+        self.evidence_file.file.save('evidence/download.bin', ContentFile(self.content), save=False)
+        self.evidence_file.sha256 = hashlib.sha256(self.content).hexdigest()
+        self.evidence_file.save()
+        self.url = f'/api/files/{self.evidence_file.pk}/download/'
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_download(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.content)
+        self.assertEqual(response['ETag'], f'"{self.evidence_file.sha256}"')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_byte_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-99')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 0-99/{len(self.content)}')
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(self.body(response), self.content[:100])
+
+    def test_suffix_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-24')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 1000-1023/{len(self.content)}')
+        self.assertEqual(self.body(response), self.content[-24:])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_mismatched_if_range_sends_the_whole_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-99', HTTP_IF_RANGE='"stale-etag"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.content)
+
+    def test_matching_if_none_match_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(EVIDENCE_DOWNLOAD_SENDFILE='x-accel-redirect', EVIDENCE_DOWNLOAD_ACCEL_PREFIX='/protected-media/')
+    def test_accel_redirect_hands_off_to_nginx(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.evidence_file.file.name}')
+        self.assertEqual(response.content, b'')
@@ -0,0 +1,32 @@
+import hashlib
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+
+class Sha256UploadMixin:
+    """Compute each uploaded file's SHA-256 as its chunks arrive; the result is set as file.sha256"""
+
+    def new_file(self, *args, **kwargs):
+        # Set before super(): MemoryFileUploadHandler.new_file raises StopFutureHandlers when it takes the file
+        self.sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        result = super().receive_data_chunk(raw_data, start)
+        if result is None:
+            # This handler stored the chunk (otherwise it's passed on to the next handler)
+            self.sha256.update(raw_data)
+        return result
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.sha256.hexdigest()
+        return file
+
+
+class Sha256MemoryFileUploadHandler(Sha256UploadMixin, MemoryFileUploadHandler):
+    pass
+
+
+class Sha256TemporaryFileUploadHandler(Sha256UploadMixin, TemporaryFileUploadHandler):
+    pass
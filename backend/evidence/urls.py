@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework.request import Request
-from .views import EvidenceCategoryViewSet, EvidenceSubmissionViewSet, GoogleAuthView, GoogleOAuthCallbackView, AuthView, EvidenceFileViewSet, NotificationViewSet, LoginView
+from .views import EvidenceCategoryViewSet, EvidenceSubmissionViewSet, GoogleAuthView, GoogleOAuthCallbackView, AuthView, EvidenceFileViewSet, NotificationViewSet, DriveUploadJobViewSet, ExportJobViewSet, LoginView
 
 def export_no_slash_view(request):
     """Handle /categories/export (without trailing slash) by calling the ViewSet action"""
@@ -27,6 +27,8 @@ router.register(r'submissions', EvidenceSubmissionViewSet, basename='submission'
 router.register(r'files', EvidenceFileViewSet, basename='file')
 router.register(r'documents', EvidenceFileViewSet, basename='document')  # Alias for files
 router.register(r'notifications', NotificationViewSet, basename='notification')
+router.register(r'drive-upload-jobs', DriveUploadJobViewSet, basename='drive-upload-job')
+router.register(r'export-jobs', ExportJobViewSet, basename='export-job')
 router.register(r'auth', AuthView, basename='auth')
 router.register(r'auth/google', GoogleAuthView, basename='google-auth')  # Keep for backward compatibility
 
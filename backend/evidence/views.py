@@ -5,29 +5,42 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.authentication import SessionAuthentication
 from rest_framework.views import APIView
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Q, Count, Prefetch
-from django.http import HttpResponse
+from django.http import FileResponse, StreamingHttpResponse
 from datetime import timedelta
 from io import BytesIO
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
 from .models import (
     EvidenceCategory, EvidenceSubmission, EvidenceFile,
     SubmissionComment, EvidenceStatus, CategoryGroup, Notification,
-    GoogleDriveFolderMapping, UserGoogleDriveToken
+    UserGoogleDriveToken, ControlStatus, DriveUploadJob, UploadSession,
+    ExportJob, ExportFormat, ExportJobStatus
 )
 from .serializers import (
     EvidenceCategorySerializer, EvidenceCategoryDetailSerializer,
     EvidenceSubmissionSerializer, EvidenceFileSerializer,
     SubmissionCommentSerializer, DashboardStatsSerializer, UserSerializer,
-    NotificationSerializer, AnalyticsSerializer
+    NotificationSerializer, AnalyticsSerializer, DriveUploadJobSerializer, UploadSessionSerializer,
+    ExportJobSerializer, past_submissions_prefetch
+)
+from .pagination import (
+    SubmissionCursorPagination, EvidenceFileCursorPagination, NotificationCursorPagination,
+    DriveUploadJobCursorPagination, ExportJobCursorPagination
+)
+from .services.control_status import get_control_status
+from .services.submission_periods import generate_submission_periods
+from .services.drive_credentials import resolve_drive_credentials
+from .services.notifications import generate_notifications
+from .services.drive_uploads import enqueue_drive_uploads
+from .services.evidence_storage import store_evidence_blob
+from .services.file_downloads import evidence_file_response
+from .services.exports import (
+    build_export_rows, export_file, evidence_ledger_rows, EXCEL_CONTENT_TYPE, STREAMING_EXPORT_FORMATS
+)
+from .services.export_jobs import request_export
+from .services.chunked_uploads import (
+    ChunkedUploadError, start_upload, upload_part, complete_upload, mark_upload_completed, abort_upload
 )
-from .services.google_drive import GoogleDriveService
 from django.contrib.auth.models import User
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
@@ -60,29 +73,13 @@ def get_google_drive_tokens(request):
     return None, None
 
 
-def get_google_drive_tokens_for_upload(request, category=None, submission=None):
-    """
-    Get Google Drive tokens for uploading (e.g. on approve).
-    Uses current user first; if none, tries category assignee then submission submitter,
-    so the approver doesn't need to have authenticated with Google.
-    Returns (access_token, refresh_token) or (None, None).
-    """
-    access_token, refresh_token = get_google_drive_tokens(request)
-    if access_token:
-        return access_token, refresh_token
-    # Fallback: use assignee's or submitter's tokens so approve still uploads to Drive
-    user_ids_to_try = []
-    if category and category.assignee_id:
-        user_ids_to_try.append(category.assignee_id)
-    if submission and submission.submitted_by_id and submission.submitted_by_id not in user_ids_to_try:
-        user_ids_to_try.append(submission.submitted_by_id)
-    for user_id in user_ids_to_try:
-        try:
-            token_record = UserGoogleDriveToken.objects.get(user_id=user_id)
-            return token_record.access_token, token_record.refresh_token
-        except UserGoogleDriveToken.DoesNotExist:
-            continue
-    return None, None
+def get_user_display_name(user):
+    """Return "First Last" for a user, falling back to username (None when no user)"""
+    if not user:
+        return None
+    if user.first_name or user.last_name:
+        return f"{user.first_name} {user.last_name}".strip()
+    return user.username
 
 
 def add_date_prefix_to_filename(filename):
@@ -104,47 +101,6 @@ def add_date_prefix_to_filename(filename):
     return f"{current_date}_{name}{ext}"
 
 
-def create_due_date_notifications():
-    """
-    Automatically create notifications for assignees when due date arrives.
-    This function checks for submissions with due_date = today and creates notifications
-    if they don't already exist. Called automatically from key endpoints.
-    """
-    today = timezone.now().date()
-    submissions = EvidenceSubmission.objects.filter(
-        due_date=today,
-        status=EvidenceStatus.PENDING
-    ).select_related('category', 'category__assignee')
-    
-    notifications_created = 0
-    for submission in submissions:
-        category = submission.category
-        # Send notification to assignee if exists
-        if category.assignee:
-            # Check if notification already exists for this submission today
-            existing_notification = Notification.objects.filter(
-                user=category.assignee,
-                submission=submission,
-                notification_type='OVERDUE',
-                created_at__date=today
-            ).first()
-            
-            if not existing_notification:
-                # Create notification with link to control-file page
-                Notification.objects.create(
-                    user=category.assignee,
-                    notification_type='OVERDUE',
-                    title=f'Due Today: {category.name}',
-                    message=f'Evidence submission for "{category.name}" is due today. Please submit your evidence files.',
-                    category=category,
-                    submission=submission,
-                    is_read=False
-                )
-                notifications_created += 1
-    
-    return notifications_created
-
-
 class EvidenceCategoryViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing evidence categories
@@ -163,6 +119,56 @@ class EvidenceCategoryViewSet(viewsets.ModelViewSet):
         context['request'] = self.request
         return context
     
+    def perform_content_negotiation(self, request, force=False):
+        # On export, ?format= picks the file type (excel/pdf), not a DRF renderer; errors are still JSON
+        if self.action == 'export_groups':
+            force = True
+        return super().perform_content_negotiation(request, force=force)
+    
+    # Fields rendered for ?view=summary (dropdowns and other lightweight listings)
+    SUMMARY_FIELDS = ['id', 'name', 'category_group', 'review_period', 'is_active']
+    # Related data each serializer field needs; anything not requested is not loaded
+    FIELD_SELECT_RELATED = {
+        'primary_assignee': 'primary_assignee',
+        'assignee': 'assignee',
+        'approver': 'approver',
+        'created_by': 'created_by',
+    }
+    
+    def get_requested_fields(self):
+        """
+        Return the field names selected with ?fields=a,b or ?view=summary, or None for the full
+        representation. Only applies to reads; writes always return the full representation.
+        """
+        if self.request.method not in ('GET', 'HEAD'):
+            return None
+        if self.request.query_params.get('view') == 'summary':
+            return list(self.SUMMARY_FIELDS)
+        fields = self.request.query_params.get('fields', '')
+        if not fields:
+            return None
+        # 'id' is always included so clients can key rows
+        requested = ['id'] + [name.strip() for name in fields.split(',') if name.strip() and name.strip() != 'id']
+        return requested
+    
+    def get_serializer(self, *args, **kwargs):
+        """Score every serialized category with one query instead of one per category"""
+        serializer_class = self.get_serializer_class()
+        fields = self.get_requested_fields()
+        if fields is not None and issubclass(serializer_class, EvidenceCategorySerializer):
+            kwargs.setdefault('fields', fields)
+        
+        if args and args[0] is not None and (fields is None or 'compliance_score' in fields):
+            instances = args[0] if kwargs.get('many') else [args[0]]
+            context = kwargs.setdefault('context', self.get_serializer_context())
+            context['compliance_scores'] = {
+                control_status.category_id: control_status.compliance_score()
+                for control_status in ControlStatus.objects.filter(
+                    category_id__in=[category.pk for category in instances]
+                )
+            }
+        return super().get_serializer(*args, **kwargs)
+    
     def get_queryset(self):
         queryset = EvidenceCategory.objects.all()
         
@@ -234,12 +240,51 @@ class EvidenceCategoryViewSet(viewsets.ModelViewSet):
         # Ensure proper ordering
         queryset = queryset.order_by('name')
         
-        return queryset.prefetch_related(
-            'assigned_reviewers', 
-            'submissions',
-            'submissions__files',
-            'submissions__comments'
-        ).select_related('primary_assignee', 'assignee', 'approver', 'created_by')
+        return self.apply_prefetch_plan(queryset, self.get_requested_fields())
+    
+    def apply_prefetch_plan(self, queryset, fields=None):
+        """
+        Load only the related data the requested fields render (everything when fields is None).
+        Submissions are prefetched with everything the nested serializers touch so
+        current_submission is picked and rendered without per-category queries.
+        """
+        def wants(field_name):
+            return fields is None or field_name in fields
+        
+        prefetches = []
+        if wants('assigned_reviewers'):
+            prefetches.append('assigned_reviewers')
+        if wants('current_submission'):
+            prefetches += [
+                Prefetch(
+                    'submissions',
+                    queryset=EvidenceSubmission.objects.select_related('submitted_by', 'reviewed_by')
+                ),
+                Prefetch(
+                    'submissions__files',
+                    queryset=EvidenceFile.objects.select_related('uploaded_by', 'reviewed_by')
+                ),
+                Prefetch(
+                    'submissions__comments',
+                    queryset=SubmissionComment.objects.select_related('user')
+                ),
+            ]
+        if wants('past_submissions'):
+            prefetches.append(past_submissions_prefetch())
+        
+        select_related = [
+            relation for field_name, relation in self.FIELD_SELECT_RELATED.items() if wants(field_name)
+        ]
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        return queryset
+    
+    def perform_create(self, serializer):
+        category = serializer.save()
+        # Create the first submission period up front; serializers never write
+        generate_submission_periods([category])
     
     def update(self, request, *args, **kwargs):
         """Override update to send notification when assignee is changed"""
@@ -279,12 +324,7 @@ class EvidenceCategoryViewSet(viewsets.ModelViewSet):
         """Get all category groups with counts and compliance scores"""
         show_hidden = request.query_params.get('show_hidden', 'false') == 'true'
         show_all = request.query_params.get('show_all', 'false') == 'true'
-        base_queryset = EvidenceCategory.objects.prefetch_related(
-            Prefetch(
-                'submissions',
-                queryset=EvidenceSubmission.objects.prefetch_related('files').select_related('submitted_by', 'reviewed_by')
-            )
-        ).all()
+        base_queryset = EvidenceCategory.objects.select_related('control_status').all()
         if show_hidden:
             # When showing hidden, only show inactive categories
             base_queryset = base_queryset.filter(is_active=False)
@@ -296,10 +336,16 @@ class EvidenceCategoryViewSet(viewsets.ModelViewSet):
         if not show_all and request.user.is_authenticated:
             base_queryset = base_queryset.filter(assignee=request.user)
         
+        # One query: bucket the controls by group in memory, scores come from the denormalized ControlStatus
+        categories_by_group = {group_code: [] for group_code, _ in CategoryGroup.choices}
+        for category in base_queryset.only('id', 'category_group', 'control_status'):
+            if category.category_group in categories_by_group:
+                categories_by_group[category.category_group].append(category)
+        
         groups = []
         for group_code, group_label in CategoryGroup.choices:
-            group_categories = base_queryset.filter(category_group=group_code)
-            count = group_categories.count()
+            group_categories = categories_by_group[group_code]
+            count = len(group_categories)
             
             if count > 0 or show_hidden:
                 # Calculate average compliance score for the group
@@ -309,37 +355,14 @@ class EvidenceCategoryViewSet(viewsets.ModelViewSet):
                 
                 for category in group_categories:
                     try:
-                        # Check if score should be reset
-                        if category.should_reset_compliance_score():
-                            score = 0
-                        else:
-                            score = category.calculate_compliance_score()
+                        control_status = get_control_status(category)
+                        score = control_status.compliance_score() if control_status else 0
                         total_score += score
                         categories_with_score += 1
                         
                         # Count pending evidence (categories with PENDING/REJECTED status and no files, or no submission)
-                        # Use prefetched submissions - Django will use prefetched data automatically
-                        submissions = category.submissions.all()
-                        
-                        current_submission = None
-                        for sub in submissions:
-                            if sub.status in ['PENDING', 'SUBMITTED', 'UNDER_REVIEW', 'REJECTED']:
-                                if current_submission is None or sub.due_date > current_submission.due_date:
-                                    current_submission = sub
-                        
-                        if not current_submission:
-                            # No active submission - pending
+                        if control_status is None or control_status.awaiting_evidence:
                             pending_count += 1
-                        elif current_submission.status in ['PENDING', 'REJECTED']:
-                            # Has submission but no files uploaded yet
-                            # Check if files are prefetched
-                            if hasattr(current_submission, '_prefetched_objects_cache') and 'files' in current_submission._prefetched_objects_cache:
-                                files_exist = len(current_submission._prefetched_objects_cache['files']) > 0
-                            else:
-                                files_exist = current_submission.files.exists()
-                            
-                            if not files_exist:
-                                pending_count += 1
                     except Exception as e:
                         # Log error but continue processing other categories
                         logger.error(f"Error processing category {category.id}: {e}", exc_info=True)
@@ -360,8 +383,9 @@ class EvidenceCategoryViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'], url_path='create-google-drive-folders')
     def create_google_drive_folders(self, request):
         """Create folder structure in Google Drive for category groups"""
-        # Use session first; fall back to per-user tokens in DB (so Sync works when session cookie isn't sent)
-        access_token, refresh_token = get_google_drive_tokens(request)
+        # Use session first; fall back to per-user tokens in DB (so Sync works when session cookie isn't sent),
+        # then the organization token
+        access_token, refresh_token = resolve_drive_credentials(request=request)
         if not access_token:
             return Response(
                 {'error': 'Google Drive authentication required. Please authenticate with Google first.'},
@@ -369,205 +393,44 @@ class EvidenceCategoryViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            drive_service = GoogleDriveService(access_token=access_token, refresh_token=refresh_token)
-            
-            # Define folder structure mapping
-            # Parent categories and their subcategories
-            folder_structure = {
-                'Security (CC6)': [
-                    'ACCESS_CONTROLS',
-                    'NETWORK_SECURITY',
-                    'PHYSICAL_SECURITY',
-                    'DATA_PROTECTION',
-                    'ENDPOINT_SECURITY',
-                    'MONITORING_INCIDENT'
-                ],
-                'Availability (CC7)': [
-                    'INFRASTRUCTURE_CAPACITY',
-                    'BACKUP_RECOVERY',
-                    'BUSINESS_CONTINUITY'
-                ],
-                'Confidentiality (CC8)': [
-                    'CONFIDENTIALITY'
-                ],
-                'Common Criteria (CC1-CC5)': [
-                    'CONTROL_ENVIRONMENT',
-                    'COMMUNICATION_INFO',
-                    'RISK_ASSESSMENT',
-                    'MONITORING',
-                    'HR_TRAINING',
-                    'CHANGE_MANAGEMENT',
-                    'VENDOR_MANAGEMENT'
-                ]
-            }
-            
-            # Get or create folder mapping record
-            folder_mapping, created = GoogleDriveFolderMapping.objects.get_or_create(
-                id=1  # Single global mapping
-            )
-            
-            # Create root folder
-            if not folder_mapping.root_folder_id:
-                root_folder_id = drive_service.create_folder('complianceGrid')
-                folder_mapping.root_folder_id = root_folder_id
-            else:
-                root_folder_id = folder_mapping.root_folder_id
-            
-            category_group_folder_ids = folder_mapping.category_group_folder_ids or {}
-            
-            # Create parent category folders and their subcategory folders
-            parent_folder_map = {
-                'Security (CC6)': 'security_folder_id',
-                'Availability (CC7)': 'availability_folder_id',
-                'Confidentiality (CC8)': 'confidentiality_folder_id',
-                'Common Criteria (CC1-CC5)': 'common_criteria_folder_id'
-            }
-            
-            for parent_name, group_codes in folder_structure.items():
-                # Get or create parent folder
-                parent_field = parent_folder_map[parent_name]
-                parent_folder_id = getattr(folder_mapping, parent_field)
-                
-                if not parent_folder_id:
-                    parent_folder_id = drive_service.create_folder(parent_name, parent_folder_id=root_folder_id)
-                    setattr(folder_mapping, parent_field, parent_folder_id)
-                
-                # Create subcategory folders (category group folders)
-                for group_code in group_codes:
-                    if group_code not in category_group_folder_ids:
-                        # Get the label for this group
-                        group_label = dict(CategoryGroup.choices).get(group_code, group_code)
-                        subfolder_id = drive_service.create_folder(group_label, parent_folder_id=parent_folder_id)
-                        category_group_folder_ids[group_code] = subfolder_id
-            
-            # Create Uncategorized folder under root (for categories with no/uncategorized group)
-            if 'UNCATEGORIZED' not in category_group_folder_ids:
-                uncategorized_label = dict(CategoryGroup.choices).get('UNCATEGORIZED', 'Uncategorized')
-                uncategorized_folder_id = drive_service.create_folder(
-                    uncategorized_label, parent_folder_id=root_folder_id
-                )
-                category_group_folder_ids['UNCATEGORIZED'] = uncategorized_folder_id
-            
-            # Save folder mapping
-            folder_mapping.category_group_folder_ids = category_group_folder_ids
-            folder_mapping.save()
-            
-            # Step 2: Create folders for each EvidenceCategory (control) inside their category group folders
-            categories_created = 0
-            categories_skipped = 0
-            for group_code, group_folder_id in category_group_folder_ids.items():
-                # Get all categories for this group (Uncategorized includes null/blank category_group)
-                if group_code == 'UNCATEGORIZED':
-                    categories = EvidenceCategory.objects.filter(
-                        Q(category_group='UNCATEGORIZED') | Q(category_group__isnull=True) | Q(category_group=''),
-                        is_active=True
-                    )
-                else:
-                    categories = EvidenceCategory.objects.filter(
-                        category_group=group_code,
-                        is_active=True
-                    )
-                
-                for category in categories:
-                    # Skip if folder already exists
-                    if category.google_drive_folder_id:
-                        categories_skipped += 1
-                        continue
-                    
-                    # Create folder for this category (control)
-                    try:
-                        category_folder_id = drive_service.create_folder(
-                            category.name,
-                            parent_folder_id=group_folder_id
-                        )
-                        # Store folder ID in category
-                        category.google_drive_folder_id = category_folder_id
-                        category.save()
-                        categories_created += 1
-                    except Exception as e:
-                        # Log error but continue with other categories
-                        logger.error(f"Error creating folder for category {category.name}: {str(e)}", exc_info=True)
-                        continue
-            
-            # Step 3: Sync files - Upload any approved files that haven't been uploaded to Google Drive yet
-            files_uploaded = 0
-            files_skipped = 0
-            files_failed = 0
-            upload_errors = []
-            
-            # Get all approved submissions with files that haven't been uploaded
-            approved_submissions = EvidenceSubmission.objects.filter(
-                status=EvidenceStatus.APPROVED
-            ).prefetch_related('files', 'category')
-            
-            for submission in approved_submissions:
-                category = submission.category
-                # Skip if category doesn't have a Google Drive folder ID
-                if not category.google_drive_folder_id:
-                    continue
-                
-                # Get files that haven't been uploaded to Google Drive yet
-                files_to_upload = submission.files.filter(google_drive_file_id__isnull=True)
-                
-                for evidence_file in files_to_upload:
-                    if evidence_file.file:  # Check if local file exists
-                        try:
-                            # Read file content
-                            evidence_file.file.open('rb')
-                            file_content = evidence_file.file.read()
-                            evidence_file.file.close()
-                            
-                            # Upload to Google Drive
-                            drive_result = drive_service.upload_file(
-                                file_content=file_content,
-                                filename=evidence_file.filename,
-                                folder_id=category.google_drive_folder_id,
-                                mime_type=evidence_file.mime_type
-                            )
-                            
-                            # Store Google Drive file info
-                            evidence_file.google_drive_file_id = drive_result['file_id']
-                            evidence_file.google_drive_file_url = drive_result['web_url']
-                            evidence_file.save()
-                            files_uploaded += 1
-                        except Exception as e:
-                            # Log error but continue with other files
-                            error_msg = f"Failed to upload {evidence_file.filename} to Google Drive: {str(e)}"
-                            logger.error(error_msg, exc_info=True)
-                            upload_errors.append(error_msg)
-                            files_failed += 1
-                    else:
-                        error_msg = f"Local file not found for {evidence_file.filename}"
-                        upload_errors.append(error_msg)
-                        files_failed += 1
-            
+            # Folders are created here; file uploads are queued for drive_upload_worker
+            # (sync_google_drive uploads them in one go from the command line)
+            from evidence.services.drive_sync import queue_drive_sync
+            result = queue_drive_sync(access_token, refresh_token, requested_by=request.user)
+            folder_mapping = result['folder_mapping']
+            categories_created = result['categories_created']
+            files_queued = result['files_queued']
+            files_failed = result['files_failed']
+
             # Build response message
             message_parts = ['Folder structure synced successfully']
             if categories_created > 0:
                 message_parts.append(f'{categories_created} category folder(s) created')
-            if files_uploaded > 0:
-                message_parts.append(f'{files_uploaded} file(s) uploaded to Google Drive')
+            if files_queued > 0:
+                message_parts.append(f'{files_queued} file(s) queued for upload to Google Drive')
             if files_failed > 0:
                 message_parts.append(f'{files_failed} file(s) failed to upload')
             
             response_data = {
                 'message': '. '.join(message_parts) + '.',
-                'root_folder_id': root_folder_id,
+                'root_folder_id': folder_mapping.root_folder_id,
                 'categories_created': categories_created,
-                'categories_skipped': categories_skipped,
-                'files_uploaded': files_uploaded,
+                'categories_skipped': result['categories_skipped'],
+                'files_queued': files_queued,
+                'upload_job_ids': result['upload_job_ids'],
                 'files_failed': files_failed,
+                'timings_seconds': result['timings_seconds'],
                 'folder_mapping': {
                     'security_folder_id': folder_mapping.security_folder_id,
                     'availability_folder_id': folder_mapping.availability_folder_id,
                     'confidentiality_folder_id': folder_mapping.confidentiality_folder_id,
                     'common_criteria_folder_id': folder_mapping.common_criteria_folder_id,
-                    'category_group_folder_ids': category_group_folder_ids
+                    'category_group_folder_ids': folder_mapping.category_group_folder_ids
                 }
             }
             
-            if upload_errors:
-                response_data['upload_errors'] = upload_errors
+            if result['upload_errors']:
+                response_data['upload_errors'] = result['upload_errors']
             
             return Response(response_data)
             
@@ -587,128 +450,21 @@ class EvidenceCategoryViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'], url_path='export', url_name='export')
     def export_groups(self, request):
-        """Export category groups data in PDF or Excel format"""
+        """Export category groups data in PDF or Excel format, or the per-file evidence ledger as CSV or NDJSON"""
         try:
             format_type = request.query_params.get('format', 'excel').lower()
             show_hidden = request.query_params.get('show_hidden', 'false') == 'true'          
-            # Get all categories with their submissions and files
-            base_queryset = EvidenceCategory.objects.select_related(
-                'assignee', 'approver'
-            ).prefetch_related(
-                Prefetch(
-                    'submissions',
-                    queryset=EvidenceSubmission.objects.prefetch_related(
-                        'files', 'files__uploaded_by'
-                    ).select_related('submitted_by', 'reviewed_by')
-                )
-            ).all()
-            
-            if show_hidden:
-                # When showing hidden, only show inactive categories
-                base_queryset = base_queryset.filter(is_active=False)
-            else:
-                # When showing active, only show active categories
-                base_queryset = base_queryset.filter(is_active=True)
+            if format_type in STREAMING_EXPORT_FORMATS:
+                # Per-file evidence ledger, streamed from a server-side cursor as it is read
+                extension, content_type, iter_lines = STREAMING_EXPORT_FORMATS[format_type]
+                response = StreamingHttpResponse(iter_lines(evidence_ledger_rows(show_hidden)), content_type=content_type)
+                response['Content-Disposition'] = f'attachment; filename="evidence_ledger.{extension}"'
+                return response
             
-            total_categories_before_filter = base_queryset.count()
-            
-            # Prepare export data
-            export_data = []
-            categories_by_group = {}
-            for group_code, group_label in CategoryGroup.choices:
-                if group_code == 'UNCATEGORIZED':
-                    continue
-                    
-                group_categories = base_queryset.filter(category_group=group_code)
-                categories_by_group[group_label] = group_categories.count()
-                
-                for category in group_categories:
-                    try:
-                        # Get all submissions for this category (using prefetched data)
-                        submissions = list(category.submissions.all())
-                        
-                        # Get latest submission with files
-                        latest_submission = None
-                        latest_file = None
-                        for sub in submissions:
-                            # Check if submission has files (using prefetched data)
-                            sub_files = list(sub.files.all())
-                            if sub_files:
-                                # Find the latest file in this submission
-                                sub_latest_file = None
-                                for f in sub_files:
-                                    if sub_latest_file is None or (f.uploaded_at and sub_latest_file.uploaded_at and f.uploaded_at > sub_latest_file.uploaded_at):
-                                        sub_latest_file = f
-                                
-                                if sub_latest_file:
-                                    if latest_submission is None or (sub.submitted_at and latest_submission.submitted_at and sub.submitted_at > latest_submission.submitted_at):
-                                        latest_submission = sub
-                                        latest_file = sub_latest_file
-                        
-                        # Get file details
-                        uploaded_by = None
-                        uploaded_date = None
-                        approved_by = None
-                        
-                        if latest_file:
-                            uploaded_by = latest_file.uploaded_by.username if latest_file.uploaded_by else 'N/A'
-                            uploaded_date = latest_file.uploaded_at.strftime('%Y-%m-%d %H:%M:%S') if latest_file.uploaded_at else 'N/A'
-                        
-                        if latest_submission and latest_submission.status == 'APPROVED' and latest_submission.reviewed_by:
-                            approved_by = latest_submission.reviewed_by.username
-                        
-                        # Determine evidence status
-                        current_submission = None
-                        for sub in submissions:
-                            if sub.status in [EvidenceStatus.PENDING, EvidenceStatus.SUBMITTED, 
-                                             EvidenceStatus.UNDER_REVIEW, EvidenceStatus.REJECTED]:
-                                if current_submission is None or sub.due_date > current_submission.due_date:
-                                    current_submission = sub
-                        
-                        if not current_submission:
-                            evidence_status = 'Missing'
-                        elif current_submission.status in [EvidenceStatus.PENDING, EvidenceStatus.REJECTED]:
-                            # Check if files exist using prefetched data
-                            current_files = list(current_submission.files.all())
-                            if not current_files:
-                                evidence_status = 'Missing'
-                            else:
-                                evidence_status = 'Uploaded'
-                        else:
-                            # Check if files exist using prefetched data
-                            current_files = list(current_submission.files.all())
-                            if current_files:
-                                evidence_status = 'Uploaded'
-                            else:
-                                evidence_status = 'Missing'
-                        
-                        export_data.append({
-                            'category_group': group_label,
-                            'control': category.name,
-                            'evidence_status': evidence_status,
-                            'last_uploaded_date': uploaded_date or 'N/A',
-                            'uploaded_by': uploaded_by or 'N/A',
-                            'approved_by': approved_by or 'N/A'
-                        })
-                    except Exception as e:
-                        # Log error but continue with other categories
-                        logger.error(f"Error processing category {category.id} for export: {e}", exc_info=True)
-                        # Still add the category with default values
-                        export_data.append({
-                            'category_group': group_label,
-                            'control': category.name,
-                            'evidence_status': 'Error',
-                            'last_uploaded_date': 'N/A',
-                            'uploaded_by': 'N/A',
-                            'approved_by': 'N/A'
-                        })
-                        continue
+            export_data, categories_by_group, total_categories = build_export_rows(show_hidden)
             
             # Check if we have data to export
             if not export_data:
-                # Log why there's no data
-                total_categories = base_queryset.count()
-                
                 # Return a more informative error with 400 status instead of 404
                 return Response(
                     {
@@ -721,148 +477,17 @@ class EvidenceCategoryViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            if format_type == 'pdf':
-                return self._generate_pdf(export_data)
-            else:
-                return self._generate_excel(export_data)
+            if format_type != 'pdf':
+                format_type = 'excel'
+            # Rendered into a spooled temp file (write-only workbook for Excel) and streamed from there
+            output, filename, content_type = export_file(format_type, export_data)
+            return FileResponse(output, as_attachment=True, filename=filename, content_type=content_type)
         except Exception as e:
             logger.error(f"Error in export_groups: {e}", exc_info=True)
             return Response(
                 {'error': f'Failed to export data: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-    
-    def _generate_excel(self, data):
-        """Generate Excel file"""
-        try:
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.title = "Category Groups Export"
-            
-            # Headers
-            headers = ['Category Group', 'Control', 'Evidence Status', 'Last Uploaded Date', 'Uploaded By', 'Approved By']
-            ws.append(headers)
-            
-            # Style headers
-            header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            header_font = Font(bold=True, color="FFFFFF")
-            header_alignment = Alignment(horizontal="center", vertical="center")
-            
-            for cell in ws[1]:
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.alignment = header_alignment
-            
-            # Add data
-            for row in data:
-                ws.append([
-                    row['category_group'],
-                    row['control'],
-                    row['evidence_status'],
-                    row['last_uploaded_date'],
-                    row['uploaded_by'],
-                    row['approved_by']
-                ])
-            
-            # Auto-adjust column widths
-            for column in ws.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[column_letter].width = adjusted_width
-            
-            # Save to BytesIO
-            output = BytesIO()
-            wb.save(output)
-            output.seek(0)
-            
-            response = HttpResponse(
-                output.read(),
-                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            )
-            response['Content-Disposition'] = 'attachment; filename="category_groups_export.xlsx"'
-            return response
-        except Exception as e:
-            logger.error(f"Error generating Excel: {e}", exc_info=True)
-    
-    def _generate_pdf(self, data):
-        """Generate PDF file"""
-        try:
-            buffer = BytesIO()
-            doc = SimpleDocTemplate(buffer, pagesize=landscape(letter), topMargin=0.5*inch)
-            elements = []
-            
-            styles = getSampleStyleSheet()
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=16,
-                textColor=colors.HexColor('#366092'),
-                spaceAfter=30,
-                alignment=1  # Center alignment
-            )
-            
-            # Title
-            title = Paragraph("Category Groups Export Report", title_style)
-            elements.append(title)
-            elements.append(Spacer(1, 0.2*inch))
-            
-            # Prepare table data
-            table_data = [['Category Group', 'Control', 'Evidence Status', 'Last Uploaded Date', 'Uploaded By', 'Approved By']]
-            
-            for row in data:
-                table_data.append([
-                    row['category_group'],
-                    row['control'],
-                    row['evidence_status'],
-                    row['last_uploaded_date'],
-                    row['uploaded_by'],
-                    row['approved_by']
-                ])
-            
-            # Create table
-            table = Table(table_data, repeatRows=1)
-            table.setStyle(TableStyle([
-                # Header row
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#366092')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('TOPPADDING', (0, 0), (-1, 0), 12),
-                
-                # Data rows
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-                ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 9),
-                ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                
-                # Alternating row colors
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-            ]))
-            
-            elements.append(table)
-            
-            # Build PDF
-            doc.build(elements)
-            buffer.seek(0)
-            
-            response = HttpResponse(buffer.read(), content_type='application/pdf')
-            response['Content-Disposition'] = 'attachment; filename="category_groups_export.pdf"'
-            return response
-        except Exception as e:
-            logger.error(f"Error generating PDF: {e}", exc_info=True)
-            raise
 
 
 class EvidenceSubmissionViewSet(viewsets.ReadOnlyModelViewSet):
@@ -872,6 +497,7 @@ class EvidenceSubmissionViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = EvidenceSubmission.objects.all()
     serializer_class = EvidenceSubmissionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = SubmissionCursorPagination
     
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -895,12 +521,8 @@ class EvidenceSubmissionViewSet(viewsets.ReadOnlyModelViewSet):
         
         return queryset
     
-    @action(detail=True, methods=['post'])
-    def submit(self, request, pk=None):
-        """Submit evidence files for a submission"""
-        submission = self.get_object()
-        
-      
+    def check_can_submit(self, submission):
+        """Error response if evidence can't be submitted for this submission, otherwise None"""
         # Allow uploads for PENDING, REJECTED, SUBMITTED, UNDER_REVIEW, and APPROVED (add more evidence)
         if submission.status not in [EvidenceStatus.PENDING, EvidenceStatus.REJECTED,
                                      EvidenceStatus.SUBMITTED, EvidenceStatus.UNDER_REVIEW,
@@ -923,17 +545,15 @@ class EvidenceSubmissionViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get files from request
-        files = request.FILES.getlist('files')
-        if not files:
-            return Response(
-                {'error': 'No files provided.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Get notes and due date
-        notes = request.data.get('notes', '')
-        due_date_str = request.data.get('due_date')
+        return None
+    
+    def record_submitted_files(self, request, submission, stored_files, notes, due_date_str):
+        """
+        Create EvidenceFile records for files already in storage and update the submission (status,
+        notes, due date, notifications, Drive upload queue). stored_files: dicts with filename,
+        stored_name, sha256, size and mime_type. Returns (response data, created files).
+        """
+        category = submission.category
         
         # Only treat as "approver upload" (auto-approve) when user is approver and NOT assignee.
         # When assignee and approver are the same, treat uploads as assignee submissions so they
@@ -945,12 +565,10 @@ class EvidenceSubmissionViewSet(viewsets.ReadOnlyModelViewSet):
             and (not category.assignee or request.user.id != category.assignee.id)
         )
         
-        # Save files locally (Google Drive upload will happen after approval)
-        try:
+        # One transaction, so ControlStatus is refreshed once when it commits
+        with transaction.atomic():
             uploaded_files = []
-            upload_errors = []
-            
-            for file in files:
+            for stored_file in stored_files:
                 # Determine file status based on who is uploading
                 if is_approver:
                     # If approver uploads, automatically approve the file
@@ -958,85 +576,29 @@ class EvidenceSubmissionViewSet(viewsets.ReadOnlyModelViewSet):
                 else:
                     # If assignee uploads, file needs approval
                     file_status = EvidenceStatus.SUBMITTED
-                
-                # Add date prefix to filename
-                date_prefixed_filename = add_date_prefix_to_filename(file.name)
-                
-                # Create a new file object with the date-prefixed name
-                # We need to rename the file before saving
-                file.name = date_prefixed_filename
-                
+            
                 # Create EvidenceFile record with local file storage only
                 evidence_file = EvidenceFile.objects.create(
                     submission=submission,
-                    filename=date_prefixed_filename,
-                    file=file,  # Save file locally using FileField
-                    file_size=file.size,
-                    mime_type=file.content_type or 'application/octet-stream',
+                    filename=stored_file['filename'],
+                    file=stored_file['stored_name'],
+                    sha256=stored_file['sha256'],
+                    file_size=stored_file['size'],
+                    mime_type=stored_file['mime_type'],
                     uploaded_by=request.user if request.user.is_authenticated else None,
                     submission_notes=notes,  # Save notes to each file
                     status=file_status
                 )
-                
+
                 # If approver uploaded, automatically approve and upload to Google Drive
                 if is_approver:
                     evidence_file.reviewed_by = request.user if request.user.is_authenticated else None
                     evidence_file.reviewed_at = timezone.now()
                     evidence_file.review_notes = ''  # No review notes needed for auto-approved files
                     evidence_file.save()
-                    
-                    # Upload to Google Drive immediately
-                    if category.google_drive_folder_id:
-                        access_token, refresh_token = get_google_drive_tokens(request)
-                        if not access_token:
-                            # Fallback: try to get token from any user's session
-                            from django.contrib.sessions.models import Session
-                            recent_sessions = Session.objects.filter(expire_date__gte=timezone.now())
-                            for session in recent_sessions:
-                                try:
-                                    session_data = session.get_decoded()
-                                    if 'google_access_token' in session_data:
-                                        access_token = session_data['google_access_token']
-                                        refresh_token = session_data.get('google_refresh_token')
-                                        break
-                                except Exception:
-                                    continue
-                        
-                        if access_token:
-                            try:
-                                drive_service = GoogleDriveService(access_token=access_token, refresh_token=refresh_token)
-                                
-                                # Only upload if not already uploaded
-                                if not evidence_file.google_drive_file_id and evidence_file.file:
-                                    try:
-                                        # Read file content
-                                        evidence_file.file.open('rb')
-                                        file_content = evidence_file.file.read()
-                                        evidence_file.file.close()
-                                        
-                                        # Upload to Google Drive
-                                        drive_result = drive_service.upload_file(
-                                            file_content=file_content,
-                                            filename=evidence_file.filename,
-                                            folder_id=category.google_drive_folder_id,
-                                            mime_type=evidence_file.mime_type
-                                        )
-                                        
-                                        # Store Google Drive file info
-                                        evidence_file.google_drive_file_id = drive_result['file_id']
-                                        evidence_file.google_drive_file_url = drive_result['web_url']
-                                        evidence_file.save()
-                                    except Exception as e:
-                                        error_msg = f"Failed to upload {evidence_file.filename} to Google Drive: {str(e)}"
-                                        logger.error(error_msg, exc_info=True)
-                                        upload_errors.append(error_msg)
-                            except Exception as e:
-                                error_msg = f"Failed to initialize Google Drive service: {str(e)}"
-                                logger.error(error_msg, exc_info=True)
-                                upload_errors.append(error_msg)
-                
+
                 uploaded_files.append(evidence_file)
-            
+
             # Update submission
             # When assignee uploads: set to SUBMITTED if was PENDING, REJECTED, or APPROVED (new files need approval)
             # When approver uploads: set to APPROVED if all files are approved
@@ -1052,11 +614,11 @@ class EvidenceSubmissionViewSet(viewsets.ReadOnlyModelViewSet):
                     submission.status = EvidenceStatus.APPROVED
                     submission.reviewed_by = request.user if request.user.is_authenticated else None
                     submission.reviewed_at = timezone.now()
-            
+
             # Update submission notes if provided
             if notes:
                 submission.submission_notes = notes
-            
+
             # Update due date if provided
             if due_date_str:
                 try:
@@ -1065,26 +627,33 @@ class EvidenceSubmissionViewSet(viewsets.ReadOnlyModelViewSet):
                     submission.due_date = due_date
                 except ValueError:
                     pass  # Keep existing due date if parsing fails
-            
+
             submission.save()
-            
-            # Send notification to approver only if assignee uploaded (not approver)
-            if category.approver and not is_approver:
-                Notification.objects.create(
-                    user=category.approver,
-                    notification_type='PENDING_APPROVAL',
-                    title=f'Pending Approval: {category.name}',
-                    message=f'New evidence files have been submitted for "{category.name}" and are awaiting your approval.',
-                    category=category,
-                    submission=submission,
-                    is_read=False
-                )
-                
-                # Send email notification to approver
-                if category.approver.email:
-                    try:
-                        subject = f"New Evidence Submission: {category.name}"
-                        message = f"""Hello {category.approver.first_name or category.approver.username},
+
+        # Approver uploads are auto-approved: queue them for Google Drive (drive_upload_worker uploads them)
+        upload_jobs = []
+        if is_approver and category.google_drive_folder_id:
+            upload_jobs = enqueue_drive_uploads(
+                uploaded_files, requested_by=request.user if request.user.is_authenticated else None
+            )
+
+        # Send notification to approver only if assignee uploaded (not approver)
+        if category.approver and not is_approver:
+            Notification.objects.create(
+                user=category.approver,
+                notification_type='PENDING_APPROVAL',
+                title=f'Pending Approval: {category.name}',
+                message=f'New evidence files have been submitted for "{category.name}" and are awaiting your approval.',
+                category=category,
+                submission=submission,
+                is_read=False
+            )
+
+            # Send email notification to approver
+            if category.approver.email:
+                try:
+                    subject = f"New Evidence Submission: {category.name}"
+                    message = f"""Hello {category.approver.first_name or category.approver.username},
 
 New evidence files have been submitted for the control "{category.name}" and are awaiting your approval.
 
@@ -1100,26 +669,71 @@ Please review and approve or reject the submission in the ComplianceGrid system.
 Best regards,
 ComplianceGrid System
 """
-                        send_mail(
-                            subject,
-                            message,
-                            settings.DEFAULT_FROM_EMAIL,
-                            [category.approver.email],
-                            fail_silently=False,
-                        )
-                    except Exception as e:
-                        logger.error(f"Failed to send email notification to approver: {str(e)}", exc_info=True)
-            
-            serializer = EvidenceSubmissionSerializer(submission, context={'request': request})
-            response_data = serializer.data
-            
-            # If approver uploaded, add upload status information
-            if is_approver and upload_errors:
-                response_data['upload_errors'] = upload_errors
-                response_data['upload_warning'] = 'Files approved, but some could not be uploaded to Google Drive.'
-            elif is_approver:
-                response_data['upload_status'] = 'Files approved and uploaded to Google Drive successfully.'
+                    send_mail(
+                        subject,
+                        message,
+                        settings.DEFAULT_FROM_EMAIL,
+                        [category.approver.email],
+                        fail_silently=False,
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to send email notification to approver: {str(e)}", exc_info=True)
+
+        serializer = EvidenceSubmissionSerializer(submission, context={'request': request})
+        response_data = serializer.data
+
+        # If approver uploaded, add upload status information
+        if is_approver and upload_jobs:
+            response_data['upload_jobs'] = upload_jobs
+            response_data['upload_status'] = f'Files approved. Queued {len(upload_jobs)} file(s) for upload to Google Drive.'
+        elif is_approver:
+            response_data['upload_status'] = 'Files approved.'
+
+        return response_data, uploaded_files
+    
+    @action(detail=True, methods=['post'])
+    def submit(self, request, pk=None):
+        """Submit evidence files for a submission"""
+        submission = self.get_object()
+        
+        error_response = self.check_can_submit(submission)
+        if error_response:
+            return error_response
+        
+        # Get files from request
+        files = request.FILES.getlist('files')
+        if not files:
+            return Response(
+                {'error': 'No files provided.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Get notes and due date
+        notes = request.data.get('notes', '')
+        due_date_str = request.data.get('due_date')
+        
+        # Save files locally (Google Drive upload will happen after approval)
+        try:
+            stored_files = []
+            for file in files:
+                # Add date prefix to filename
+                date_prefixed_filename = add_date_prefix_to_filename(file.name)
+                
+                # Create a new file object with the date-prefixed name
+                # We need to rename the file before saving
+                file.name = date_prefixed_filename
+                
+                # Identical content (e.g. the same policy PDF every period) is stored once
+                sha256, stored_name = store_evidence_blob(file)
+                stored_files.append({
+                    'filename': date_prefixed_filename,
+                    'stored_name': stored_name,
+                    'sha256': sha256,
+                    'size': file.size,
+                    'mime_type': file.content_type or 'application/octet-stream',
+                })
             
+            response_data, _ = self.record_submitted_files(request, submission, stored_files, notes, due_date_str)
             return Response(response_data, status=status.HTTP_200_OK)
         except Exception as e:
             logger.error(f"Error in submit: {str(e)}", exc_info=True)
@@ -1128,6 +742,111 @@ ComplianceGrid System
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    def get_upload_session(self, request, upload_id):
+        """The requesting user's upload session for this submission"""
+        submission = self.get_object()
+        return submission, UploadSession.objects.filter(
+            submission=submission, created_by=request.user, pk=upload_id
+        ).first()
+    
+    @action(detail=True, methods=['post'])
+    def uploads(self, request, pk=None):
+        """
+        Start a chunked, resumable upload of one file (for files too large for a single request).
+        Body: filename, size, optional mime_type and notes. Send the file with PUT
+        uploads/{id}/parts/{n} (1-based, part_size bytes each, raw request body), then POST
+        uploads/{id}/complete.
+        """
+        submission = self.get_object()
+        
+        error_response = self.check_can_submit(submission)
+        if error_response:
+            return error_response
+        
+        filename = request.data.get('filename')
+        if not filename:
+            return Response(
+                {'error': 'filename is required.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            size = int(request.data.get('size'))
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'size must be an integer number of bytes.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            session = start_upload(
+                submission,
+                request.user,
+                filename,
+                size,
+                mime_type=request.data.get('mime_type', ''),
+                notes=request.data.get('notes', ''),
+            )
+        except ChunkedUploadError as e:
+            return Response({'error': str(e)}, status=e.status_code)
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['get', 'delete'], url_path=r'uploads/(?P<upload_id>\d+)')
+    def upload_session(self, request, pk=None, upload_id=None):
+        """Status of an upload (next_part / received_size tell a client where to resume), or DELETE to abort it"""
+        _, session = self.get_upload_session(request, upload_id)
+        if not session:
+            return Response({'error': 'Upload not found.'}, status=status.HTTP_404_NOT_FOUND)
+        
+        if request.method == 'DELETE':
+            abort_upload(session)
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_200_OK)
+    
+    @action(detail=True, methods=['put'], url_path=r'uploads/(?P<upload_id>\d+)/parts/(?P<part_number>\d+)')
+    def upload_session_part(self, request, pk=None, upload_id=None, part_number=None):
+        """Receive one part of an upload; the request body is streamed to storage without being buffered"""
+        _, session = self.get_upload_session(request, upload_id)
+        if not session:
+            return Response({'error': 'Upload not found.'}, status=status.HTTP_404_NOT_FOUND)
+        
+        try:
+            # Read the raw body (request.data would parse it into memory)
+            session = upload_part(session, int(part_number), request.stream or BytesIO())
+        except ChunkedUploadError as e:
+            return Response({'error': str(e)}, status=e.status_code)
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_200_OK)
+    
+    @action(detail=True, methods=['post'], url_path=r'uploads/(?P<upload_id>\d+)/complete')
+    def complete_upload_session(self, request, pk=None, upload_id=None):
+        """Finish an upload: the file is added to the submission exactly like a file sent to submit"""
+        submission, session = self.get_upload_session(request, upload_id)
+        if not session:
+            return Response({'error': 'Upload not found.'}, status=status.HTTP_404_NOT_FOUND)
+        
+        error_response = self.check_can_submit(submission)
+        if error_response:
+            return error_response
+        
+        try:
+            stored_file = complete_upload(session)
+        except ChunkedUploadError as e:
+            return Response({'error': str(e)}, status=e.status_code)
+        
+        try:
+            stored_file['filename'] = add_date_prefix_to_filename(stored_file['filename'])
+            # The session is closed together with its EvidenceFile: if either fails, the upload stays open for a retry
+            with transaction.atomic():
+                response_data, uploaded_files = self.record_submitted_files(
+                    request, submission, [stored_file], stored_file['notes'], request.data.get('due_date')
+                )
+                mark_upload_completed(session, uploaded_files[0])
+            return Response(response_data, status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error(f"Error completing upload {session.id}: {str(e)}", exc_info=True)
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
     @action(detail=True, methods=['patch'])
     def update_due_date(self, request, pk=None):
         """Update the due date of a submission"""
@@ -1179,93 +898,29 @@ ComplianceGrid System
         submission.review_notes = review_notes
         submission.save()
         
-        # Upload files to Google Drive after approval
+        # Queue files for upload to Google Drive; drive_upload_worker uploads them outside the request
         category = submission.category
         upload_errors = []
-        uploaded_count = 0
+        upload_jobs = []
         
         if category.google_drive_folder_id:
-            # Use approver's tokens, or assignee/submitter's so approver doesn't need to have authenticated
-            access_token, refresh_token = get_google_drive_tokens_for_upload(
-                request, category=category, submission=submission
-            )
-            if not access_token:
-                # Fallback: try to get token from any user's session
-                from django.contrib.sessions.models import Session
-                recent_sessions = Session.objects.filter(expire_date__gte=timezone.now())
-                for session in recent_sessions:
-                    try:
-                        session_data = session.get_decoded()
-                        if 'google_access_token' in session_data:
-                            access_token = session_data['google_access_token']
-                            refresh_token = session_data.get('google_refresh_token')
-                            break
-                    except Exception:
-                        continue
+            # Get all files for this submission that haven't been uploaded to Google Drive yet
+            files_to_upload = list(submission.files.filter(google_drive_file_id__isnull=True))
             
-            if access_token:
-                try:
-                    drive_service = GoogleDriveService(access_token=access_token, refresh_token=refresh_token)
-                    # Get all files for this submission that haven't been uploaded to Google Drive yet
-                    files_to_upload = submission.files.filter(google_drive_file_id__isnull=True)
-                    
-                    if not files_to_upload.exists():
-                        # All files already uploaded
-                        serializer = EvidenceSubmissionSerializer(submission)
-                        return Response({
-                            **serializer.data,
-                            'message': 'Submission approved. All files were already uploaded to Google Drive.'
-                        })
-                    
-                    for evidence_file in files_to_upload:
-                        if evidence_file.file:  # Check if local file exists
-                            try:
-                                # Read file content
-                                evidence_file.file.open('rb')
-                                file_content = evidence_file.file.read()
-                                evidence_file.file.close()
-                                
-                                # Upload to Google Drive
-                                drive_result = drive_service.upload_file(
-                                    file_content=file_content,
-                                    filename=evidence_file.filename,
-                                    folder_id=category.google_drive_folder_id,
-                                    mime_type=evidence_file.mime_type
-                                )
-                                
-                                # Store Google Drive file info
-                                evidence_file.google_drive_file_id = drive_result['file_id']
-                                evidence_file.google_drive_file_url = drive_result['web_url']
-                                evidence_file.save()
-                                uploaded_count += 1
-                            except Exception as e:
-                                err_str = str(e).lower()
-                                if 'unauthorized_client' in err_str or 'refresherror' in type(e).__name__.lower():
-                                    upload_errors.append(
-                                        "Google Drive token is invalid or was issued by a different app. "
-                                        "Please click 'Authenticate' on the Category Groups page and sign in with Google again, then approve again."
-                                    )
-                                else:
-                                    upload_errors.append(f"Failed to upload {evidence_file.filename} to Google Drive: {str(e)}")
-                                logger.error(f"Failed to upload {evidence_file.filename} to Google Drive: {e}", exc_info=True)
-                        else:
-                            error_msg = f"Local file not found for {evidence_file.filename}"
-                            upload_errors.append(error_msg)
-                except Exception as e:
-                    err_str = str(e).lower()
-                    if 'unauthorized_client' in err_str or 'refresherror' in type(e).__name__.lower():
-                        upload_errors.append(
-                            "Google Drive token is invalid or was issued by a different app. "
-                            "Please click 'Authenticate' on the Category Groups page and sign in with Google again, then approve again."
-                        )
-                    else:
-                        upload_errors.append(f"Failed to initialize Google Drive service: {str(e)}")
-                    logger.error(f"Failed to initialize Google Drive service: {e}", exc_info=True)
-            else:
-                upload_errors.append(
-                    "Google Drive not authenticated. Please click 'Authenticate' (green tick) on the Category Groups page "
-                    "and sign in with Google before approving, so files can be uploaded to Drive."
-                )
+            if not files_to_upload:
+                # All files already uploaded
+                serializer = EvidenceSubmissionSerializer(submission)
+                return Response({
+                    **serializer.data,
+                    'message': 'Submission approved. All files were already uploaded to Google Drive.'
+                })
+            
+            for evidence_file in files_to_upload:
+                if not evidence_file.file:
+                    upload_errors.append(f"Local file not found for {evidence_file.filename}")
+            upload_jobs = enqueue_drive_uploads(
+                files_to_upload, requested_by=request.user if request.user.is_authenticated else None
+            )
         else:
             upload_errors.append(
                 "Google Drive folder not configured for this category. Please run 'Sync Google Drive folders' or "
@@ -1276,8 +931,9 @@ ComplianceGrid System
         response_data = serializer.data
         
         # Add upload status to response
-        if uploaded_count > 0:
-            response_data['upload_status'] = f'Successfully uploaded {uploaded_count} file(s) to Google Drive.'
+        if upload_jobs:
+            response_data['upload_jobs'] = upload_jobs
+            response_data['upload_status'] = f'Queued {len(upload_jobs)} file(s) for upload to Google Drive.'
         if upload_errors:
             response_data['upload_errors'] = upload_errors
             response_data['upload_warning'] = (
@@ -1351,9 +1007,6 @@ ComplianceGrid System
     @action(detail=False, methods=['get'])
     def dashboard(self, request):
         """Get dashboard statistics with gap analysis"""
-        # Automatically create due date notifications
-        create_due_date_notifications()
-        
         today = timezone.now().date()
         start_of_month = today.replace(day=1)
         
@@ -1386,21 +1039,15 @@ ComplianceGrid System
         # Controls without approvers
         controls_without_approver = active_categories.filter(approver__isnull=True).count()
         
-        # Controls with overdue submissions
-        overdue_category_ids = EvidenceSubmission.objects.filter(
-            status=EvidenceStatus.PENDING,
-            due_date__lt=today
-        ).values_list('category_id', flat=True).distinct()
-        controls_with_overdue = active_categories.filter(id__in=overdue_category_ids).count()
-        
-        # Controls with low compliance (below 50%)
-        # Calculate compliance scores efficiently
-        controls_with_low_compliance = 0
-        categories_with_scores = active_categories.prefetch_related('submissions__files')
-        for category in categories_with_scores:
-            score = category.calculate_compliance_score()
-            if score < 50:
-                controls_with_low_compliance += 1
+        # Controls with overdue submissions and with low compliance (below 50%), read from ControlStatus
+        control_status_counts = active_categories.aggregate(
+            controls_with_overdue=Count('id', filter=Q(control_status__oldest_pending_due_date__lt=today)),
+            controls_with_low_compliance=Count(
+                'id', filter=Q(control_status__score__lt=50) | Q(control_status__isnull=True)
+            )
+        )
+        controls_with_overdue = control_status_counts['controls_with_overdue']
+        controls_with_low_compliance = control_status_counts['controls_with_low_compliance']
         
         # Controls pending approval
         pending_approval_submissions = EvidenceSubmission.objects.filter(
@@ -1438,110 +1085,130 @@ ComplianceGrid System
     
     @action(detail=False, methods=['get'])
     def analytics(self, request):
-        """Get comprehensive analytics data for the compliance dashboard"""
+        """
+        Get comprehensive analytics data for the compliance dashboard.
+        Every section is computed with aggregate/grouped queries so the number of
+        queries stays the same regardless of how many controls or submissions exist.
+        """
         from collections import defaultdict
-        from django.db.models import Avg, Count, Q, F, Sum
-        
-        # Automatically create due date notifications
-        create_due_date_notifications()
+        from dateutil.relativedelta import relativedelta
+        from django.db.models import Avg, Count, Exists, F, OuterRef, Q, Sum
+        from django.db.models.functions import Coalesce, TruncMonth
         
         today = timezone.now().date()
         start_of_month = today.replace(day=1)
         six_months_ago = today - timedelta(days=180)
+        last_month_start = (start_of_month - timedelta(days=32)).replace(day=1)
+        last_month_end = start_of_month - timedelta(days=1)
         
         # Filter by user assignments if requested
-        my_assignments_only = request.query_params.get('my_assignments', 'false') == 'true'
+        my_assignments_only = request.query_params.get('my_assignments', 'false') == 'true' and request.user.is_authenticated
         active_categories = EvidenceCategory.objects.filter(is_active=True)
-        
-        if my_assignments_only and request.user.is_authenticated:
+        mine = Q()
+        if my_assignments_only:
             active_categories = active_categories.filter(assignee=request.user)
-        
-        # ========== ACTION REQUIRED ==========
-        # Overdue submissions with aging
-        overdue_submissions = EvidenceSubmission.objects.filter(
-            status=EvidenceStatus.PENDING,
-            due_date__lt=today
+            mine = Q(category__assignee=request.user)
+        
+        pending = Q(status=EvidenceStatus.PENDING)
+        overdue = pending & Q(due_date__lt=today) & mine
+        upcoming = pending & Q(due_date__gte=today) & mine
+        awaiting_review = Q(status__in=[EvidenceStatus.SUBMITTED, EvidenceStatus.UNDER_REVIEW])
+        
+        # ========== SUBMISSION COUNTERS (single aggregate query) ==========
+        submission_stats = EvidenceSubmission.objects.aggregate(
+            overdue_count=Count('id', filter=overdue),
+            overdue_1_7_days=Count('id', filter=overdue & Q(due_date__gte=today - timedelta(days=7))),
+            overdue_8_30_days=Count('id', filter=overdue & Q(
+                due_date__gte=today - timedelta(days=30), due_date__lt=today - timedelta(days=7)
+            )),
+            overdue_over_30_days=Count('id', filter=overdue & Q(due_date__lt=today - timedelta(days=30))),
+            pending_approvals_count=Count('id', filter=awaiting_review & mine),
+            due_next_7_days=Count('id', filter=upcoming & Q(due_date__lte=today + timedelta(days=7))),
+            due_next_14_days=Count('id', filter=upcoming & Q(due_date__lte=today + timedelta(days=14))),
+            due_next_30_days=Count('id', filter=upcoming & Q(due_date__lte=today + timedelta(days=30))),
+            last_month_approved=Count('id', filter=Q(
+                status=EvidenceStatus.APPROVED, reviewed_at__gte=last_month_start, reviewed_at__lte=last_month_end
+            )),
+            this_month_approved=Count('id', filter=Q(status=EvidenceStatus.APPROVED, reviewed_at__gte=start_of_month)),
+            total_reviewed=Count('id', filter=Q(
+                status__in=[EvidenceStatus.APPROVED, EvidenceStatus.REJECTED], reviewed_at__isnull=False
+            )),
+            rejected_count=Count('id', filter=Q(status=EvidenceStatus.REJECTED)),
+            average_approval_time=Avg(
+                F('reviewed_at') - F('submitted_at'),
+                filter=Q(status=EvidenceStatus.APPROVED, reviewed_at__isnull=False, submitted_at__isnull=False)
+            ),
         )
-        if my_assignments_only and request.user.is_authenticated:
-            overdue_submissions = overdue_submissions.filter(category__assignee=request.user)
-        
-        overdue_count = overdue_submissions.count()
-        
-        # Calculate aging buckets
-        overdue_aging = {
-            '1_7_days': overdue_submissions.filter(
-                due_date__gte=today - timedelta(days=7)
-            ).count(),
-            '8_30_days': overdue_submissions.filter(
-                due_date__gte=today - timedelta(days=30),
-                due_date__lt=today - timedelta(days=7)
-            ).count(),
-            'over_30_days': overdue_submissions.filter(
-                due_date__lt=today - timedelta(days=30)
-            ).count()
-        }
         
-        # My assignments awaiting submission
-        my_assignments_count = 0
-        if request.user.is_authenticated:
-            my_assignments_count = active_categories.filter(
-                assignee=request.user
-            ).filter(
-                submissions__status=EvidenceStatus.PENDING,
-                submissions__due_date__gte=today
-            ).distinct().count()
-        
-        # Pending approvals
-        pending_approvals = EvidenceSubmission.objects.filter(
-            status__in=[EvidenceStatus.SUBMITTED, EvidenceStatus.UNDER_REVIEW]
-        )
-        if my_assignments_only and request.user.is_authenticated:
-            pending_approvals = pending_approvals.filter(category__assignee=request.user)
-        pending_approvals_count = pending_approvals.count()
-        
-        # Controls with no evidence in 2+ review cycles
-        # This is a simplified check - controls without recent approved submissions
-        categories_with_recent_approved = EvidenceSubmission.objects.filter(
+        # ========== CONTROL COUNTERS (single aggregate query) ==========
+        has_recent_approval = Exists(EvidenceSubmission.objects.filter(
+            category=OuterRef('pk'),
             status=EvidenceStatus.APPROVED,
             reviewed_at__gte=six_months_ago
-        ).values_list('category_id', flat=True).distinct()
-        no_evidence_count = active_categories.exclude(
-            id__in=categories_with_recent_approved
-        ).count()
-        
-        # Missing assignees/approvers
-        missing_assignees_count = active_categories.filter(assignee__isnull=True).count()
-        missing_approvers_count = active_categories.filter(approver__isnull=True).count()
+        ))
+        has_upcoming_pending = Exists(EvidenceSubmission.objects.filter(
+            category=OuterRef('pk'),
+            status=EvidenceStatus.PENDING,
+            due_date__gte=today
+        ))
+        control_counters = {
+            'no_evidence_count': Count('id', filter=Q(has_recent_approval=False)),
+            'missing_assignees_count': Count('id', filter=Q(assignee__isnull=True)),
+            'missing_approvers_count': Count('id', filter=Q(approver__isnull=True)),
+        }
+        if request.user.is_authenticated:
+            # My assignments awaiting submission
+            control_counters['my_assignments_count'] = Count(
+                'id', filter=Q(assignee=request.user, has_upcoming_pending=True)
+            )
+        control_stats = active_categories.annotate(
+            has_recent_approval=has_recent_approval,
+            has_upcoming_pending=has_upcoming_pending
+        ).aggregate(**control_counters)
         
         # ========== COMPLIANCE HEALTH ==========
-        # Calculate overall compliance score
-        total_score = 0
-        total_categories = 0
-        category_scores = []
+        # Category group heatmap: one grouped query over ControlStatus
+        score = Coalesce('control_status__score', 0.0)
+        group_rows = {
+            row['category_group']: row
+            for row in active_categories.annotate(score=score)
+            .order_by()
+            .values('category_group')
+            .annotate(
+                total_controls=Count('id'),
+                score_sum=Sum('score'),
+                overdue_count=Count('id', filter=Q(control_status__oldest_pending_due_date__lt=today)),
+                compliant_count=Count('id', filter=Q(score__gte=80)),
+                at_risk_count=Count('id', filter=Q(score__gte=50, score__lt=80)),
+                no_data_count=Count('id', filter=Q(score__lt=50)),
+            )
+        }
         
-        for category in active_categories.prefetch_related('submissions__files'):
-            score = category.calculate_compliance_score()
-            category_scores.append(score)
-            total_score += score
-            total_categories += 1
+        category_groups = []
+        for group_code, group_label in CategoryGroup.choices:
+            row = group_rows.get(group_code)
+            if not row:
+                continue
+            category_groups.append({
+                'group_code': group_code,
+                'group_label': group_label,
+                'total_controls': row['total_controls'],
+                'compliance_score': round((row['score_sum'] or 0) / row['total_controls'], 1),
+                'overdue_count': row['overdue_count'],
+                'at_risk_count': row['at_risk_count'],
+                'compliant_count': row['compliant_count'],
+                'no_data_count': row['no_data_count']
+            })
         
+        # Overall score and at-risk count roll up from the grouped rows
+        total_categories = sum(row['total_controls'] for row in group_rows.values())
+        total_score = sum(row['score_sum'] or 0 for row in group_rows.values())
         overall_compliance_score = (total_score / total_categories * 100) if total_categories > 0 else 0
+        at_risk_controls_count = sum(row['at_risk_count'] for row in group_rows.values())
         
         # Calculate trend (simplified - compare with last month)
-        last_month_start = (start_of_month - timedelta(days=32)).replace(day=1)
-        last_month_end = start_of_month - timedelta(days=1)
-        
-        last_month_approved = EvidenceSubmission.objects.filter(
-            status=EvidenceStatus.APPROVED,
-            reviewed_at__gte=last_month_start,
-            reviewed_at__lte=last_month_end
-        ).count()
-        
-        this_month_approved = EvidenceSubmission.objects.filter(
-            status=EvidenceStatus.APPROVED,
-            reviewed_at__gte=start_of_month
-        ).count()
-        
+        last_month_approved = submission_stats['last_month_approved']
+        this_month_approved = submission_stats['this_month_approved']
         if last_month_approved > 0:
             trend_change = ((this_month_approved - last_month_approved) / last_month_approved) * 100
             if trend_change > 5:
@@ -1553,89 +1220,16 @@ ComplianceGrid System
         else:
             compliance_trend = 'stable'
         
-        # Category group heatmap
-        category_groups = []
-        for group_code, group_label in CategoryGroup.choices:
-            group_categories = active_categories.filter(category_group=group_code)
-            group_total = group_categories.count()
-            
-            if group_total == 0:
-                continue
-            
-            # Calculate group compliance
-            group_score_sum = 0
-            group_overdue = 0
-            group_at_risk = 0
-            group_compliant = 0
-            group_no_data = 0
-            
-            for cat in group_categories.prefetch_related('submissions__files'):
-                score = cat.calculate_compliance_score()
-                group_score_sum += score
-                
-                # Check if overdue
-                has_overdue = cat.submissions.filter(
-                    status=EvidenceStatus.PENDING,
-                    due_date__lt=today
-                ).exists()
-                
-                if has_overdue:
-                    group_overdue += 1
-                
-                if score >= 80:
-                    group_compliant += 1
-                elif score >= 50:
-                    group_at_risk += 1
-                else:
-                    group_no_data += 1
-            
-            group_compliance = (group_score_sum / group_total) if group_total > 0 else 0
-            
-            category_groups.append({
-                'group_code': group_code,
-                'group_label': group_label,
-                'total_controls': group_total,
-                'compliance_score': round(group_compliance, 1),
-                'overdue_count': group_overdue,
-                'at_risk_count': group_at_risk,
-                'compliant_count': group_compliant,
-                'no_data_count': group_no_data
-            })
-        
-        # At-risk controls count
-        at_risk_controls_count = sum(1 for score in category_scores if 50 <= score < 80)
-        
         # ========== WHAT'S DUE NEXT ==========
-        upcoming_7 = EvidenceSubmission.objects.filter(
-            status=EvidenceStatus.PENDING,
-            due_date__gte=today,
-            due_date__lte=today + timedelta(days=7)
-        )
-        upcoming_14 = EvidenceSubmission.objects.filter(
-            status=EvidenceStatus.PENDING,
-            due_date__gte=today,
-            due_date__lte=today + timedelta(days=14)
-        )
-        upcoming_30 = EvidenceSubmission.objects.filter(
-            status=EvidenceStatus.PENDING,
-            due_date__gte=today,
-            due_date__lte=today + timedelta(days=30)
-        )
-        
-        if my_assignments_only and request.user.is_authenticated:
-            upcoming_7 = upcoming_7.filter(category__assignee=request.user)
-            upcoming_14 = upcoming_14.filter(category__assignee=request.user)
-            upcoming_30 = upcoming_30.filter(category__assignee=request.user)
-        
-        due_next_7_days = upcoming_7.count()
-        due_next_14_days = upcoming_14.count()
-        due_next_30_days = upcoming_30.count()
-        
         # Group by review period
         upcoming_deadlines_by_period = defaultdict(int)
         upcoming_deadlines_list = []
         
-        for submission in upcoming_30.select_related('category', 'category__assignee').order_by('due_date')[:50]:
+        upcoming_30 = EvidenceSubmission.objects.filter(
+            upcoming, due_date__lte=today + timedelta(days=30)
+        ).select_related('category', 'category__assignee').order_by('due_date')[:50]
+        
+        for submission in upcoming_30:
             period = submission.category.review_period
             upcoming_deadlines_by_period[period] += 1
             
@@ -1646,70 +1240,38 @@ ComplianceGrid System
                 'due_date': submission.due_date,
                 'days_until_due': days_until,
                 'review_period': period,
-                'assignee_name': (
-                    f"{submission.category.assignee.first_name} {submission.category.assignee.last_name}".strip()
-                    if submission.category.assignee and (submission.category.assignee.first_name or submission.category.assignee.last_name)
-                    else (submission.category.assignee.username if submission.category.assignee else None)
-                ),
+                'assignee_name': get_user_display_name(submission.category.assignee),
                 'status': submission.status
             })
         
         # ========== WORKFLOW EFFICIENCY ==========
         # Average approval time
-        approved_submissions = EvidenceSubmission.objects.filter(
-            status=EvidenceStatus.APPROVED,
-            reviewed_at__isnull=False,
-            submitted_at__isnull=False
+        average_approval_time = submission_stats['average_approval_time']
+        average_approval_time_hours = (
+            average_approval_time.total_seconds() / 3600 if average_approval_time is not None else None
         )
         
-        if approved_submissions.exists():
-            approval_times = []
-            for sub in approved_submissions:
-                if sub.submitted_at and sub.reviewed_at:
-                    delta = sub.reviewed_at - sub.submitted_at
-                    approval_times.append(delta.total_seconds() / 3600)  # Convert to hours
-            
-            average_approval_time_hours = sum(approval_times) / len(approval_times) if approval_times else None
-        else:
-            average_approval_time_hours = None
-        
         # Rejection rate
-        total_reviewed = EvidenceSubmission.objects.filter(
-            status__in=[EvidenceStatus.APPROVED, EvidenceStatus.REJECTED],
-            reviewed_at__isnull=False
-        ).count()
-        
-        rejected_count = EvidenceSubmission.objects.filter(
-            status=EvidenceStatus.REJECTED
-        ).count()
-        
-        rejection_rate = (rejected_count / total_reviewed * 100) if total_reviewed > 0 else 0
-        
-        # Submission trends (last 6 months)
-        submission_trends = []
-        for i in range(6):
-            month_start = (today - timedelta(days=30 * i)).replace(day=1)
-            if i == 0:
-                month_end = today
-            else:
-                next_month = month_start + timedelta(days=32)
-                month_end = next_month.replace(day=1) - timedelta(days=1)
-            
-            count = EvidenceSubmission.objects.filter(
-                submitted_at__gte=month_start,
-                submitted_at__lte=month_end
-            ).count()
-            
-            submission_trends.append({
-                'month': month_start.strftime('%Y-%m'),
-                'count': count
-            })
-        
-        submission_trends.reverse()
+        total_reviewed = submission_stats['total_reviewed']
+        rejection_rate = (submission_stats['rejected_count'] / total_reviewed * 100) if total_reviewed > 0 else 0
+        
+        # Submission trends (last 6 calendar months, one grouped query)
+        trend_months = [start_of_month - relativedelta(months=i) for i in range(5, -1, -1)]
+        monthly_counts = {
+            row['month'].strftime('%Y-%m'): row['count']
+            for row in EvidenceSubmission.objects.filter(
+                submitted_at__date__gte=trend_months[0],
+                submitted_at__date__lte=today
+            ).annotate(month=TruncMonth('submitted_at')).order_by().values('month').annotate(count=Count('id'))
+        }
+        submission_trends = [
+            {'month': month_start.strftime('%Y-%m'), 'count': monthly_counts.get(month_start.strftime('%Y-%m'), 0)}
+            for month_start in trend_months
+        ]
         
         # Bottleneck approvers (approvers with most pending)
         approver_bottlenecks = EvidenceSubmission.objects.filter(
-            status__in=[EvidenceStatus.SUBMITTED, EvidenceStatus.UNDER_REVIEW]
+            awaiting_review
         ).values('category__approver__username', 'category__approver__first_name').annotate(
             pending_count=Count('id')
         ).order_by('-pending_count')[:5]
@@ -1726,36 +1288,27 @@ ComplianceGrid System
         # ========== RISK & GAP ANALYSIS ==========
         priority_issues = []
         priority = 1
+        scored_categories = active_categories.annotate(score=score).select_related('assignee', 'control_status')
         
         # Controls with no evidence
-        for category in active_categories.filter(
-            id__in=active_categories.exclude(
-                id__in=EvidenceSubmission.objects.filter(
-                    status=EvidenceStatus.APPROVED,
-                    reviewed_at__gte=six_months_ago
-                ).values_list('category_id', flat=True)
-            )
-        )[:10]:
-            score = category.calculate_compliance_score()
+        for category in scored_categories.annotate(
+            has_recent_approval=has_recent_approval
+        ).filter(has_recent_approval=False)[:10]:
             priority_issues.append({
                 'priority': priority,
                 'control_id': category.id,
                 'control_name': category.name,
                 'status': 'NO_EVIDENCE',
                 'days_overdue': None,
-                'assignee_name': (
-                    f"{category.assignee.first_name} {category.assignee.last_name}".strip()
-                    if category.assignee and (category.assignee.first_name or category.assignee.last_name)
-                    else (category.assignee.username if category.assignee else None)
-                ),
+                'assignee_name': get_user_display_name(category.assignee),
                 'assignee_id': category.assignee.id if category.assignee else None,
                 'issue_type': 'No evidence submitted recently',
-                'compliance_score': score
+                'compliance_score': category.score
             })
             priority += 1
         
         # Controls without assignees
-        for category in active_categories.filter(assignee__isnull=True)[:5]:
+        for category in scored_categories.filter(assignee__isnull=True)[:5]:
             priority_issues.append({
                 'priority': priority,
                 'control_id': category.id,
@@ -1765,61 +1318,50 @@ ComplianceGrid System
                 'assignee_name': None,
                 'assignee_id': None,
                 'issue_type': 'No assignee assigned',
-                'compliance_score': category.calculate_compliance_score()
+                'compliance_score': category.score
             })
             priority += 1
         
-        # Overdue controls
-        overdue_categories = active_categories.filter(
-            id__in=EvidenceSubmission.objects.filter(
-                status=EvidenceStatus.PENDING,
-                due_date__lt=today
-            ).values_list('category_id', flat=True)
-        ).distinct()[:10]
+        # Overdue controls, using the oldest pending due date tracked in ControlStatus
+        overdue_categories = scored_categories.filter(control_status__oldest_pending_due_date__lt=today)[:10]
         
         for category in overdue_categories:
-            overdue_sub = category.submissions.filter(
-                status=EvidenceStatus.PENDING,
-                due_date__lt=today
-            ).order_by('due_date').first()
-            
-            if overdue_sub:
-                days_overdue = (today - overdue_sub.due_date).days
-                priority_issues.append({
-                    'priority': priority,
-                    'control_id': category.id,
-                    'control_name': category.name,
-                    'status': 'OVERDUE',
-                    'days_overdue': days_overdue,
-                    'assignee_name': (
-                        f"{category.assignee.first_name} {category.assignee.last_name}".strip()
-                        if category.assignee and (category.assignee.first_name or category.assignee.last_name)
-                        else (category.assignee.username if category.assignee else None)
-                    ),
-                    'assignee_id': category.assignee.id if category.assignee else None,
-                    'issue_type': f'Overdue by {days_overdue} days',
-                    'compliance_score': category.calculate_compliance_score()
-                })
-                priority += 1
+            days_overdue = (today - category.control_status.oldest_pending_due_date).days
+            priority_issues.append({
+                'priority': priority,
+                'control_id': category.id,
+                'control_name': category.name,
+                'status': 'OVERDUE',
+                'days_overdue': days_overdue,
+                'assignee_name': get_user_display_name(category.assignee),
+                'assignee_id': category.assignee.id if category.assignee else None,
+                'issue_type': f'Overdue by {days_overdue} days',
+                'compliance_score': category.score
+            })
+            priority += 1
         
         # Sort by priority
         priority_issues = sorted(priority_issues, key=lambda x: x['priority'])[:10]
         
         analytics_data = {
-            'overdue_count': overdue_count,
-            'overdue_aging': overdue_aging,
-            'my_assignments_count': my_assignments_count,
-            'pending_approvals_count': pending_approvals_count,
-            'no_evidence_count': no_evidence_count,
-            'missing_assignees_count': missing_assignees_count,
-            'missing_approvers_count': missing_approvers_count,
+            'overdue_count': submission_stats['overdue_count'],
+            'overdue_aging': {
+                '1_7_days': submission_stats['overdue_1_7_days'],
+                '8_30_days': submission_stats['overdue_8_30_days'],
+                'over_30_days': submission_stats['overdue_over_30_days']
+            },
+            'my_assignments_count': control_stats.get('my_assignments_count', 0),
+            'pending_approvals_count': submission_stats['pending_approvals_count'],
+            'no_evidence_count': control_stats['no_evidence_count'],
+            'missing_assignees_count': control_stats['missing_assignees_count'],
+            'missing_approvers_count': control_stats['missing_approvers_count'],
             'overall_compliance_score': round(overall_compliance_score, 1),
             'compliance_trend': compliance_trend,
             'category_groups': category_groups,
             'at_risk_controls_count': at_risk_controls_count,
-            'due_next_7_days': due_next_7_days,
-            'due_next_14_days': due_next_14_days,
-            'due_next_30_days': due_next_30_days,
+            'due_next_7_days': submission_stats['due_next_7_days'],
+            'due_next_14_days': submission_stats['due_next_14_days'],
+            'due_next_30_days': submission_stats['due_next_30_days'],
             'upcoming_deadlines_by_period': dict(upcoming_deadlines_by_period),
             'upcoming_deadlines': upcoming_deadlines_list,
             'average_approval_time_hours': round(average_approval_time_hours, 1) if average_approval_time_hours else None,
@@ -2383,6 +1925,7 @@ class EvidenceFileViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = EvidenceFile.objects.select_related('submission__category', 'uploaded_by').all()
     serializer_class = EvidenceFileSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = EvidenceFileCursorPagination
     
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -2452,6 +1995,23 @@ class EvidenceFileViewSet(viewsets.ReadOnlyModelViewSet):
         
         return Response(result)
     
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """
+        Download the stored copy of a file. Supports Range requests (resumable downloads) and
+        ETag/Last-Modified revalidation; handed off to the web server when EVIDENCE_DOWNLOAD_SENDFILE is set.
+        """
+        evidence_file = self.get_object()
+        response = evidence_file_response(request, evidence_file)
+        if response is None:
+            if evidence_file.google_drive_file_url:
+                return Response(
+                    {'error': 'This file is only stored on Google Drive.', 'google_drive_file_url': evidence_file.google_drive_file_url},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            return Response({'error': 'File not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return response
+    
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
         """Approve a file and optionally upload to Google Drive"""
@@ -2481,82 +2041,16 @@ class EvidenceFileViewSet(viewsets.ReadOnlyModelViewSet):
             submission.reviewed_at = timezone.now()
             submission.save()
         
-        # Upload file to Google Drive after approval
+        # Queue the file for upload to Google Drive; drive_upload_worker uploads it outside the request
         category = evidence_file.submission.category
-        submission = evidence_file.submission
         upload_errors = []
-        uploaded = False
+        upload_jobs = []
+        uploaded = bool(evidence_file.google_drive_file_id)  # Already uploaded
         
         if category.google_drive_folder_id:
-            # Use approver's tokens, or assignee/submitter's so approver doesn't need to have authenticated
-            access_token, refresh_token = get_google_drive_tokens_for_upload(
-                request, category=category, submission=submission
-            )
-            if not access_token:
-                # Fallback: try to get token from any user's session
-                from django.contrib.sessions.models import Session
-                recent_sessions = Session.objects.filter(expire_date__gte=timezone.now())
-                for session in recent_sessions:
-                    try:
-                        session_data = session.get_decoded()
-                        if 'google_access_token' in session_data:
-                            access_token = session_data['google_access_token']
-                            refresh_token = session_data.get('google_refresh_token')
-                            break
-                    except Exception:
-                        continue
-            
-            if access_token:
-                try:
-                    drive_service = GoogleDriveService(access_token=access_token, refresh_token=refresh_token)
-                    
-                    # Only upload if not already uploaded
-                    if not evidence_file.google_drive_file_id and evidence_file.file:
-                        try:
-                            # Read file content
-                            evidence_file.file.open('rb')
-                            file_content = evidence_file.file.read()
-                            evidence_file.file.close()
-                            
-                            # Upload to Google Drive
-                            drive_result = drive_service.upload_file(
-                                file_content=file_content,
-                                filename=evidence_file.filename,
-                                folder_id=category.google_drive_folder_id,
-                                mime_type=evidence_file.mime_type
-                            )
-                            
-                            # Store Google Drive file info
-                            evidence_file.google_drive_file_id = drive_result['file_id']
-                            evidence_file.google_drive_file_url = drive_result['web_url']
-                            evidence_file.save()
-                            uploaded = True
-                        except Exception as e:
-                            err_str = str(e).lower()
-                            if 'unauthorized_client' in err_str or 'refresherror' in type(e).__name__.lower():
-                                upload_errors.append(
-                                    "Google Drive token is invalid or was issued by a different app. "
-                                    "Please click 'Authenticate' on the Category Groups page and sign in with Google again, then approve again."
-                                )
-                            else:
-                                upload_errors.append(f"Failed to upload {evidence_file.filename} to Google Drive: {str(e)}")
-                            logger.error(f"Failed to upload {evidence_file.filename} to Google Drive: {e}", exc_info=True)
-                    elif evidence_file.google_drive_file_id:
-                        uploaded = True  # Already uploaded
-                except Exception as e:
-                    err_str = str(e).lower()
-                    if 'unauthorized_client' in err_str or 'refresherror' in type(e).__name__.lower():
-                        upload_errors.append(
-                            "Google Drive token is invalid or was issued by a different app. "
-                            "Please click 'Authenticate' on the Category Groups page and sign in with Google again, then approve again."
-                        )
-                    else:
-                        upload_errors.append(f"Failed to initialize Google Drive service: {str(e)}")
-                    logger.error(f"Failed to initialize Google Drive service: {e}", exc_info=True)
-            else:
-                upload_errors.append(
-                    "Google Drive not authenticated. Please click 'Authenticate' (green tick) on the Category Groups page "
-                    "and sign in with Google before approving, so files can be uploaded to Drive."
+            if not uploaded:
+                upload_jobs = enqueue_drive_uploads(
+                    [evidence_file], requested_by=request.user if request.user.is_authenticated else None
                 )
         else:
             upload_errors.append(
@@ -2570,6 +2064,9 @@ class EvidenceFileViewSet(viewsets.ReadOnlyModelViewSet):
         # Add upload status to response
         if uploaded:
             response_data['upload_status'] = 'File approved and uploaded to Google Drive successfully.'
+        elif upload_jobs:
+            response_data['upload_jobs'] = upload_jobs
+            response_data['upload_status'] = 'File approved. Upload to Google Drive has been queued.'
         if upload_errors:
             response_data['upload_errors'] = upload_errors
             response_data['upload_warning'] = (
@@ -2642,19 +2139,101 @@ ComplianceGrid System
         return Response(serializer.data)
 
 
+class DriveUploadJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for polling queued Google Drive uploads (returned as upload_jobs by the approve endpoints)
+    """
+    serializer_class = DriveUploadJobSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = DriveUploadJobCursorPagination
+    
+    def get_queryset(self):
+        queryset = DriveUploadJob.objects.select_related('evidence_file')
+        
+        # Filter by job ids, e.g. ?ids=12,13
+        ids = self.request.query_params.get('ids', '')
+        if ids:
+            try:
+                queryset = queryset.filter(id__in=[int(job_id) for job_id in ids.split(',') if job_id])
+            except ValueError:
+                return queryset.none()
+        
+        # Filter by file or status if provided
+        evidence_file = self.request.query_params.get('file')
+        if evidence_file:
+            queryset = queryset.filter(evidence_file_id=evidence_file)
+        status_filter = self.request.query_params.get('status')
+        if status_filter:
+            queryset = queryset.filter(status=status_filter)
+        
+        return queryset.order_by('-created_at')
+
+
+class ExportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Background category groups exports: POST queues one (or returns the job that already has/is
+    rendering the same export of unchanged data), GET polls it, download returns the file
+    """
+    serializer_class = ExportJobSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = ExportJobCursorPagination
+    
+    def get_queryset(self):
+        queryset = ExportJob.objects.all()
+        
+        status_filter = self.request.query_params.get('status')
+        if status_filter:
+            queryset = queryset.filter(status=status_filter)
+        
+        return queryset.order_by('-created_at')
+    
+    def create(self, request):
+        """Request an export. Body: format ('excel' or 'pdf'), show_hidden"""
+        format_type = str(request.data.get('format', ExportFormat.EXCEL)).lower()
+        if format_type not in ExportFormat.values:
+            return Response(
+                {'error': f"format must be one of: {', '.join(ExportFormat.values)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        show_hidden = str(request.data.get('show_hidden', 'false')).lower() == 'true'
+        
+        job, created = request_export(
+            format_type, show_hidden, requested_by=request.user if request.user.is_authenticated else None
+        )
+        response_data = self.get_serializer(job).data
+        response_data['cached'] = not created
+        if job.status == ExportJobStatus.SUCCEEDED:
+            return Response(response_data, status=status.HTTP_200_OK)
+        return Response(response_data, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Download a finished export"""
+        job = self.get_object()
+        if job.status != ExportJobStatus.SUCCEEDED:
+            return Response(
+                {'error': f'Export is not ready (status: {job.status}).', 'last_error': job.last_error},
+                status=status.HTTP_409_CONFLICT
+            )
+        if not job.file:
+            return Response(
+                {'error': 'This export is out of date and was removed. Request a new export.'},
+                status=status.HTTP_410_GONE
+            )
+        content_type = 'application/pdf' if job.format == ExportFormat.PDF else EXCEL_CONTENT_TYPE
+        return FileResponse(job.file.open('rb'), as_attachment=True, filename=job.filename, content_type=content_type)
+
+
 class NotificationViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing notifications
     """
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = None  # Disable pagination for notifications
+    pagination_class = NotificationCursorPagination
     
     def get_queryset(self):
         """Get notifications for the current user or all users if no user specified"""
-        # Automatically create due date notifications when checking notifications
-        create_due_date_notifications()
-        
         queryset = Notification.objects.select_related('user', 'category', 'submission').all()
         
         # Filter by user if provided
@@ -2672,79 +2251,13 @@ class NotificationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='generate')
     def generate_notifications(self, request):
         """Generate notifications for due dates and approvals"""
-        from django.utils import timezone
-        from datetime import timedelta
-        
-        today = timezone.now().date()
-        three_days_from_now = today + timedelta(days=3)
-        
-        notifications_created = 0
-        
-        # Get all active categories with pending/submitted submissions
-        categories = EvidenceCategory.objects.filter(is_active=True).select_related(
-            'assignee', 'approver'
-        ).prefetch_related('submissions')
-        
-        for category in categories:
-            # Get current submission
-            current_submission = category.submissions.filter(
-                status__in=['PENDING', 'SUBMITTED', 'UNDER_REVIEW']
-            ).order_by('-due_date').first()
-            
-            if not current_submission:
-                continue
-            
-            # Notifications for assignees - due dates
-            if category.assignee:
-                days_until_due = (current_submission.due_date - today).days
-                
-                if days_until_due < 0:
-                    # Overdue
-                    notification, created = Notification.objects.get_or_create(
-                        user=category.assignee,
-                        notification_type='OVERDUE',
-                        category=category,
-                        submission=current_submission,
-                        defaults={
-                            'title': f'Overdue: {category.name}',
-                            'message': f'The submission for {category.name} is overdue by {abs(days_until_due)} day(s).',
-                        }
-                    )
-                    if created:
-                        notifications_created += 1
-                elif days_until_due <= 3:
-                    # Due soon
-                    notification, created = Notification.objects.get_or_create(
-                        user=category.assignee,
-                        notification_type='DUE_SOON',
-                        category=category,
-                        submission=current_submission,
-                        defaults={
-                            'title': f'Due Soon: {category.name}',
-                            'message': f'The submission for {category.name} is due in {days_until_due} day(s).',
-                        }
-                    )
-                    if created:
-                        notifications_created += 1
-            
-            # Notifications for approvers - pending approvals
-            if category.approver and current_submission.status in ['SUBMITTED', 'UNDER_REVIEW']:
-                notification, created = Notification.objects.get_or_create(
-                    user=category.approver,
-                    notification_type='PENDING_APPROVAL',
-                    category=category,
-                    submission=current_submission,
-                    defaults={
-                        'title': f'Pending Approval: {category.name}',
-                        'message': f'Submission for {category.name} is waiting for your approval.',
-                    }
-                )
-                if created:
-                    notifications_created += 1
+        stats = generate_notifications()
+        notifications_created = stats['notifications_created']
         
         return Response({
             'message': f'Generated {notifications_created} notifications',
-            'notifications_created': notifications_created
+            'notifications_created': notifications_created,
+            'stats': stats
         })
     
     @action(detail=True, methods=['post'], url_path='mark-read')
@@ -235,8 +235,35 @@ GOOGLE_DRIVE_CLIENT_SECRET = os.environ.get('GOOGLE_DRIVE_CLIENT_SECRET', '')
 # Must match frontend URL where OAuth callback is served (e.g. https://your-app.com/login/callback in production)
 GOOGLE_DRIVE_REDIRECT_URI = os.environ.get('GOOGLE_DRIVE_REDIRECT_URI', '')
 GOOGLE_DRIVE_SCOPES = ['openid', 'email', 'profile', 'https://www.googleapis.com/auth/drive.file']
+# Folder/file sync: parallel Drive requests and overall request rate (requests per second, 0 = unlimited)
+GOOGLE_DRIVE_SYNC_WORKERS = int(os.environ.get('GOOGLE_DRIVE_SYNC_WORKERS', '4'))
+GOOGLE_DRIVE_SYNC_RATE = float(os.environ.get('GOOGLE_DRIVE_SYNC_RATE', '8'))
+# Uploads stream files to Drive in resumable chunks of this size (multiple of 256 KiB); bounds memory per upload
+GOOGLE_DRIVE_UPLOAD_CHUNK_SIZE = int(os.environ.get('GOOGLE_DRIVE_UPLOAD_CHUNK_SIZE', str(8 * 1024 * 1024)))
+# Built Drive clients and credentials are cached per token for this many seconds (per process)
+GOOGLE_DRIVE_CLIENT_CACHE_TTL = int(os.environ.get('GOOGLE_DRIVE_CLIENT_CACHE_TTL', '3000'))
 
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
+# Same as Django's default handlers, plus a SHA-256 of each file computed while it is received
+FILE_UPLOAD_HANDLERS = [
+    'evidence.upload_handlers.Sha256MemoryFileUploadHandler',
+    'evidence.upload_handlers.Sha256TemporaryFileUploadHandler',
+]
 
+# Chunked, resumable uploads (submissions/{id}/uploads/): parts are written straight to the backend,
+# 'local' (staging file under MEDIA_ROOT) or 's3' (S3 multipart upload; needs boto3 and evidence
+# storage in the same bucket). Every part but the last is CHUNKED_UPLOAD_PART_SIZE bytes
+# (at least 5 MiB for S3).
+CHUNKED_UPLOAD_BACKEND = os.environ.get('CHUNKED_UPLOAD_BACKEND', 'local')
+CHUNKED_UPLOAD_PART_SIZE = int(os.environ.get('CHUNKED_UPLOAD_PART_SIZE', str(8 * 1024 * 1024)))
+CHUNKED_UPLOAD_MAX_SIZE = int(os.environ.get('CHUNKED_UPLOAD_MAX_SIZE', str(5 * 1024 ** 3)))
+CHUNKED_UPLOAD_S3_BUCKET = os.environ.get('CHUNKED_UPLOAD_S3_BUCKET', '')
+CHUNKED_UPLOAD_S3_ENDPOINT_URL = os.environ.get('CHUNKED_UPLOAD_S3_ENDPOINT_URL', '')
+CHUNKED_UPLOAD_S3_REGION = os.environ.get('CHUNKED_UPLOAD_S3_REGION', '')
+# Evidence downloads (files/{id}/download/): '' streams from Django with Range support; 'x-accel-redirect'
+# (nginx, internal location EVIDENCE_DOWNLOAD_ACCEL_PREFIX aliased to MEDIA_ROOT) or 'x-sendfile'
+# (Apache mod_xsendfile / lighttpd) let the web server send the file instead
+EVIDENCE_DOWNLOAD_SENDFILE = os.environ.get('EVIDENCE_DOWNLOAD_SENDFILE', '').lower()
+EVIDENCE_DOWNLOAD_ACCEL_PREFIX = os.environ.get('EVIDENCE_DOWNLOAD_ACCEL_PREFIX', '/protected-media/')
@@ -112,6 +112,8 @@ export interface Submission {
   updated_at: string;
 }
 
+export type CategorySummary = Pick<Category, 'id' | 'name' | 'category_group' | 'review_period' | 'is_active'>;
+
 export interface CategoryDetail extends Category {
   past_submissions: Submission[];
 }
@@ -164,6 +166,14 @@ export const categoriesApi = {
     };
   },
 
+  // Lightweight listing (no submissions, files or users) for dropdowns and filters
+  getSummaries: async (activeOnly: boolean = false): Promise<CategorySummary[]> => {
+    const response = await apiClient.get('/categories/', {
+      params: { active_only: activeOnly, view: 'summary' },
+    });
+    return response.data.results || response.data;
+  },
+
   getById: async (id: number): Promise<CategoryDetail> => {
     const response = await apiClient.get(`/categories/${id}/`);
     return response.data;
@@ -218,7 +228,8 @@ export const categoriesApi = {
     root_folder_id: string;
     categories_created?: number;
     categories_skipped?: number;
-    files_uploaded?: number;
+    files_queued?: number;
+    upload_job_ids?: number[];
     files_failed?: number;
     upload_errors?: string[];
     folder_mapping: {
@@ -21,14 +21,15 @@ export const notificationsApi = {
     if (isRead !== undefined) params.is_read = isRead;
     
     const response = await apiClient.get('/notifications/', { params });
-    return response.data;
+    // Cursor-paginated: newest page of notifications
+    return response.data.results || response.data;
   },
 
   getUnread: async (userId: number): Promise<Notification[]> => {
     const response = await apiClient.get('/notifications/', {
       params: { user_id: userId, is_read: false }
     });
-    return response.data;
+    return response.data.results || response.data;
   },
 
   getUnreadCount: async (userId: number): Promise<number> => {
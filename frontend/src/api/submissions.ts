@@ -16,6 +16,21 @@ export interface DashboardStats {
   upcoming_deadlines: Submission[];
 }
 
+export interface DriveUploadJob {
+  id: number;
+  evidence_file: number;
+  filename: string;
+  status: 'PENDING' | 'RUNNING' | 'SUCCEEDED' | 'FAILED';
+  attempts: number;
+  max_attempts: number;
+  next_attempt_at: string;
+  last_error: string;
+  google_drive_file_url: string | null;
+  created_at: string;
+  started_at: string | null;
+  finished_at: string | null;
+}
+
 export const submissionsApi = {
   getAll: async (params?: {
     category?: number;
@@ -63,6 +78,7 @@ export const submissionsApi = {
     upload_status?: string;
     upload_warning?: string;
     upload_errors?: string[];
+    upload_jobs?: number[];
   }> => {
     const response = await apiClient.post(`/submissions/${id}/approve/`, {
       review_notes: reviewNotes,
@@ -92,6 +108,7 @@ export const submissionsApi = {
     upload_status?: string;
     upload_warning?: string;
     upload_errors?: string[];
+    upload_jobs?: number[];
   }> => {
     const response = await apiClient.post(`/files/${fileId}/approve/`, {
       review_notes: reviewNotes,
@@ -106,6 +123,14 @@ export const submissionsApi = {
     return response.data;
   },
 
+  // Poll queued Google Drive uploads returned as upload_jobs by approve/submit
+  getDriveUploadJobs: async (jobIds: number[]): Promise<DriveUploadJob[]> => {
+    const response = await apiClient.get('/drive-upload-jobs/', {
+      params: { ids: jobIds.join(',') },
+    });
+    return response.data.results || response.data;
+  },
+
   updateDueDate: async (id: number, dueDate: string): Promise<Submission> => {
     const response = await apiClient.patch(`/submissions/${id}/update_due_date/`, {
       due_date: dueDate,
@@ -114,8 +114,8 @@ export const CategoryGroupsPage: React.FC = () => {
       
       // Show success message with details
       const messageParts = [result.message || 'Sync completed successfully!'];
-      if (result.files_uploaded && result.files_uploaded > 0) {
-        messageParts.push(`${result.files_uploaded} file(s) uploaded`);
+      if (result.files_queued && result.files_queued > 0) {
+        messageParts.push(`${result.files_queued} file(s) queued for upload`);
       }
       if (result.categories_created && result.categories_created > 0) {
         messageParts.push(`${result.categories_created} folder(s) created`);
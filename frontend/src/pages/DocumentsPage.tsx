@@ -1,7 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import { File, Calendar, User, Filter, X, Eye } from 'lucide-react';
 import { documentsApi, GroupedDocument } from '../api/documents';
-import { categoriesApi, Category } from '../api/categories';
+import { categoriesApi, CategorySummary } from '../api/categories';
 import toast from 'react-hot-toast';
 import { format } from 'date-fns';
 
@@ -14,7 +14,7 @@ export const DocumentsPage: React.FC = () => {
   const [uploadedByFilter, setUploadedByFilter] = useState<string>('');
   const [categoryFilter, setCategoryFilter] = useState<string>('');
   const [allUsers, setAllUsers] = useState<Array<{ id: number; username: string; email: string; first_name?: string }>>([]);
-  const [allCategories, setAllCategories] = useState<Category[]>([]);
+  const [allCategories, setAllCategories] = useState<CategorySummary[]>([]);
 
   useEffect(() => {
     fetchDocuments();
@@ -33,8 +33,8 @@ export const DocumentsPage: React.FC = () => {
 
   const fetchCategories = async () => {
     try {
-      const response = await categoriesApi.getAll(false);
-      setAllCategories(response.results || response);
+      const categories = await categoriesApi.getSummaries(false);
+      setAllCategories(categories);
     } catch (error) {
       console.error('Error fetching categories:', error);
     }